@@ -0,0 +1,98 @@
+"""Compares the throughput of a bandit shared by many threads, either behind one global lock or sharded with
+`ShardedBandit`.
+
+Each thread makes decisions and immediately gives their rewards, as a server would. The script reports the number of
+requests per second and the 99th percentile of the decision latency, for 1 to 32 threads:
+
+    python benchmarks/contention.py --bandit ucb --n-arms 1000 --requests 20000
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from skbandit.bandits import Bandit
+from skbandit.bandits.contextual import LinUCB
+from skbandit.bandits.mab import UCB1
+from skbandit.bandits.sharded import ShardedBandit
+
+
+class GloballyLockedBandit(Bandit):
+    """The baseline: every decision and every reward takes the same lock."""
+
+    def __init__(self, bandit: Bandit):
+        super().__init__(bandit.n_arms)
+        self._bandit = bandit
+        self._lock = threading.Lock()
+
+    def pull(self, context=None):
+        with self._lock:
+            return self._bandit.pull(context=context)
+
+    def reward(self, arm, reward, context=None):
+        with self._lock:
+            self._bandit.reward(arm, reward, context=context)
+
+
+def make_bandit(kind: str, n_arms: int, n_features: int) -> Bandit:
+    if kind == 'ucb':
+        return UCB1(n_arms)
+    elif kind == 'linucb':
+        return LinUCB(n_arms, n_features)
+    raise ValueError("Unknown bandit: {}".format(kind))
+
+
+def run(bandit: Bandit, n_threads: int, n_requests: int, n_features: int, contextual: bool):
+    """Returns the throughput (requests per second) and the 99th percentile of the decision latency (seconds)."""
+    per_thread = n_requests // n_threads
+    latencies = np.empty((n_threads, per_thread))
+    barrier = threading.Barrier(n_threads + 1)
+
+    def worker(i):
+        rng = np.random.default_rng(i)
+        contexts = rng.normal(size=(per_thread, n_features)) if contextual else [None] * per_thread
+        rewards = rng.uniform(size=per_thread)
+        barrier.wait()
+        for j in range(per_thread):
+            start = time.perf_counter()
+            arm = bandit.pull(context=contexts[j])
+            latencies[i, j] = time.perf_counter() - start
+            bandit.reward(arm, rewards[j], context=contexts[j])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+    return n_threads * per_thread / duration, float(np.percentile(latencies, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bandit', choices=['ucb', 'linucb'], default='ucb')
+    parser.add_argument('--n-arms', type=int, default=1000)
+    parser.add_argument('--n-features', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--merge-every', type=int, default=128)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+    contextual = args.bandit == 'linucb'
+
+    print('{:>8} {:>10} {:>14} {:>14}'.format('threads', 'wrapper', 'requests/s', 'p99 pull (us)'))
+    for n_threads in args.threads:
+        for name in ['global', 'sharded']:
+            bandit = make_bandit(args.bandit, args.n_arms, args.n_features)
+            if name == 'global':
+                bandit = GloballyLockedBandit(bandit)
+            else:
+                bandit = ShardedBandit(bandit, merge_every=args.merge_every)
+            throughput, p99 = run(bandit, n_threads, args.requests, args.n_features, contextual)
+            print('{:>8} {:>10} {:>14.0f} {:>14.1f}'.format(n_threads, name, throughput, p99 * 1e6))
+
+
+if __name__ == '__main__':
+    main()
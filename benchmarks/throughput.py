@@ -0,0 +1,235 @@
+"""Measures the throughput of the players, of the environments and of whole experiments.
+
+For each case, the script reports the number of operations per second: decisions (`pull`), updates (`reward`),
+batched decisions and updates (per request), environment rounds, or experiment rounds. Cases are swept over the
+number of arms (10 to 10^6), the number of features (5 to 500) and the horizon.
+
+Results are written as JSON, with the versions of Python and of the libraries, so that runs can be compared:
+
+    python benchmarks/throughput.py --output before.json
+    python benchmarks/throughput.py --output after.json --compare before.json
+
+`--quick` runs smaller sweeps (for a smoke test), `--filter` only runs the cases whose name contains a string.
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import scipy
+from scipy.stats import bernoulli
+
+from skbandit.bandits.adversarial import EXP3, WeightedMajority
+from skbandit.bandits.contextual import LinUCB as ContextualLinUCB
+from skbandit.bandits.linear import LinUCB
+from skbandit.bandits.mab import ExploreThenCommitBandit, UCB1, MOSS, KLUCB, BernoulliThompsonSampling, \
+    GaussianThompsonSampling
+from skbandit.bandits.nonstationary import SlidingWindowUCB, DiscountedUCB, SlidingWindowThompsonSampling, \
+    DiscountedThompsonSampling
+from skbandit.environments.stochastic import StochasticMultiArmedEnvironment
+from skbandit.experiments.stochastic import MultiArmedStochasticExperiment
+
+PLAYERS = {
+    'ExploreThenCommit': lambda n_arms: ExploreThenCommitBandit(n_arms, n_epochs=1),
+    'UCB1': UCB1,
+    'MOSS': lambda n_arms: MOSS(n_arms, horizon=10 ** 7),
+    'KLUCB': KLUCB,
+    'LinUCB': LinUCB,
+    'BernoulliThompsonSampling': lambda n_arms: BernoulliThompsonSampling(n_arms, random_state=42),
+    'GaussianThompsonSampling': lambda n_arms: GaussianThompsonSampling(n_arms, random_state=42),
+    'EXP3': lambda n_arms: EXP3(n_arms, eta=0.01, random_state=42),
+    'SlidingWindowUCB': lambda n_arms: SlidingWindowUCB(n_arms, window=1000),
+    'DiscountedUCB': lambda n_arms: DiscountedUCB(n_arms, gamma=0.999),
+    'SlidingWindowThompsonSampling': lambda n_arms: SlidingWindowThompsonSampling(n_arms, window=1000,
+                                                                                  random_state=42),
+    'DiscountedThompsonSampling': lambda n_arms: DiscountedThompsonSampling(n_arms, gamma=0.999, random_state=42),
+}
+
+
+def measure(operation, n_per_call: int = 1, min_time: float = 0.2, max_calls: int = 100000) -> float:
+    """Calls `operation` repeatedly, for at least `min_time` seconds, and returns the number of operations per second
+    (each call performing `n_per_call` operations).
+    """
+    operation()  # Warm up.
+    n_calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time and n_calls < max_calls:
+        operation()
+        n_calls += 1
+        elapsed = time.perf_counter() - start
+    return n_calls * n_per_call / elapsed
+
+
+def warm_up(bandit, n_arms: int, rng: np.random.Generator) -> None:
+    """Gives one reward to each arm, so that decisions are measured after the initialisation phase."""
+    bandit.reward_batch(np.arange(n_arms), rng.uniform(size=n_arms))
+    for _ in range(n_arms):
+        bandit.pull()
+
+
+def player_cases(n_arms_values):
+    for name, make in PLAYERS.items():
+        for n_arms in n_arms_values:
+            def case(make=make, n_arms=n_arms):
+                rng = np.random.default_rng(42)
+                bandit = make(n_arms)
+                warm_up(bandit, n_arms, rng)
+                arms = rng.integers(n_arms, size=1024)
+                rewards = rng.uniform(size=1024)
+
+                def reward():
+                    for arm, value in zip(arms, rewards):
+                        bandit.reward(arm, value)
+
+                return {'decisions': measure(bandit.pull),
+                        'updates': measure(reward, n_per_call=1024, max_calls=1000),
+                        'batched updates': measure(lambda: bandit.reward_batch(arms, rewards), n_per_call=1024)}
+
+            yield name, {'n_arms': n_arms}, case
+
+
+def full_information_cases(n_arms_values):
+    for n_arms in n_arms_values:
+        def case(n_arms=n_arms):
+            rng = np.random.default_rng(42)
+            bandit = WeightedMajority(n_arms, eta=0.1, random_state=42)
+            rewards = rng.uniform(size=(64, n_arms))
+
+            def update():
+                for row in rewards:
+                    bandit.rewards(row)
+
+            return {'decisions': measure(bandit.pull), 'updates': measure(update, n_per_call=64, max_calls=1000)}
+
+        yield 'WeightedMajority', {'n_arms': n_arms}, case
+
+
+def contextual_cases(n_arms_values, n_features_values):
+    parameters = [(n_arms, 10) for n_arms in n_arms_values] + [(10, n_features) for n_features in n_features_values]
+    for n_arms, n_features in parameters:
+        def case(n_arms=n_arms, n_features=n_features):
+            rng = np.random.default_rng(42)
+            bandit = ContextualLinUCB(n_arms, n_features)
+            contexts = rng.normal(size=(1024, n_features))
+            arms = rng.integers(n_arms, size=1024)
+            rewards = rng.uniform(size=1024)
+            bandit.reward_batch(arms, rewards, contexts)
+            bandit.pull_batch(np.zeros((n_arms, n_features)))  # Skip the initialisation phase.
+
+            def reward():
+                for arm, value, context in zip(arms[:64], rewards[:64], contexts[:64]):
+                    bandit.reward(arm, value, context)
+
+            return {'decisions': measure(lambda: bandit.pull(contexts[0])),
+                    'batched decisions': measure(lambda: bandit.pull_batch(contexts), n_per_call=1024),
+                    'updates': measure(reward, n_per_call=64, max_calls=1000),
+                    'batched updates': measure(lambda: bandit.reward_batch(arms, rewards, contexts), n_per_call=1024)}
+
+        yield 'ContextualLinUCB', {'n_arms': n_arms, 'n_features': n_features}, case
+
+
+def environment(n_arms: int, rng: np.random.Generator) -> StochasticMultiArmedEnvironment:
+    distributions = [bernoulli(p) for p in rng.uniform(size=n_arms)]
+    for distribution in distributions:
+        distribution.random_state = rng
+    return StochasticMultiArmedEnvironment(distributions)
+
+
+def environment_cases(n_arms_values):
+    for n_arms in n_arms_values:
+        def case(n_arms=n_arms):
+            rng = np.random.default_rng(42)
+            env = environment(n_arms, rng)
+            arms = rng.integers(n_arms, size=1024)
+
+            def reward():
+                for arm in arms:
+                    env.reward(arm)
+
+            return {'rounds': measure(reward, n_per_call=1024, max_calls=1000),
+                    'batched rounds': measure(lambda: env.reward_batch(arms), n_per_call=1024)}
+
+        yield 'StochasticMultiArmedEnvironment', {'n_arms': n_arms}, case
+
+
+def experiment_cases(n_arms_values, horizons):
+    for n_arms in n_arms_values:
+        for horizon in horizons:
+            def case(n_arms=n_arms, horizon=horizon):
+                rng = np.random.default_rng(42)
+                experiment = MultiArmedStochasticExperiment(environment(n_arms, rng), UCB1(n_arms))
+                start = time.perf_counter()
+                experiment.rounds(horizon)
+                return {'rounds': horizon / (time.perf_counter() - start)}
+
+            yield 'MultiArmedStochasticExperiment[UCB1]', {'n_arms': n_arms, 'horizon': horizon}, case
+
+
+def cases(quick: bool):
+    if quick:
+        n_arms_values, n_features_values, horizons = [10, 1000], [5, 50], [1000]
+        environment_arms, contextual_arms = [10, 1000], [10, 1000]
+    else:
+        n_arms_values, n_features_values, horizons = [10, 1000, 10 ** 5, 10 ** 6], [5, 50, 500], [10 ** 3, 10 ** 5]
+        # Environments are made of one SciPy distribution per arm; contextual bandits store one matrix per arm.
+        environment_arms, contextual_arms = [10, 1000, 10 ** 4], [10, 1000, 10 ** 4]
+
+    yield from player_cases(n_arms_values)
+    yield from full_information_cases(n_arms_values)
+    yield from contextual_cases(contextual_arms, n_features_values)
+    yield from environment_cases(environment_arms)
+    yield from experiment_cases([10, 1000] if quick else environment_arms, horizons)
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'date': datetime.datetime.now().isoformat(), 'commit': commit, 'python': sys.version,
+            'platform': platform.platform(), 'processor': platform.processor(), 'numpy': np.__version__,
+            'scipy': scipy.__version__}
+
+
+def key(result: dict) -> str:
+    return '{} {} {}'.format(result['case'], json.dumps(result['parameters'], sort_keys=True), result['measure'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='run smaller sweeps')
+    parser.add_argument('--filter', default='', help='only run the cases whose name contains this string')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--compare', help='JSON file of a previous run, to compare the results with')
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {key(result): result['ops_per_sec'] for result in json.load(f)['results']}
+
+    results = []
+    for name, parameters, case in cases(args.quick):
+        if args.filter not in name:
+            continue
+        for measure_name, ops_per_sec in case().items():
+            result = {'case': name, 'parameters': parameters, 'measure': measure_name, 'ops_per_sec': ops_per_sec}
+            results.append(result)
+
+            line = '{:<40} {:<36} {:<18} {:>14.0f}/s'.format(name, json.dumps(parameters), measure_name, ops_per_sec)
+            if key(result) in previous:
+                line += '  x{:.2f}'.format(ops_per_sec / previous[key(result)])
+            print(line, flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'metadata': metadata(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -20,7 +20,9 @@ setuptools.setup(
         'License :: OSI Approved :: BSD License',
         'Operating System :: OS Independent',
     ],
+    python_requires='>=3.7',
     install_requires=[
+        'numpy>=1.17',
         'scipy>=0.7.0'
     ],
 )
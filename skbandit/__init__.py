@@ -1 +1,6 @@
-__all__ = ['bandits', 'environment', 'experiment']
+from skbandit._lazy import lazy_attributes
+
+__all__ = ['bandits', 'environments', 'experiments', 'serving']
+
+# Subpackages are only imported when they are first used.
+__getattr__, __dir__ = lazy_attributes(__name__, globals(), {name: None for name in __all__})
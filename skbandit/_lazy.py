@@ -0,0 +1,22 @@
+import importlib
+from typing import Callable, Dict, List, Tuple, Union
+
+
+def lazy_attributes(package: str, package_globals: dict, modules: Dict[str, Union[None, str]]) \
+        -> Tuple[Callable[[str], object], Callable[[], List[str]]]:
+    """Returns the `__getattr__` and `__dir__` functions of a package whose attributes are only imported when they are
+    first used (PEP 562).
+
+    `modules` gives the module (relative to the package) that defines each exported name, or `None` for names that
+    are modules themselves (subpackages).
+    """
+    def __getattr__(name):
+        if name in modules:
+            module = importlib.import_module('.' + (modules[name] or name), package)
+            return module if modules[name] is None else getattr(module, name)
+        raise AttributeError("module {!r} has no attribute {!r}".format(package, name))
+
+    def __dir__():
+        return sorted(set(package_globals) | set(modules))
+
+    return __getattr__, __dir__
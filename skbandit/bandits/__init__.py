@@ -1,3 +1,8 @@
-from .base import Bandit, RewardAccumulatorMixin
+from skbandit._lazy import lazy_attributes
 
 __all__ = ["Bandit", "RewardAccumulatorMixin"]
+
+# Module of each exported name: modules are only imported when one of their names is first used.
+_modules = {"Bandit": "base", "RewardAccumulatorMixin": "base"}
+
+__getattr__, __dir__ = lazy_attributes(__name__, globals(), _modules)
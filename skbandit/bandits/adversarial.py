@@ -1,8 +1,10 @@
-from typing import Union
+from typing import Union, List
 
 import math
+import numpy as np
 
 from skbandit.bandits.base import Bandit
+from skbandit.bandits.sumtree import SumTree
 
 
 class WeightedMajority(Bandit):
@@ -14,12 +16,22 @@ class WeightedMajority(Bandit):
     Its regret scales as the square root of the number of rounds, if the parameter eta is chosen accordingly to
     the the time horizon (using the `horizon` parameter). Otherwise, it grows linearly.
 
+    The weight of each arm is exp(eta * total reward of the arm). Weights are stored as logarithms, and only brought
+    back to the linear domain relatively to the largest one, for numerical stability. Arms are then drawn from a sum
+    tree, with the random generator given by `random_state`.
+
+    In full-information experiments run by chunks, `play_chunk` computes the total rewards at each round with one
+    cumulative sum, then builds all trees and draws all arms at once: decisions are the same as round by round.
+
     See also:
         - https://www.sciencedirect.com/science/article/pii/S0890540184710091
         - https://948da3d8-a-62cb3a1a-s-sites.googlegroups.com/site/banditstutorial/home/slides/Bandit_small.pdf
     """
 
-    def __init__(self, n_arms: int, eta: Union[float, None], horizon: Union[int, None] = None):
+    _decision_attributes = ()  # The round counter counts the rewards, not the decisions.
+
+    def __init__(self, n_arms: int, eta: Union[float, None], horizon: Union[int, None] = None,
+                 random_state: Union[None, int, np.random.Generator] = None):
         super().__init__(n_arms)
 
         if eta is not None:
@@ -29,17 +41,142 @@ class WeightedMajority(Bandit):
         else:
             raise AssertionError("One of eta or horizon parameters must be set")
 
-    def reward(self, arm: int, reward: float) -> None:
-        pass
+        self._rng = np.random.default_rng(random_state)
+        self._current_round = 0
+        self._total_rewards = np.zeros(n_arms)
+        self._tree = SumTree(n_arms)
+        self._tree_round = None  # Round for which the tree was last computed.
+
+    # Elements of the trees built at once by play_chunk.
+    _chunk_elements = 2 ** 22
+
+    def _learning_rate(self) -> float:
+        return self._eta
+
+    def _learning_rates(self, rounds: range) -> np.ndarray:
+        """Learning rates at the given rounds, equal to what `_learning_rate` returns at these rounds."""
+        return np.full(len(rounds), self._eta)
+
+    def _update_tree(self) -> None:
+        log_weights = self._learning_rate() * self._total_rewards
+        self._tree.set_all(np.exp(log_weights - np.max(log_weights)))
+        self._tree_round = self._current_round
+
+    @property
+    def probabilities(self) -> np.ndarray:
+        """Probability of playing each arm at the next round."""
+        if self._tree_round != self._current_round:
+            self._update_tree()
+        return self._tree.weights / self._tree.total
+
+    def rewards(self, reward: Union[List[float], np.ndarray], context: Union[None, np.ndarray] = None) -> None:
+        self._total_rewards += reward
+        self._current_round += 1
+
+    def pull(self, **kwargs) -> int:
+        if self._tree_round != self._current_round:
+            self._update_tree()
+        return self._tree.find(self._rng.random() * self._tree.total)
+
+    def play_chunk(self, rewards: np.ndarray) -> np.ndarray:
+        rewards = np.asarray(rewards, dtype=float)
+        arms = np.empty(rewards.shape[0], dtype=np.int64)
+        rows = max(1, self._chunk_elements // (2 * self._tree.capacity))
+
+        for start in range(0, rewards.shape[0], rows):
+            chunk = rewards[start:start + rows]
+            m = chunk.shape[0]
+
+            # Total rewards before each round: the first row is the current total, then one row is added at a time.
+            totals = np.cumsum(np.vstack([self._total_rewards[np.newaxis], chunk]), axis=0)
+            learning_rates = self._learning_rates(range(self._current_round, self._current_round + m))
+            log_weights = learning_rates[:, np.newaxis] * totals[:-1]
+            trees = self._tree.build_many(np.exp(log_weights - np.max(log_weights, axis=1)[:, np.newaxis]))
+            arms[start:start + m] = self._tree.find_many(trees, self._rng.random(m) * trees[:, 1])
+
+            self._total_rewards = totals[-1]
+            self._current_round += m
+            self._tree_round = None
+
+        return arms
+
+
+class ExponentiallyWeightedForecaster(WeightedMajority):
+    """Exponentially weighted forecaster with a time-varying learning rate, for the full-information setting.
+
+    Unlike `WeightedMajority`, it does not need to know the time horizon: at round t, the learning rate is
+    sqrt(8 log(n_arms) / t). Its regret scales as the square root of the number of rounds.
+
+    See also: https://948da3d8-a-62cb3a1a-s-sites.googlegroups.com/site/banditstutorial/home/slides/Bandit_small.pdf,
+    slide 35
+    """
+
+    def __init__(self, n_arms: int, random_state: Union[None, int, np.random.Generator] = None):
+        super().__init__(n_arms, eta=0.0, random_state=random_state)
+
+    def _learning_rate(self) -> float:
+        return math.sqrt(8 * math.log(self.n_arms) / (self._current_round + 1))
+
+    def _learning_rates(self, rounds: range) -> np.ndarray:
+        return np.array([math.sqrt(8 * math.log(self.n_arms) / (t + 1)) for t in rounds])
+
+
+class EXP3(Bandit):
+    """EXP3 player, for adversarial bandits with rewards in [0, 1] and bandit feedback.
+
+    Each arm is played with a probability proportional to exp(eta * estimated total reward). The total rewards are
+    estimated by importance weighting: the reward of the played arm is divided by the probability of playing it.
+
+    Its regret scales as the square root of the number of rounds times the number of arms (times a logarithmic
+    factor), if the parameter eta is chosen accordingly to the time horizon (using the `horizon` parameter).
+
+    Only the weight of the played arm changes at each round (up to a common factor, which does not change the
+    probabilities). Weights are kept as logarithms, and as relative weights in a sum tree: both drawing an arm and
+    updating its weight cost O(log n_arms) operations. All relative weights are recomputed (in O(n_arms)) only when
+    they become too small to be represented accurately, which happens rarely.
+
+    See also: https://tor-lattimore.com/downloads/book/book.pdf, Chapter 11.
+    """
+
+    def __init__(self, n_arms: int, eta: Union[float, None] = None, horizon: Union[int, None] = None,
+                 random_state: Union[None, int, np.random.Generator] = None):
+        super().__init__(n_arms)
+
+        if eta is not None:
+            self._eta = eta
+        elif horizon is not None:
+            self._eta = math.sqrt(2 * math.log(n_arms) / (horizon * n_arms))
+        else:
+            raise AssertionError("One of eta or horizon parameters must be set")
+
+        self._rng = np.random.default_rng(random_state)
+        self._log_weights = np.zeros(n_arms)
+        self._log_offset = 0.0  # The tree contains exp(log weight - offset).
+        self._tree = SumTree(n_arms)
+        self._tree.set_all(np.ones(n_arms))
+
+    def _rebase(self) -> None:
+        self._log_offset = np.max(self._log_weights)
+        self._tree.set_all(np.exp(self._log_weights - self._log_offset))
+
+    @property
+    def probabilities(self) -> np.ndarray:
+        """Probability of playing each arm at the next round."""
+        return self._tree.weights / self._tree.total
+
+    def pull(self, **kwargs) -> int:
+        return self._tree.find(self._rng.random() * self._tree.total)
 
-    def pull(self) -> int:
-        pass
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        # The estimated reward of all arms increases by one, except for the played one, which is corrected by the
+        # importance-weighted loss: only this arm has to be updated.
+        probability = self._tree.weight(arm) / self._tree.total
+        self._log_weights[arm] -= self._eta * (1.0 - reward) / probability
+        self._tree.update(arm, math.exp(self._log_weights[arm] - self._log_offset))
 
+        if self._tree.total < 1e-100:
+            self._rebase()
 
 
-# TODO: EXP3
-#   Example source: https://tor-lattimore.com/downloads/book/book.pdf, chapter 11
-# TODO: Exponentially weighted forecaster
-#   Example source: https://948da3d8-a-62cb3a1a-s-sites.googlegroups.com/site/banditstutorial/home/slides/Bandit_small.pdf, slide 35
 # TODO: Implicitly normalised forecaster
 #   Example source: https://948da3d8-a-62cb3a1a-s-sites.googlegroups.com/site/banditstutorial/home/slides/Bandit_small.pdf, slide 36
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from typing import Union, List, Dict
 import numpy as np
 
+from skbandit.bandits import checkpoint
+
 
 class Bandit(ABC):
     """A stochastic, multi-armed bandit player.
@@ -14,8 +16,16 @@ class Bandit(ABC):
       not have to, be called after each call to `pull()`
     * `rewards(rewards)`: in a full-information or semi-bandit setting, the rewards associated with all arms (or
     just those that were played) at a given round
+
+    Bandits may also process several requests at once, with `pull_batch(contexts)` and `reward_batch(arms, rewards,
+    contexts)`. By default, these methods call `pull` and `reward` once per request.
+
+    The state of a bandit can be written to a file with `save(path)`, and read back with `Bandit.load(path)`.
     """
 
+    # Attributes that decisions update (see `decision_state`).
+    _decision_attributes = ('_current_round',)
+
     def __init__(self, n_arms: int):
         self._n_arms = n_arms
 
@@ -29,28 +39,249 @@ class Bandit(ABC):
     def rewards(self, reward: Union[List[float], Dict[int, float]], context: Union[None, np.ndarray] = None) -> None:
         raise NotImplementedError
 
+    def pull_batch(self, contexts: Union[None, np.ndarray] = None, n: Union[None, int] = None) -> np.ndarray:
+        """Decide the arms to pull for a batch of requests, without learning anything in between.
+
+        There is one request per row of `contexts` (an array of shape `(n_requests, n_features)`), or `n` requests
+        for bandits that do not use a context.
+        """
+        if contexts is not None:
+            return np.array([self.pull(context=context) for context in contexts])
+        elif n is not None:
+            return np.array([self.pull() for _ in range(n)])
+        else:
+            raise AssertionError("One of contexts or n parameters must be set")
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        """Learn from a batch of requests: for the i-th one, playing `arms[i]` yielded `rewards[i]`.
+
+        There is one context per request (one row of `contexts`) for contextual bandits.
+        """
+        if contexts is not None:
+            for arm, reward, context in zip(arms, rewards, contexts):
+                self.reward(arm, reward, context=context)
+        else:
+            for arm, reward in zip(arms, rewards):
+                self.reward(arm, reward)
+
+    def play_chunk(self, rewards: np.ndarray) -> np.ndarray:
+        """Plays several rounds in a full-information setting, where the rewards of all arms are known in advance: at
+        each round (one row of `rewards`), decide an arm, then learn the rewards of all arms. Returns the arms.
+
+        This default implementation calls `pull` then `rewards` for each row. Players may override it with vectorised
+        operations, as long as they make the same decisions.
+        """
+        arms = np.empty(rewards.shape[0], dtype=np.int64)
+        for i, row in enumerate(rewards):
+            arms[i] = self.pull()
+            self.rewards(row)
+        return arms
+
+    def decision_state(self) -> dict:
+        """Returns the part of the state that decisions update, like the round counter, as opposed to what is learnt
+        from rewards (random generators are not part of it). Giving it back to `set_decision_state` undoes the
+        decisions made in between, for instance when replaying logged data, where the decisions that do not match the
+        logged arm are not part of the history of the bandit.
+        """
+        return {name: getattr(self, name) for name in self._decision_attributes if hasattr(self, name)}
+
+    def set_decision_state(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def save(self, path: str) -> None:
+        """Writes the state of the bandit to a file, in a versioned binary format: a JSON header followed by the raw
+        arrays (see `skbandit.bandits.checkpoint`).
+        """
+        checkpoint.save(self, path)
+
+    @classmethod
+    def load(cls, path: str, mmap: Union[bool, str] = True) -> 'Bandit':
+        """Reads a bandit written by `save`.
+
+        By default, arrays are memory-mapped read-only: loading is almost instantaneous, and processes that load the
+        same file share one copy of the arrays in memory. Such a bandit can make decisions, but not learn (updating its
+        arrays raises an error). With `mmap='c'`, arrays are copy-on-write: the bandit can learn, and pages are only
+        copied when they are modified. With `mmap=False`, arrays are read into memory.
+
+        Only objects of the classes of scikit-bandit are created, plus the classes registered with
+        `skbandit.bandits.checkpoint.register` (for instance, custom bandits).
+        """
+        bandit = checkpoint.load(path, mmap)
+        if not isinstance(bandit, cls):
+            raise TypeError("{} does not contain a {}, but a {}.".format(path, cls.__name__, type(bandit).__name__))
+        return bandit
+
     @property
     def n_arms(self):
         return self._n_arms
 
 
+def _merge_moments(counts: np.ndarray, totals: np.ndarray, means: np.ndarray, squared_deviations: np.ndarray,
+                   arms: np.ndarray, other_counts: np.ndarray, other_totals: np.ndarray, other_means: np.ndarray,
+                   other_squared_deviations: np.ndarray) -> None:
+    """Merges, in place, the statistics of the rewards of `arms` with other statistics of these arms (with Chan et
+    al.'s formula for the variance). The other counts must be positive.
+    """
+    arm_counts = counts[arms]
+    new_counts = arm_counts + other_counts
+    delta = other_means - means[arms]
+    means[arms] += delta * other_counts / new_counts
+    squared_deviations[arms] += other_squared_deviations + delta ** 2 * arm_counts * other_counts / new_counts
+    totals[arms] += other_totals
+    counts[arms] = new_counts
+
+
+def _batch_moments(arms: np.ndarray, rewards: np.ndarray):
+    """Statistics of a batch of rewards, for the arms that appear in it: the arms, then their counts, totals, means,
+    and sums of the squared deviations from the mean.
+    """
+    touched, inverse = np.unique(arms, return_inverse=True)
+    counts = np.bincount(inverse)
+    totals = np.bincount(inverse, weights=rewards)
+    means = totals / counts
+    squared_deviations = np.bincount(inverse, weights=(rewards - means[inverse]) ** 2)
+    return touched, counts, totals, means, squared_deviations
+
+
+class RewardStatistics:
+    """Statistics of the rewards of each arm (count, total, mean, and sum of the squared deviations from the mean),
+    accumulated apart from a bandit, then merged into it with `merge_statistics`. They are created by the
+    `new_statistics` method of the bandits that use `RewardAccumulatorMixin`.
+
+    A reward costs O(1) operations, a merge O(K), whatever the number of rewards.
+    """
+
+    __slots__ = ('counts', 'totals', 'means', 'squared_deviations', 'n_rewards')
+
+    def __init__(self, n_arms: int):
+        self.counts = np.zeros(n_arms, dtype=np.int64)
+        self.totals = np.zeros(n_arms)
+        self.means = np.zeros(n_arms)
+        self.squared_deviations = np.zeros(n_arms)
+        self.n_rewards = 0
+
+    def add(self, arm: int, reward: float, context: Union[None, np.ndarray] = None) -> None:
+        count = self.counts[arm] + 1
+        self.counts[arm] = count
+        self.totals[arm] += reward
+        delta = reward - self.means[arm]
+        self.means[arm] += delta / count
+        self.squared_deviations[arm] += delta * (reward - self.means[arm])
+        self.n_rewards += 1
+
+    def add_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        arms = np.asarray(arms, dtype=np.int64)
+        if arms.shape[0] == 0:
+            return
+        _merge_moments(self.counts, self.totals, self.means, self.squared_deviations,
+                       *_batch_moments(arms, np.asarray(rewards, dtype=float)))
+        self.n_rewards += arms.shape[0]
+
+    def clear(self) -> None:
+        self.counts[:] = 0
+        self.totals[:] = 0.0
+        self.means[:] = 0.0
+        self.squared_deviations[:] = 0.0
+        self.n_rewards = 0
+
+
 class RewardAccumulatorMixin:
+    """Accumulates statistics about the rewards obtained by each arm.
+
+    The number of times each arm was rewarded, the total reward, the mean reward, and the variance of the rewards
+    (with Welford's algorithm) are kept in NumPy arrays and updated incrementally.
+
+    The arm with the highest mean reward (the first one, in case of ties) is cached: it is only recomputed when the
+    mean reward of this arm decreases. Otherwise, it is updated in constant time.
+
+    Many rewards can be accumulated at once with `reward_batch`: the statistics of the batch are aggregated per arm,
+    then merged with the current ones (with Chan et al.'s formula for the variance). The result is the same as for
+    the equivalent sequence of calls to `reward`, up to rounding errors. Rewards can also be accumulated apart from the
+    bandit, in the statistics returned by `new_statistics`, then merged the same way with `merge_statistics`.
+    """
+
+    __slots__ = ('_arm_counts', '_total_rewards', '_means', '_squared_deviations', '_best_arm_cache')
+
     def __init__(self, n_arms: int):
-        self._arm_counts = [0] * n_arms
-        self._total_rewards = [0.0] * n_arms
+        self._arm_counts = np.zeros(n_arms, dtype=np.int64)
+        self._total_rewards = np.zeros(n_arms)
+        self._means = np.zeros(n_arms)
+        self._squared_deviations = np.zeros(n_arms)  # Sum of the squared deviations from the mean.
+        self._best_arm_cache = 0
 
     def reward(self, arm: int, reward: float, **kwargs) -> None:
-        self._arm_counts[arm] += 1
+        count = self._arm_counts[arm] + 1
+        self._arm_counts[arm] = count
         self._total_rewards[arm] += reward
 
+        delta = reward - self._means[arm]
+        mean = self._means[arm] + delta / count
+        self._means[arm] = mean
+        self._squared_deviations[arm] += delta * (reward - mean)
+
+        # Maintain the best arm: it may only change if this arm overtakes it, or if its own mean decreases.
+        best_arm = self._best_arm_cache
+        if best_arm is None:
+            return
+        elif arm == best_arm:
+            if delta < 0:
+                self._best_arm_cache = None
+        else:
+            best_mean = self._means[best_arm]
+            if mean > best_mean or (mean == best_mean and arm < best_arm):
+                self._best_arm_cache = arm
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, **kwargs) -> None:
+        arms = np.asarray(arms, dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=float)
+        if arms.shape[0] == 0:
+            return
+
+        _merge_moments(self._arm_counts, self._total_rewards, self._means, self._squared_deviations,
+                       *_batch_moments(arms, rewards))
+        self._best_arm_cache = None
+
+    def new_statistics(self) -> RewardStatistics:
+        """Returns empty statistics, to accumulate rewards apart from this bandit (see `merge_statistics`)."""
+        return RewardStatistics(self._arm_counts.shape[0])
+
+    def merge_statistics(self, statistics: RewardStatistics) -> None:
+        """Learns from all the rewards accumulated in `statistics`, as `reward_batch` would."""
+        arms = np.flatnonzero(statistics.counts)
+        if arms.shape[0] == 0:
+            return
+        _merge_moments(self._arm_counts, self._total_rewards, self._means, self._squared_deviations, arms,
+                       statistics.counts[arms], statistics.totals[arms], statistics.means[arms],
+                       statistics.squared_deviations[arms])
+        self._best_arm_cache = None
+
     @property
-    def total_rewards(self):
+    def total_rewards(self) -> np.ndarray:
         return self._total_rewards
 
     @property
-    def arm_counts(self):
+    def arm_counts(self) -> np.ndarray:
         return self._arm_counts
 
+    @property
+    def means(self) -> np.ndarray:
+        """Mean reward of each arm (zero for arms that were never rewarded)."""
+        return self._means
+
+    @property
+    def variances(self) -> np.ndarray:
+        """Unbiased estimate of the variance of the rewards of each arm (zero for arms rewarded less than twice)."""
+        return np.divide(self._squared_deviations, self._arm_counts - 1, out=np.zeros_like(self._squared_deviations),
+                         where=self._arm_counts > 1)
+
+    @property
+    def best_arm(self) -> int:
+        """Arm with the highest mean reward."""
+        if self._best_arm_cache is None:
+            self._best_arm_cache = int(np.argmax(self._means))
+        return self._best_arm_cache
+
 
 # TODO: Explore what others implement:
 #   https://github.com/jkomiyama/banditlib
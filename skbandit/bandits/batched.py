@@ -0,0 +1,164 @@
+from abc import ABC, abstractmethod
+from typing import Union
+
+import math
+import numpy as np
+
+from skbandit.bandits.base import Bandit
+
+
+class BatchedBandit(Bandit, ABC):
+    """A family of independent bandit players, run in lockstep.
+
+    A batched bandit represents `n_replicates` independent copies of the same player. Its state is stored as arrays
+    whose first dimension indexes the replicates, so that all copies are updated at once:
+
+    * `pull()`: decide the arm to pull for each replicate (an integer array of shape `(n_replicates,)`)
+    * `reward(arms, rewards)`: each replicate pulled the arm `arms[r]` and got the reward `rewards[r]`
+
+    All replicates play the same number of rounds, which means that counters like the current round can be shared.
+    """
+
+    def __init__(self, n_arms: int, n_replicates: int):
+        super().__init__(n_arms)
+        self._n_replicates = n_replicates
+
+    @property
+    def n_replicates(self):
+        return self._n_replicates
+
+    @abstractmethod
+    def pull(self, context: Union[None, np.ndarray] = None) -> np.ndarray:
+        pass
+
+    def reward(self, arms: np.ndarray, rewards: np.ndarray, context: Union[None, np.ndarray] = None) -> None:
+        raise NotImplementedError
+
+
+class BatchedRewardAccumulatorMixin:
+    """Counterpart of `RewardAccumulatorMixin` for batched bandits: one row of statistics per replicate."""
+
+    def __init__(self, n_arms: int, n_replicates: int):
+        self._arm_counts = np.zeros((n_replicates, n_arms), dtype=np.int64)
+        self._total_rewards = np.zeros((n_replicates, n_arms))
+        self._replicates = np.arange(n_replicates)
+
+    def reward(self, arms: np.ndarray, rewards: np.ndarray, **kwargs) -> None:
+        # Each replicate pulls exactly one arm: the (replicate, arm) pairs are unique, no need for np.add.at.
+        self._arm_counts[self._replicates, arms] += 1
+        self._total_rewards[self._replicates, arms] += rewards
+
+    @property
+    def total_rewards(self):
+        return self._total_rewards
+
+    @property
+    def arm_counts(self):
+        return self._arm_counts
+
+
+class BatchedExploreThenCommitBandit(BatchedBandit, BatchedRewardAccumulatorMixin):
+    """Batched version of `ExploreThenCommitBandit`: all replicates explore together, then each commits to its own
+    best arm.
+    """
+
+    def __init__(self, n_arms: int, n_replicates: int, n_epochs: Union[int, None] = None,
+                 gap: Union[float, None] = None, horizon: Union[int, None] = None):
+        BatchedBandit.__init__(self, n_arms, n_replicates)
+        BatchedRewardAccumulatorMixin.__init__(self, n_arms, n_replicates)
+
+        self._current_round = 0
+        self._best_arms = None
+
+        if gap is not None and horizon is not None:
+            self._n_epochs = max(1, math.ceil((4 / gap ** 2) * math.log(horizon * gap ** 2 / 4)))
+        elif n_epochs is not None:
+            self._n_epochs = n_epochs
+        else:
+            self._n_epochs = 1
+
+    def pull(self, **kwargs) -> np.ndarray:
+        # Exploration phase: all replicates play the same arm.
+        if self._current_round < self._n_arms * self._n_epochs:
+            arms = np.full(self._n_replicates, self._current_round % self._n_arms)
+        # Exploitation phase: always return the best arm of each replicate (computed only once).
+        else:
+            if self._best_arms is None:
+                self._best_arms = np.argmax(self.total_rewards, axis=1)
+            arms = self._best_arms
+
+        self._current_round += 1
+        return arms
+
+    def reward(self, arms: np.ndarray, rewards: np.ndarray, **kwargs) -> None:
+        # Stop storing rewards after the exploration phase.
+        if self._current_round <= self._n_arms * self._n_epochs:
+            BatchedRewardAccumulatorMixin.reward(self, arms, rewards)
+
+
+class BatchedUCB(BatchedBandit, BatchedRewardAccumulatorMixin):
+    """Batched version of the UCB player of `skbandit.bandits.linear.LinUCB`."""
+
+    def __init__(self, n_arms: int, n_replicates: int):
+        BatchedBandit.__init__(self, n_arms, n_replicates)
+        BatchedRewardAccumulatorMixin.__init__(self, n_arms, n_replicates)
+
+        self._current_round = 0
+
+    def pull(self, **kwargs) -> np.ndarray:
+        self._current_round += 1
+
+        # Initialisation phase: explore once each arm.
+        if self._current_round <= self.n_arms:
+            return np.full(self._n_replicates, self._current_round - 1)
+
+        # UCB phase.
+        estimated_rewards = self.total_rewards / self.arm_counts
+        index = estimated_rewards + np.sqrt(2 * math.log(self._current_round) / self.arm_counts)
+        return np.argmax(index, axis=1)
+
+    def reward(self, arms: np.ndarray, rewards: np.ndarray, **kwargs) -> None:
+        BatchedRewardAccumulatorMixin.reward(self, arms, rewards)
+
+
+class BatchedBernoulliThompsonSampling(BatchedBandit, BatchedRewardAccumulatorMixin):
+    """Batched version of `BernoulliThompsonSampling`: the posteriors of all arms and replicates are drawn at once."""
+
+    def __init__(self, n_arms: int, n_replicates: int, alpha: float = 1.0, beta: float = 1.0,
+                 random_state: Union[None, int, np.random.Generator] = None):
+        BatchedBandit.__init__(self, n_arms, n_replicates)
+        BatchedRewardAccumulatorMixin.__init__(self, n_arms, n_replicates)
+
+        self._prior_alpha = alpha
+        self._prior_beta = beta
+        self._rng = np.random.default_rng(random_state)
+
+    def pull(self, **kwargs) -> np.ndarray:
+        alpha = self._prior_alpha + self._total_rewards
+        beta = self._prior_beta + self._arm_counts - self._total_rewards
+        return np.argmax(self._rng.beta(alpha, beta), axis=1)
+
+    def reward(self, arms: np.ndarray, rewards: np.ndarray, **kwargs) -> None:
+        BatchedRewardAccumulatorMixin.reward(self, arms, rewards)
+
+
+class BatchedGaussianThompsonSampling(BatchedBandit, BatchedRewardAccumulatorMixin):
+    """Batched version of `GaussianThompsonSampling`: the posteriors of all arms and replicates are drawn at once."""
+
+    def __init__(self, n_arms: int, n_replicates: int, prior_mean: float = 0.0, prior_variance: float = 1.0,
+                 noise_variance: float = 1.0, random_state: Union[None, int, np.random.Generator] = None):
+        BatchedBandit.__init__(self, n_arms, n_replicates)
+        BatchedRewardAccumulatorMixin.__init__(self, n_arms, n_replicates)
+
+        self._prior_mean = prior_mean
+        self._prior_variance = prior_variance
+        self._noise_variance = noise_variance
+        self._rng = np.random.default_rng(random_state)
+
+    def pull(self, **kwargs) -> np.ndarray:
+        variances = 1 / (1 / self._prior_variance + self._arm_counts / self._noise_variance)
+        means = variances * (self._prior_mean / self._prior_variance + self._total_rewards / self._noise_variance)
+        return np.argmax(self._rng.normal(means, np.sqrt(variances)), axis=1)
+
+    def reward(self, arms: np.ndarray, rewards: np.ndarray, **kwargs) -> None:
+        BatchedRewardAccumulatorMixin.reward(self, arms, rewards)
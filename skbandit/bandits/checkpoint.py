@@ -0,0 +1,196 @@
+import importlib
+import json
+import struct
+from typing import Dict, Union
+
+import numpy as np
+
+MAGIC = b'SKBANDIT'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct('<8sII')  # Magic, format version, length of the header.
+
+# Classes outside of scikit-bandit whose objects may be loaded, by qualified name (see `register`).
+_registered = {}
+
+
+def attributes(obj) -> Dict[str, object]:
+    """Returns the attributes of an object, from its `__dict__` and its `__slots__`."""
+    state = dict(getattr(obj, '__dict__', {}))
+    for klass in type(obj).__mro__:
+        for name in getattr(klass, '__slots__', ()):
+            if hasattr(obj, name):
+                state[name] = getattr(obj, name)
+    return state
+
+
+def object_state(obj) -> Dict[str, object]:
+    """Returns the state of an object, either from its `_get_state` method or from its attributes."""
+    if hasattr(obj, '_get_state'):
+        return obj._get_state()
+    return attributes(obj)
+
+
+def restore_object(obj, state: Dict[str, object]) -> None:
+    """Sets the attributes of an object, either with its `_set_state` method or directly."""
+    if hasattr(obj, '_set_state'):
+        obj._set_state(state)
+    else:
+        for name, value in state.items():
+            setattr(obj, name, value)
+
+
+def _qualified_name(klass: type) -> str:
+    return klass.__module__ + ':' + klass.__qualname__
+
+
+def register(klass: type) -> type:
+    """Allows checkpoints to contain objects of a class defined outside of scikit-bandit, like a custom bandit. It can
+    be used as a class decorator.
+    """
+    _registered[_qualified_name(klass)] = klass
+    return klass
+
+
+def _import(name: str) -> type:
+    # Only the classes of scikit-bandit and the registered ones are instantiated, so that loading a checkpoint cannot
+    # run arbitrary code.
+    if name in _registered:
+        return _registered[name]
+    module, qualified_name = name.split(':')
+    if module.split('.')[0] != 'skbandit':
+        raise ValueError("Objects of class {} cannot be loaded: only the classes of scikit-bandit and the ones "
+                         "registered with skbandit.bandits.checkpoint.register can be.".format(name))
+
+    klass = importlib.import_module(module)
+    for part in qualified_name.split('.'):
+        klass = getattr(klass, part)
+    if not isinstance(klass, type) or _qualified_name(klass) != name:
+        raise ValueError("{} is not a class.".format(name))
+    return klass
+
+
+def _same_memory(a: np.ndarray, b: np.ndarray) -> bool:
+    """Indicates whether two arrays are views of the same memory, with the same layout."""
+    return (a.__array_interface__['data'][0] == b.__array_interface__['data'][0] and a.shape == b.shape
+            and a.strides == b.strides and a.dtype == b.dtype)
+
+
+def _encode(value, path: str, arrays: Dict[str, np.ndarray]):
+    """Turns a value into something that JSON can represent, moving arrays into `arrays`. Arrays that are views of
+    the same memory are only stored once.
+    """
+    if isinstance(value, np.ndarray):
+        for name, array in arrays.items():
+            if _same_memory(array, value):
+                return {'__array__': name}
+        arrays[path] = value
+        return {'__array__': path}
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    elif isinstance(value, (list, tuple)):
+        encoded = [_encode(item, '{}.{}'.format(path, i), arrays) for i, item in enumerate(value)]
+        return encoded if isinstance(value, list) else {'__tuple__': encoded}
+    elif isinstance(value, dict):
+        return {'__dict__': [[_encode(k, path, arrays), _encode(v, '{}.{}'.format(path, k), arrays)]
+                             for k, v in value.items()]}
+    elif isinstance(value, np.random.Generator):
+        return {'__generator__': value.bit_generator.state}
+    else:
+        state = object_state(value)
+        return {'__object__': _qualified_name(type(value)),
+                'state': {name: _encode(item, '{}.{}'.format(path, name), arrays) for name, item in state.items()}}
+
+
+def _decode(value, arrays: Dict[str, np.ndarray]):
+    if isinstance(value, list):
+        return [_decode(item, arrays) for item in value]
+    elif not isinstance(value, dict):
+        return value
+    elif '__array__' in value:
+        return arrays[value['__array__']]
+    elif '__tuple__' in value:
+        return tuple(_decode(item, arrays) for item in value['__tuple__'])
+    elif '__dict__' in value:
+        return {_decode(k, arrays): _decode(v, arrays) for k, v in value['__dict__']}
+    elif '__generator__' in value:
+        state = value['__generator__']
+        bit_generator = getattr(np.random, state['bit_generator'], None)
+        if not isinstance(bit_generator, type) or not issubclass(bit_generator, np.random.BitGenerator):
+            raise ValueError("Unknown bit generator: {}.".format(state['bit_generator']))
+        generator = np.random.Generator(bit_generator())
+        generator.bit_generator.state = state
+        return generator
+    else:
+        klass = _import(value['__object__'])
+        obj = klass.__new__(klass)
+        restore_object(obj, {name: _decode(item, arrays) for name, item in value['state'].items()})
+        return obj
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save(obj, path: str) -> None:
+    """Writes the state of an object to a file: a short preamble, a JSON header, then the raw arrays.
+
+    Each array is stored contiguously, aligned on 64 bytes, so that it can be memory-mapped when loading.
+    """
+    arrays = {}
+    state = _encode(obj, 'state', arrays)
+
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout.append({'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset})
+        offset = _aligned(offset + array.nbytes)
+
+    header = json.dumps({'state': state, 'arrays': layout}).encode('utf-8')
+    data_start = _aligned(_PREAMBLE.size + len(header))
+
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for entry in layout:
+            f.seek(data_start + entry['offset'])
+            f.write(arrays[entry['name']].tobytes())
+
+
+def load(path: str, mmap: Union[bool, str] = True) -> object:
+    """Reads an object written by `save`.
+
+    If `mmap` is true, arrays are memory-mapped read-only: the operating system shares them between processes, and
+    they are only read from disk when needed. With `mmap='c'`, they are mapped copy-on-write: they can be modified, but
+    the changes are private and not written back to the file. Otherwise, arrays are read into memory.
+    """
+    with open(path, 'rb') as f:
+        magic, version, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError("{} is not a scikit-bandit checkpoint.".format(path))
+        if version > FORMAT_VERSION:
+            raise ValueError("{} uses the checkpoint format {}, only versions up to {} are supported."
+                             .format(path, version, FORMAT_VERSION))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+        data_start = _aligned(_PREAMBLE.size + header_length)
+
+        arrays = {}
+        for entry in header['arrays']:
+            dtype = np.dtype(entry['dtype'])
+            shape = tuple(entry['shape'])
+            offset = data_start + entry['offset']
+            count = int(np.prod(shape))
+
+            if mmap and count > 0:
+                arrays[entry['name']] = np.memmap(path, dtype=dtype, mode='c' if mmap == 'c' else 'r', offset=offset,
+                                                  shape=shape)
+            else:
+                f.seek(offset)
+                arrays[entry['name']] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+
+    return _decode(header['state'], arrays)
@@ -0,0 +1,148 @@
+from abc import abstractmethod
+from typing import Union, List, Dict
+
+import math
+import numpy as np
+
+from skbandit.bandits.base import Bandit, RewardAccumulatorMixin
+
+
+class TopKOracle:
+    """Selects the `k` arms with the highest scores, from the best to the worst.
+
+    The `k` arms are found with `np.argpartition`, in O(K) operations for K arms; only these `k` arms are then sorted.
+    """
+
+    def __init__(self, k: int):
+        if k < 1:
+            raise AssertionError("At least one arm must be selected.")
+        self._k = k
+
+    @property
+    def k(self) -> int:
+        return self._k
+
+    def __call__(self, scores: np.ndarray) -> List[int]:
+        if self._k >= scores.shape[0]:
+            top = np.arange(scores.shape[0])
+        else:
+            top = np.argpartition(-scores, self._k - 1)[:self._k]
+        return top[np.argsort(-scores[top], kind='stable')].tolist()
+
+
+class PartitionMatroidOracle:
+    """Selects, within each group of arms, the `capacities[g]` arms with the highest scores of the group `g`: this is
+    the best independent set of a partition matroid (for nonnegative scores).
+
+    `groups` gives the group of each arm (integers, starting at 0). Arms are returned group by group, from the best
+    to the worst within each group.
+
+    The arms of each group are found with `np.argpartition` on the scores of the group, in O(K) operations overall;
+    only the selected arms are then sorted.
+    """
+
+    def __init__(self, groups: np.ndarray, capacities: np.ndarray):
+        self._groups = np.asarray(groups, dtype=np.int64)
+        self._capacities = np.asarray(capacities, dtype=np.int64)
+        if self._groups.min() < 0 or self._groups.max() >= self._capacities.shape[0]:
+            raise AssertionError("Each group must have a capacity.")
+
+        # Arms of each group, in increasing order.
+        order = np.argsort(self._groups, kind='stable')
+        sizes = np.bincount(self._groups, minlength=self._capacities.shape[0])
+        self._parts = np.split(order, np.cumsum(sizes)[:-1])
+
+    def __call__(self, scores: np.ndarray) -> List[int]:
+        selected = []
+        for part, capacity in zip(self._parts, self._capacities.tolist()):
+            if capacity <= 0:
+                continue
+            part_scores = scores[part]
+            if capacity >= part.shape[0]:
+                top = np.arange(part.shape[0])
+            else:
+                top = np.argpartition(-part_scores, capacity - 1)[:capacity]
+            # Decreasing score, then increasing arm.
+            selected.extend(part[top[np.lexsort((top, -part_scores[top]))]].tolist())
+        return selected
+
+
+class CombinatorialBandit(Bandit, RewardAccumulatorMixin):
+    """Player for combinatorial semi-bandits: at each round, it plays a set of arms (a super-arm), chosen by an
+    `oracle` from a score per arm, then observes the reward of each played arm.
+
+    The oracle is any callable that takes the scores (an array of shape `(n_arms,)`) and returns the list of arms to
+    play, like `TopKOracle` or `PartitionMatroidOracle`. Subclasses compute the scores, with `_scores`. The feedback
+    (a dictionary from the played arms to their rewards) is accumulated with one vectorised update.
+    """
+
+    def __init__(self, n_arms: int, oracle):
+        Bandit.__init__(self, n_arms)
+        RewardAccumulatorMixin.__init__(self, n_arms)
+
+        self._oracle = oracle
+        self._current_round = 0
+
+    @property
+    def oracle(self):
+        return self._oracle
+
+    @abstractmethod
+    def _scores(self) -> np.ndarray:
+        """Computes the score of each arm at the current round (starting at 1)."""
+        pass
+
+    def pull(self, **kwargs) -> List[int]:
+        self._current_round += 1
+        return self._oracle(self._scores())
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        RewardAccumulatorMixin.reward(self, arm, reward)
+
+    def rewards(self, reward: Union[List[float], Dict[int, float]], context: Union[None, np.ndarray] = None) -> None:
+        if isinstance(reward, dict):
+            arms = np.fromiter(reward.keys(), dtype=np.int64, count=len(reward))
+            rewards = np.fromiter(reward.values(), dtype=float, count=len(reward))
+        else:  # Full information: one reward per arm.
+            rewards = np.asarray(reward, dtype=float)
+            arms = np.arange(rewards.shape[0])
+        RewardAccumulatorMixin.reward_batch(self, arms, rewards)
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        RewardAccumulatorMixin.reward_batch(self, arms, rewards)
+
+
+class CombinatorialUCB(CombinatorialBandit):
+    """CUCB player: the score of each arm is its empirical mean plus sqrt(3 log(t) / (2 n)), with n the number of
+    times the arm was played; arms that were never played have an infinite score.
+
+    Its regret scales logarithmically with the number of rounds, for rewards in [0, 1] and super-arm rewards that are
+    monotone and smooth in the means (like sums).
+
+    See also: Chen, Wang, Yuan, Combinatorial multi-armed bandit: general framework, results and applications, ICML
+    2013.
+    """
+
+    def _scores(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bonus = np.sqrt(1.5 * math.log(self._current_round) / self._arm_counts)
+        return np.where(self._arm_counts == 0, math.inf, self._means + bonus)
+
+
+class CombinatorialThompsonSampling(CombinatorialBandit):
+    """Combinatorial Thompson sampling for rewards in [0, 1], with a Beta(alpha, beta) prior on the mean reward of
+    each arm: the score of each arm is drawn from its posterior.
+
+    See also: Wang, Chen, Thompson sampling for combinatorial semi-bandits, ICML 2018.
+    """
+
+    def __init__(self, n_arms: int, oracle, alpha: float = 1.0, beta: float = 1.0,
+                 random_state: Union[None, int, np.random.Generator] = None):
+        super().__init__(n_arms, oracle)
+        self._prior_alpha = alpha
+        self._prior_beta = beta
+        self._rng = np.random.default_rng(random_state)
+
+    def _scores(self) -> np.ndarray:
+        return self._rng.beta(self._prior_alpha + self._total_rewards,
+                              self._prior_beta + self._arm_counts - self._total_rewards)
@@ -1,25 +1,69 @@
-from typing import Union
-
 import math
+from typing import Union, Dict, Tuple
+
 import numpy as np
 
-from skbandit.bandits import Bandit
+from skbandit.bandits import Bandit, checkpoint
+
+
+class LinearStatistics:
+    """Statistics of the rewards of a contextual linear bandit, accumulated apart from it, then merged into it with
+    `merge_statistics`: for each arm, the sum of the outer products of its contexts (the increment of its design
+    matrix A) and the sum of its contexts weighted by the rewards (the increment of b).
+
+    A reward costs O(n_features^2) operations; merging inverts one design matrix per rewarded arm.
+    """
+
+    __slots__ = ('counts', 'A', 'b', 'n_rewards')
+
+    def __init__(self, n_arms: int, n_features: int):
+        self.counts = np.zeros(n_arms, dtype=np.int64)
+        self.A = np.zeros((n_arms, n_features, n_features))
+        self.b = np.zeros((n_arms, n_features))
+        self.n_rewards = 0
+
+    def add(self, arm: int, reward: float, context: Union[None, np.ndarray] = None) -> None:
+        self.counts[arm] += 1
+        self.A[arm] += np.outer(context, context)
+        self.b[arm] += reward * context
+        self.n_rewards += 1
+
+    def add_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        arms = np.asarray(arms, dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=float)
+        np.add.at(self.counts, arms, 1)
+        np.add.at(self.A, arms, contexts[:, :, None] * contexts[:, None, :])
+        np.add.at(self.b, arms, rewards[:, None] * contexts)
+        self.n_rewards += arms.shape[0]
+
+    def clear(self) -> None:
+        self.counts[:] = 0
+        self.A[:] = 0.0
+        self.b[:] = 0.0
+        self.n_rewards = 0
 
 
 class LinUCB(Bandit):
     """LinUCB player for contextual linear bandits (disjoint model).
 
+    The inverses of the design matrices A are stored for all arms in one array of shape `(n_arms, n_features,
+    n_features)`, and updated with the Sherman-Morrison formula when a reward is received. Hence, both `pull` and
+    `reward` cost O(n_arms * n_features^2) and O(n_features^2) operations, instead of solving linear systems.
+
     Source: http://www.yisongyue.com/courses/cs159/lectures/LinUCB.pdf
     """
 
+    # Maximum number of elements in the intermediate results of pull_batch.
+    _batch_elements = 2 ** 24
+
     def __init__(self, n_arms: int, n_features: int):
         Bandit.__init__(self, n_arms)
 
         self._current_round = 0
         self._n_features = n_features
 
-        self._estimate_A = [np.identity(n_features) for _ in range(n_arms)]
-        self._estimate_b = [np.zeros((n_features, 1)) for _ in range(n_arms)]
+        self._estimate_A_inv = np.tile(np.identity(n_features), (n_arms, 1, 1))
+        self._estimate_b = np.zeros((n_arms, n_features))
 
     def _check_context(self, context: Union[None, np.ndarray]):
         if context is None:
@@ -28,6 +72,13 @@ class LinUCB(Bandit):
         if context.shape != (self._n_features,):
             raise AssertionError("Contextual LinUCB requires a context of {} features.".format(self._n_features))
 
+    def _check_contexts(self, contexts: Union[None, np.ndarray]):
+        if contexts is None:
+            raise AssertionError("Contextual LinUCB requires contexts.")
+
+        if contexts.ndim != 2 or contexts.shape[1] != self._n_features:
+            raise AssertionError("Contextual LinUCB requires contexts of {} features.".format(self._n_features))
+
     def pull(self, context: Union[None, np.ndarray] = None) -> int:
         self._check_context(context)
 
@@ -38,18 +89,383 @@ class LinUCB(Bandit):
             return self._current_round - 1
 
         # UCB phase.
-        # Parameters are estimated as: A^-1 * b
-        estimated_params = [np.linalg.solve(self._estimate_A[arm], self._estimate_b[arm]) for arm in range(self.n_arms)]
-        # Confidence term is (x: context): sqrt(x A^-1 x) = sqrt(y x), letting y = x A^-1
-        index = [
-            estimated_params[arm] @ context + math.sqrt(np.linalg.solve(self._estimate_A[arm], context) @ context)
-            for arm in range(self.n_arms)
-        ]
+        # Parameters are estimated as: A^-1 b, hence the estimated reward is b A^-1 x = b y, letting y = A^-1 x
+        # (A is symmetric). Confidence term is (x: context): sqrt(x A^-1 x) = sqrt(y x).
+        y = self._estimate_A_inv @ context
+        index = np.einsum('ki,ki->k', self._estimate_b, y) + np.sqrt(y @ context)
+
+        return int(np.argmax(index))
+
+    def pull_batch(self, contexts: Union[None, np.ndarray] = None, n: Union[None, int] = None) -> np.ndarray:
+        self._check_contexts(contexts)
+
+        n_contexts = contexts.shape[0]
+        rounds = self._current_round + 1 + np.arange(n_contexts)
+        self._current_round += n_contexts
+
+        # Initialisation phase: explore once each arm (the first rounds of the batch, if any).
+        arms = rounds - 1
+        ucb = rounds >= self.n_arms
+        if not np.any(ucb):
+            return arms
 
-        return max(range(self.n_arms), key=lambda arm: index[arm])
+        # UCB phase. All indices are computed with one matrix product of the contexts with the inverses of the design
+        # matrices and with the estimated parameters, laid out side by side: [A_0^-1, ..., A_(K-1)^-1, A^-1 b].
+        # The batch is cut into chunks to bound the size of the result of the product.
+        d = self._n_features
+        estimated_params = np.einsum('kij,kj->ki', self._estimate_A_inv, self._estimate_b)
+        weights = np.concatenate((self._estimate_A_inv.transpose(1, 0, 2).reshape(d, self.n_arms * d),
+                                  estimated_params.T), axis=1)
+
+        ucb_contexts = contexts[ucb]
+        ucb_arms = np.empty(ucb_contexts.shape[0], dtype=np.int64)
+        chunk = max(1, self._batch_elements // weights.shape[1])
+        for start in range(0, ucb_contexts.shape[0], chunk):
+            x = ucb_contexts[start:start + chunk]
+            product = x @ weights
+            y = product[:, :self.n_arms * d].reshape(x.shape[0], self.n_arms, d)
+            index = product[:, self.n_arms * d:] + np.sqrt(np.einsum('nki,ni->nk', y, x))
+            ucb_arms[start:start + chunk] = np.argmax(index, axis=1)
+
+        arms[ucb] = ucb_arms
+        return arms
 
     def reward(self, arm: int, reward: float, context: Union[None, np.ndarray] = None) -> None:
         self._check_context(context)
 
-        self._estimate_A[arm] += context @ context.T
-        self._estimate_b[arm] += reward * context.T
+        # Sherman-Morrison: (A + x x^T)^-1 = A^-1 - (A^-1 x) (A^-1 x)^T / (1 + x A^-1 x).
+        y = self._estimate_A_inv[arm] @ context
+        self._estimate_A_inv[arm] -= np.outer(y, y) / (1 + y @ context)
+        self._estimate_b[arm] += reward * context
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        self._check_contexts(contexts)
+        arms = np.asarray(arms)
+        rewards = np.asarray(rewards, dtype=float)
+
+        # Group the requests by arm, so that each arm gets one update for the whole batch.
+        order = np.argsort(arms, kind='stable')
+        unique_arms, starts, counts = np.unique(arms[order], return_index=True, return_counts=True)
+
+        for arm, start, count in zip(unique_arms, starts, counts):
+            rows = order[start:start + count]
+            x = contexts[rows]
+            A_inv = self._estimate_A_inv[arm]
+
+            if count < self._n_features:
+                # Woodbury: (A + X^T X)^-1 = A^-1 - A^-1 X^T (I + X A^-1 X^T)^-1 X A^-1.
+                y = x @ A_inv
+                self._estimate_A_inv[arm] = A_inv - y.T @ np.linalg.solve(np.identity(count) + y @ x.T, y)
+            else:
+                # With more requests than features, inverting the updated design matrix is cheaper.
+                self._estimate_A_inv[arm] = np.linalg.inv(np.linalg.inv(A_inv) + x.T @ x)
+
+            self._estimate_b[arm] += rewards[rows] @ x
+
+    def new_statistics(self) -> LinearStatistics:
+        """Returns empty statistics, to accumulate rewards apart from this bandit (see `merge_statistics`)."""
+        return LinearStatistics(self.n_arms, self._n_features)
+
+    def merge_statistics(self, statistics: LinearStatistics) -> None:
+        """Learns from all the rewards accumulated in `statistics`, as `reward_batch` would."""
+        arms = np.flatnonzero(statistics.counts)
+        if arms.shape[0] == 0:
+            return
+        self._estimate_A_inv[arms] = np.linalg.inv(np.linalg.inv(self._estimate_A_inv[arms]) + statistics.A[arms])
+        self._estimate_b[arms] += statistics.b[arms]
+
+
+class SparseLinUCB(Bandit):
+    """LinUCB player for contextual linear bandits (disjoint model) with sparse, high-dimensional contexts, like
+    hashed features.
+
+    Contexts are either SciPy sparse matrices (any format with a `tocsr` method: one row per context) or dense
+    arrays. The design matrix of each arm is approximated by its diagonal, which ignores the correlations between
+    features: the index of an arm is then a sum over the nonzero features of the context only, and a reward only
+    updates the nonzero features of the context.
+
+    Statistics are only stored for the features that appeared in a reward: one row per feature, with one column per
+    arm (the diagonal of the design matrices and the vectors b). Hence, the memory grows with the number of distinct
+    features that were seen, not with `n_features`; features that were never seen have the prior values (a diagonal
+    of one, a zero b).
+    """
+
+    # Maximum number of elements in the intermediate results of pull_batch.
+    _batch_elements = 2 ** 24
+
+    def __init__(self, n_arms: int, n_features: int, alpha: float = 1.0):
+        Bandit.__init__(self, n_arms)
+
+        self._current_round = 0
+        self._n_features = n_features
+        self._alpha = alpha
+
+        # Row of each feature that was seen, in the arrays of shape (capacity, n_arms). The capacity is doubled when
+        # needed.
+        self._n_rows = 0
+        self._features = np.zeros(64, dtype=np.int64)  # Feature of each row.
+        self._rows = {}
+        self._diagonal = np.ones((64, n_arms))
+        self._b = np.zeros((64, n_arms))
+
+    def _get_state(self):
+        # The dictionary of the rows is not saved: it is rebuilt from the features when first needed.
+        state = checkpoint.attributes(self)
+        state['_rows'] = None
+        return state
+
+    @property
+    def n_seen_features(self) -> int:
+        return self._n_rows
+
+    def _row_map(self) -> Dict[int, int]:
+        if self._rows is None:
+            self._rows = {feature: row for row, feature in enumerate(self._features[:self._n_rows].tolist())}
+        return self._rows
+
+    def _coordinates(self, contexts, single: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the nonzero coordinates of the contexts, like a CSR matrix: the features and values of the i-th
+        context are at `indptr[i]:indptr[i + 1]` in `indices` and `values`.
+        """
+        if contexts is None:
+            raise AssertionError("Sparse LinUCB requires a context.")
+
+        sparse = hasattr(contexts, 'tocsr')  # SciPy sparse matrix (or array), in any format.
+        if not sparse:
+            contexts = np.asarray(contexts)
+
+        shape = contexts.shape
+        if single and shape not in [(self._n_features,), (1, self._n_features)]:
+            raise AssertionError("Sparse LinUCB requires a context of {} features.".format(self._n_features))
+        if not single and (len(shape) != 2 or shape[1] != self._n_features):
+            raise AssertionError("Sparse LinUCB requires contexts of {} features.".format(self._n_features))
+
+        if sparse:
+            matrix = contexts.tocsr()
+            matrix.sum_duplicates()
+            indptr, indices, values = matrix.indptr, matrix.indices, matrix.data
+        else:
+            dense = contexts.reshape(-1, self._n_features)
+            requests, indices = np.nonzero(dense)
+            indptr = np.concatenate(([0], np.cumsum(np.bincount(requests, minlength=dense.shape[0]))))
+            values = dense[requests, indices]
+        return np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64), \
+            np.asarray(values, dtype=float)
+
+    def _lookup(self, features: np.ndarray, insert: bool) -> np.ndarray:
+        """Returns the row of each feature: -1 for those that were never seen, unless `insert`."""
+        # Look up each distinct feature only once.
+        features, inverse = np.unique(features, return_inverse=True)
+        rows_map = self._row_map()
+        rows = np.fromiter((rows_map.get(feature, -1) for feature in features.tolist()), dtype=np.int64,
+                           count=features.shape[0])
+
+        new = rows < 0
+        if insert and np.any(new):
+            n_rows = self._n_rows + int(np.count_nonzero(new))
+            if n_rows > self._features.shape[0]:
+                capacity = max(n_rows, 2 * self._features.shape[0])
+                extra = capacity - self._features.shape[0]
+                self._features = np.concatenate((self._features, np.zeros(extra, dtype=np.int64)))
+                self._diagonal = np.concatenate((self._diagonal, np.ones((extra, self.n_arms))))
+                self._b = np.concatenate((self._b, np.zeros((extra, self.n_arms))))
+
+            rows[new] = np.arange(self._n_rows, n_rows)
+            self._features[self._n_rows:n_rows] = features[new]
+            rows_map.update(zip(features[new].tolist(), range(self._n_rows, n_rows)))
+            self._n_rows = n_rows
+        return rows[inverse]
+
+    def _indices(self, indptr: np.ndarray, features: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Computes the index of each arm for each context, of shape `(n_contexts, n_arms)`."""
+        n = indptr.shape[0] - 1
+        rows = self._lookup(features, insert=False)
+        known = rows >= 0
+        requests = np.repeat(np.arange(n), np.diff(indptr))
+
+        # Features that were never seen contribute equally to the variances of all arms (and not to the means).
+        variances = np.empty((n, self.n_arms))
+        variances[:] = np.bincount(requests[~known], weights=values[~known] ** 2, minlength=n)[:, np.newaxis]
+        means = np.zeros((n, self.n_arms))
+
+        requests, rows, values = requests[known], rows[known], values[known, np.newaxis]
+        if rows.shape[0] > 0:
+            # Sum the contributions of the features of each context: x_j b_j / D_j and x_j^2 / D_j.
+            diagonal = self._diagonal[rows]
+            nonempty, starts = np.unique(requests, return_index=True)
+            means[nonempty] = np.add.reduceat(values * self._b[rows] / diagonal, starts, axis=0)
+            variances[nonempty] += np.add.reduceat(values ** 2 / diagonal, starts, axis=0)
+
+        return means + self._alpha * np.sqrt(variances)
+
+    def pull(self, context=None) -> int:
+        indptr, features, values = self._coordinates(context, single=True)
+
+        self._current_round += 1
+
+        # Initialisation phase: explore once each arm.
+        if self._current_round < self.n_arms:
+            return self._current_round - 1
+
+        return int(np.argmax(self._indices(indptr, features, values)[0]))
+
+    def pull_batch(self, contexts=None, n: Union[None, int] = None) -> np.ndarray:
+        indptr, features, values = self._coordinates(contexts, single=False)
+
+        n_contexts = indptr.shape[0] - 1
+        rounds = self._current_round + 1 + np.arange(n_contexts)
+        self._current_round += n_contexts
+
+        # Initialisation phase: explore once each arm (the first rounds of the batch, if any).
+        arms = rounds - 1
+        ucb = np.flatnonzero(rounds >= self.n_arms)
+
+        # UCB phase, by chunks of contexts, to bound the size of the contributions of the features.
+        nnz = max(1, int(np.max(np.diff(indptr), initial=0)))
+        chunk = max(1, self._batch_elements // (nnz * self.n_arms))
+        for start in range(0, ucb.shape[0], chunk):
+            selected = ucb[start:start + chunk]
+            begin, end = indptr[selected[0]], indptr[selected[-1] + 1]
+            arms[selected] = np.argmax(self._indices(indptr[selected[0]:selected[-1] + 2] - begin,
+                                                     features[begin:end], values[begin:end]), axis=1)
+        return arms
+
+    def _learn(self, arms: np.ndarray, rewards: np.ndarray, indptr: np.ndarray, features: np.ndarray,
+               values: np.ndarray) -> None:
+        rows = self._lookup(features, insert=True)
+        requests = np.repeat(np.arange(indptr.shape[0] - 1), np.diff(indptr))
+        np.add.at(self._diagonal, (rows, arms[requests]), values ** 2)
+        np.add.at(self._b, (rows, arms[requests]), rewards[requests] * values)
+
+    def reward(self, arm: int, reward: float, context=None) -> None:
+        self._learn(np.array([arm]), np.array([reward], dtype=float), *self._coordinates(context, single=True))
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts=None) -> None:
+        # Statistics are sums, hence the updates of all requests are applied at once.
+        self._learn(np.asarray(arms), np.asarray(rewards, dtype=float), *self._coordinates(contexts, single=False))
+
+
+def _cholesky_update(L: np.ndarray, x: np.ndarray) -> None:
+    """Replaces the lower-triangular Cholesky factor L of a matrix A by the one of A + x x^T, in place, in O(n^2)
+    operations. `x` is overwritten.
+
+    See also: Golub, Van Loan, Matrix computations, section 6.5.4.
+    """
+    for k in range(L.shape[0]):
+        r = math.hypot(L[k, k], x[k])
+        c = r / L[k, k]
+        s = x[k] / L[k, k]
+        L[k, k] = r
+        L[k + 1:, k] = (L[k + 1:, k] + s * x[k + 1:]) / c
+        x[k + 1:] = c * x[k + 1:] - s * L[k + 1:, k]
+
+
+def _solve_triangular_batch(L: np.ndarray, y: np.ndarray, transpose: bool = False) -> np.ndarray:
+    """Solves L_i z_i = y_i (or L_i^T z_i = y_i, if `transpose`) for a stack of lower-triangular matrices L of shape
+    `(m, n, n)` and right-hand sides y of shape `(m, n)`, by substitution: the loop is over the n rows, each step
+    being vectorised over the m systems.
+    """
+    z = np.empty_like(y)
+    n = L.shape[1]
+    for i in (range(n - 1, -1, -1) if transpose else range(n)):
+        if transpose:
+            dot = np.einsum('mj,mj->m', L[:, i + 1:, i], z[:, i + 1:])
+        else:
+            dot = np.einsum('mj,mj->m', L[:, i, :i], z[:, :i])
+        z[:, i] = (y[:, i] - dot) / L[:, i, i]
+    return z
+
+
+class HybridLinUCB(Bandit):
+    """LinUCB player for contextual linear bandits (hybrid model): the expected reward of an arm a is z^T beta +
+    x^T theta_a, with z the `n_shared_features` shared features (their parameters beta are learnt from all arms) and
+    x the `n_features` features of the arm (theta_a is only learnt from the rewards of a). Arms with little data
+    hence benefit from the others through beta.
+
+    The context is either one vector of `n_shared_features + n_features` features (z then x, the same for all
+    arms), or a matrix with one such row per arm.
+
+    The design matrices are stored as Cholesky factors: one of shape `(n_features, n_features)` per arm, and one of
+    shape `(n_shared_features, n_shared_features)` for the shared block (the Schur complement of the per-arm
+    blocks). A reward changes each of them by a rank-one update, in O(n_features^2 + n_shared_features^2 +
+    n_features n_shared_features) operations: the changes of the per-arm blocks in the Schur complement combine into
+    one positive rank-one term, so that no downdate is needed. For a decision, the shared parameters are estimated once (until the
+    next reward), then the indices of all arms are computed with one triangular solve of the shared block (with one
+    right-hand side per arm) and substitutions vectorised over the arms.
+
+    See also: Li, Chu, Langford, Schapire, A contextual-bandit approach to personalized news article
+    recommendation, WWW 2010 (algorithm 2).
+    """
+
+    def __init__(self, n_arms: int, n_features: int, n_shared_features: int, alpha: float = 1.0):
+        Bandit.__init__(self, n_arms)
+
+        self._n_features = n_features
+        self._n_shared_features = n_shared_features
+        self._alpha = alpha
+
+        # Per arm: A_a = L_a L_a^T (features of the arm), B_a (features of the arm times shared ones), b_a.
+        self._arm_L = np.tile(np.identity(n_features), (n_arms, 1, 1))
+        self._arm_B = np.zeros((n_arms, n_features, n_shared_features))
+        self._arm_b = np.zeros((n_arms, n_features))
+
+        # Shared block: A_0 = L_0 L_0^T = I + sum z z^T - sum_a B_a^T A_a^-1 B_a, and b_0.
+        self._shared_L = np.identity(n_shared_features)
+        self._shared_b = np.zeros(n_shared_features)
+        self._beta = None  # Estimated shared parameters, A_0^-1 b_0 (computed when first needed).
+
+    def _split_context(self, context: Union[None, np.ndarray]):
+        """Returns the shared features and the features of the arms, each with one row per arm."""
+        if context is None:
+            raise AssertionError("Hybrid LinUCB requires a context.")
+
+        n_total = self._n_shared_features + self._n_features
+        if context.shape == (n_total,):
+            context = np.broadcast_to(context, (self.n_arms, n_total))
+        elif context.shape != (self.n_arms, n_total):
+            raise AssertionError("Hybrid LinUCB requires a context of {} features, or one per arm."
+                                 .format(n_total))
+        return context[:, :self._n_shared_features], context[:, self._n_shared_features:]
+
+    def _shared_parameters(self) -> np.ndarray:
+        if self._beta is None:
+            from scipy.linalg import cho_solve
+            self._beta = cho_solve((self._shared_L, True), self._shared_b)
+        return self._beta
+
+    def pull(self, context: Union[None, np.ndarray] = None) -> int:
+        from scipy.linalg import solve_triangular
+
+        z, x = self._split_context(context)
+        beta = self._shared_parameters()
+
+        # With w = L_a^-1 x: x^T A_a^-1 x = w^T w, and x^T theta_a = x^T A_a^-1 (b_a - B_a beta) = w^T L_a^-1 (b_a -
+        # B_a beta). With q = B_a^T A_a^-1 x, the variance of the estimated reward is (z - q)^T A_0^-1 (z - q) +
+        # x^T A_a^-1 x.
+        w = _solve_triangular_batch(self._arm_L, x)
+        residual = _solve_triangular_batch(self._arm_L, self._arm_b - self._arm_B @ beta)
+        q = np.einsum('kij,ki->kj', self._arm_B, _solve_triangular_batch(self._arm_L, w, transpose=True))
+        shared = solve_triangular(self._shared_L, (z - q).T, lower=True, check_finite=False)
+
+        variance = np.einsum('jk,jk->k', shared, shared) + np.einsum('ki,ki->k', w, w)
+        index = z @ beta + np.einsum('ki,ki->k', w, residual) + self._alpha * np.sqrt(variance)
+        return int(np.argmax(index))
+
+    def reward(self, arm: int, reward: float, context: Union[None, np.ndarray] = None) -> None:
+        z, x = self._split_context(context)
+        z, x = z[arm], x[arm]
+        L = self._arm_L[arm]
+
+        # Adding (x, z) (x, z)^T to the design matrix changes the shared block by a rank-one update, c c^T / (1 +
+        # x^T A_a^-1 x) with c = z - B_a^T A_a^-1 x (and b_0 by c (r - b_a^T A_a^-1 x) / (1 + x^T A_a^-1 x)).
+        w = _solve_triangular_batch(L[np.newaxis], x[np.newaxis])
+        v = _solve_triangular_batch(L[np.newaxis], w, transpose=True)[0]
+        denominator = 1 + w[0] @ w[0]
+        c = z - self._arm_B[arm].T @ v
+        self._shared_b += c * (reward - self._arm_b[arm] @ v) / denominator
+        _cholesky_update(self._shared_L, c / math.sqrt(denominator))
+        self._beta = None
+
+        _cholesky_update(L, x.copy())
+        self._arm_B[arm] += np.outer(x, z)
+        self._arm_b[arm] += reward * x
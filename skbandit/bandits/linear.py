@@ -1,4 +1,7 @@
 import math
+from typing import Union
+
+import numpy as np
 
 from skbandit.bandits import Bandit, RewardAccumulatorMixin
 
@@ -19,14 +22,15 @@ class LinUCB(Bandit, RewardAccumulatorMixin):
         self._current_round += 1
 
         # Initialisation phase: explore once each arm.
-        if self._current_round < self.n_arms:
+        if self._current_round <= self.n_arms:
             return self._current_round - 1
 
         # UCB phase.
-        estimated_rewards = [self.total_rewards[arm] / self.arm_counts[arm] for arm in range(self.n_arms)]
-        index = [
-            estimated_rewards[arm] + math.sqrt(2 * math.log(self._current_round) / self.arm_counts[arm])
-            for arm in range(self.n_arms)
-        ]
+        index = self.means + np.sqrt(2 * math.log(self._current_round) / self.arm_counts)
+        return int(np.argmax(index))
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        RewardAccumulatorMixin.reward(self, arm, reward)
 
-        return max(range(self.n_arms), key=lambda arm: estimated_rewards[arm])
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        RewardAccumulatorMixin.reward_batch(self, arms, rewards)
@@ -1,8 +1,12 @@
-from typing import Union
+from abc import abstractmethod
+from typing import Union, List
 
+import heapq
 import math
+import numpy as np
 
-from skbandit.bandits.base import Bandit, RewardAccumulatorMixin
+from skbandit.bandits import checkpoint
+from skbandit.bandits.base import Bandit, RewardAccumulatorMixin, RewardStatistics
 
 
 class ExploreThenCommitBandit(Bandit, RewardAccumulatorMixin):
@@ -19,6 +23,8 @@ class ExploreThenCommitBandit(Bandit, RewardAccumulatorMixin):
     See also: https://tor-lattimore.com/downloads/book/book.pdf, Chapter 6.
     """
 
+    _decision_attributes = ('_current_round', '_n_remaining_epochs', '_best_arm')
+
     def __init__(self, n_arms: int, n_epochs: Union[int, None] = None, gap: Union[float, None] = None,
                  horizon: Union[int, None] = None):
         Bandit.__init__(self, n_arms)
@@ -50,7 +56,7 @@ class ExploreThenCommitBandit(Bandit, RewardAccumulatorMixin):
         elif self._best_arm is not None:
             arm = self._best_arm
         else:
-            self._best_arm = self.total_rewards.index(max(self.total_rewards))
+            self._best_arm = self.best_arm
             arm = self._best_arm
 
         self._next_round()
@@ -61,13 +67,402 @@ class ExploreThenCommitBandit(Bandit, RewardAccumulatorMixin):
         if self._current_round <= self._n_arms * self._n_epochs:
             RewardAccumulatorMixin.reward(self, arm, reward)
 
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        if self._current_round <= self._n_arms * self._n_epochs:
+            RewardAccumulatorMixin.reward_batch(self, arms, rewards)
+
+    def merge_statistics(self, statistics: RewardStatistics) -> None:
+        if self._current_round <= self._n_arms * self._n_epochs:
+            RewardAccumulatorMixin.merge_statistics(self, statistics)
+
+
+class IndexBandit(Bandit, RewardAccumulatorMixin):
+    """Player that plays each arm once, then always the arm with the highest index (an upper confidence bound on its
+    mean reward). Subclasses only have to compute the indices, with `_indices`.
+
+    Recomputing all indices at each round is too slow with many arms. However, for all the indices implemented here,
+    the index of an arm only depends on its mean reward, on the number of times it was played, and on the round; for
+    a given number of plays, it increases with the mean reward. Hence, arms are grouped by number of plays: within a
+    group, the best arm is the one with the highest mean, whatever the round, and it is kept at the top of a heap.
+    At each round, only the indices of the best arm of each group are computed. When an arm is rewarded, it moves
+    from one group to the next one; outdated entries in the heaps are discarded lazily.
+
+    A reward thus costs O(log K) operations, with K the number of arms, and a pull O(G) vectorised operations, with G
+    the number of distinct play counts (usually much lower than K). The arm that is played always has the highest
+    index.
+    """
+
+    def __init__(self, n_arms: int):
+        Bandit.__init__(self, n_arms)
+        RewardAccumulatorMixin.__init__(self, n_arms)
+
+        self._current_round = 0
+        self._versions = [0] * n_arms  # Only the entries of the heaps with the current version of the arm are valid.
+
+        # One heap per number of plays, of entries (-mean, arm, version). The top of each heap (the best arm of the
+        # group) is stored in arrays, from position 0 to _n_groups - 1; _group_slots gives the position of each group.
+        self._groups = None
+        self._n_entries = 0
+        self._group_slots = {}
+        self._n_groups = 0
+        self._head_counts = np.zeros(0, dtype=np.int64)
+        self._head_means = np.zeros(0)
+        self._head_arms = np.zeros(0, dtype=np.int64)
+
+    def _get_state(self):
+        # The heaps are not saved: they are rebuilt at the next pull.
+        state = checkpoint.attributes(self)
+        state['_groups'] = None
+        return state
+
+    @abstractmethod
+    def _indices(self, means: np.ndarray, counts: np.ndarray, t: int) -> np.ndarray:
+        """Computes the indices at round `t` (starting at 1) of arms with the given mean rewards and play counts."""
+        pass
+
+    def _build_groups(self) -> None:
+        order = np.lexsort((np.arange(self.n_arms), -self._means, self._arm_counts))
+        counts, starts = np.unique(self._arm_counts[order], return_index=True)
+        ends = list(starts[1:]) + [self.n_arms]
+
+        groups = {}
+        for count, start, end in zip(counts.tolist(), starts.tolist(), ends):
+            arms = order[start:end]
+            # Sorted lists are heaps.
+            groups[count] = list(zip((-self._means[arms]).tolist(), arms.tolist(),
+                                     [self._versions[arm] for arm in arms.tolist()]))
+
+        # The best arm of each group is the first one in the order. The groups are set last, so that a concurrent
+        # pull never sees them before the heads (both pulls then build the same groups).
+        heads = order[starts]
+        self._n_entries = self.n_arms
+        self._group_slots = dict(zip(counts.tolist(), range(counts.shape[0])))
+        self._head_counts = counts.astype(np.int64)
+        self._head_means = self._means[heads]
+        self._head_arms = heads
+        self._n_groups = counts.shape[0]
+        self._groups = groups
+
+    def _update_head(self, count: int) -> None:
+        """Updates the best arm of the group of arms played `count` times, after discarding outdated entries."""
+        heap = self._groups[count]
+        while heap and heap[0][2] != self._versions[heap[0][1]]:
+            heapq.heappop(heap)
+            self._n_entries -= 1
+
+        slot = self._group_slots.get(count)
+        if not heap:  # Remove the group, replacing it by the last one.
+            del self._groups[count]
+            del self._group_slots[count]
+            self._n_groups -= 1
+            last = self._n_groups
+            if slot != last:
+                last_count = int(self._head_counts[last])
+                self._group_slots[last_count] = slot
+                self._head_counts[slot] = last_count
+                self._head_means[slot] = self._head_means[last]
+                self._head_arms[slot] = self._head_arms[last]
+            return
+
+        if slot is None:  # New group.
+            slot = self._n_groups
+            self._n_groups += 1
+            self._group_slots[count] = slot
+            if slot >= self._head_counts.shape[0]:
+                size = max(16, 2 * slot)
+                self._head_counts = np.resize(self._head_counts, size)
+                self._head_means = np.resize(self._head_means, size)
+                self._head_arms = np.resize(self._head_arms, size)
+            self._head_counts[slot] = count
+
+        negative_mean, arm, _ = heap[0]
+        self._head_means[slot] = -negative_mean
+        self._head_arms[slot] = arm
+
+    def pull(self, **kwargs) -> int:
+        self._current_round += 1
+        t = self._current_round
+
+        # Initialisation phase: explore once each arm.
+        if t <= self.n_arms:
+            return t - 1
+
+        # UCB phase.
+        if self._groups is None:
+            self._build_groups()
+
+        n = self._n_groups
+        index = self._indices(self._head_means[:n], self._head_counts[:n], t)
+        return int(np.min(self._head_arms[:n][index == np.max(index)]))
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        count = int(self._arm_counts[arm])
+        RewardAccumulatorMixin.reward(self, arm, reward)
+        self._versions[arm] += 1
+
+        if self._groups is None:
+            return
+        elif self._n_entries >= 2 * self.n_arms:  # Too many outdated entries.
+            self._build_groups()
+            return
+
+        # Move the arm to its new group.
+        self._update_head(count)
+        heap = self._groups.setdefault(count + 1, [])
+        heapq.heappush(heap, (-self._means[arm], arm, self._versions[arm]))
+        self._n_entries += 1
+        self._update_head(count + 1)
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        moved = np.unique(np.asarray(arms, dtype=np.int64))
+        counts = self._arm_counts[moved]
+        RewardAccumulatorMixin.reward_batch(self, arms, rewards)
+        self._move_arms(moved, counts)
+
+    def merge_statistics(self, statistics: RewardStatistics) -> None:
+        moved = np.flatnonzero(statistics.counts)
+        counts = self._arm_counts[moved]
+        RewardAccumulatorMixin.merge_statistics(self, statistics)
+        self._move_arms(moved, counts)
+
+    def _move_arms(self, arms: np.ndarray, counts: np.ndarray) -> None:
+        """Moves the given arms, which were played `counts` times before being rewarded, to their new groups."""
+        for arm in arms.tolist():
+            self._versions[arm] += 1
+
+        if self._groups is None:
+            return
+        elif 4 * arms.shape[0] > self.n_arms or self._n_entries + arms.shape[0] >= 2 * self.n_arms:
+            # Many arms changed groups, or too many outdated entries: rebuilding the groups is cheaper.
+            self._build_groups()
+            return
+
+        for arm, count in zip(arms.tolist(), counts.tolist()):
+            if count in self._groups:  # Unless the group was emptied when moving another arm.
+                self._update_head(count)
+            new_count = int(self._arm_counts[arm])
+            heap = self._groups.setdefault(new_count, [])
+            heapq.heappush(heap, (-self._means[arm], arm, self._versions[arm]))
+            self._n_entries += 1
+            self._update_head(new_count)
+
+
+class UCB1(IndexBandit):
+    """UCB1 player: its index is the empirical mean of the arm plus sqrt(2 log(t) / n), with n the number of times
+    the arm was played.
+
+    Its regret scales logarithmically with the number of rounds.
+
+    See also: https://tor-lattimore.com/downloads/book/book.pdf, Chapter 7.
+    """
+
+    def _indices(self, means: np.ndarray, counts: np.ndarray, t: int) -> np.ndarray:
+        with np.errstate(divide='ignore'):
+            return means + np.sqrt(2 * math.log(t) / counts)
+
+
+class MOSS(IndexBandit):
+    """MOSS player: like UCB1, but with an index that depends on the time horizon rather than on the current round.
+
+    Its regret scales as the square root of the number of rounds and of the number of arms, without logarithmic
+    factor. Rewards are supposed to be 1-subgaussian.
+
+    See also: https://tor-lattimore.com/downloads/book/book.pdf, Chapter 9.
+    """
+
+    def __init__(self, n_arms: int, horizon: int):
+        super().__init__(n_arms)
+        self._horizon = horizon
+
+    def _indices(self, means: np.ndarray, counts: np.ndarray, t: int) -> np.ndarray:
+        with np.errstate(divide='ignore'):
+            log_plus = np.maximum(0.0, np.log(self._horizon / (self.n_arms * counts)))
+            return means + np.sqrt(4 / counts * log_plus)
+
+
+class KLUCB(IndexBandit):
+    """KL-UCB player for rewards in [0, 1]: its index is the highest mean that is still plausible, measured by the
+    Kullback-Leibler divergence between Bernoulli distributions, i.e. the largest q such that
+    n d(mean, q) <= log(1 + t log(t)^2).
+
+    Its regret is asymptotically optimal for Bernoulli rewards. Indices are computed by bisection, with a precision of
+    2^-`precision`.
+
+    See also: https://tor-lattimore.com/downloads/book/book.pdf, Chapter 10.
+    """
+
+    def __init__(self, n_arms: int, precision: int = 30):
+        super().__init__(n_arms)
+        self._precision = precision
+
+    def _indices(self, means: np.ndarray, counts: np.ndarray, t: int) -> np.ndarray:
+        with np.errstate(divide='ignore'):
+            level = math.log(1 + t * math.log(t) ** 2) / counts
+
+        means = np.clip(means, 0.0, 1.0)
+        low, high = means, np.ones(means.shape[0])
+        for _ in range(self._precision):
+            q = (low + high) / 2
+            above = _bernoulli_kl(means, q) > level
+            high = np.where(above, q, high)
+            low = np.where(above, low, q)
+        return np.where(counts == 0, math.inf, high)
+
+
+class BudgetedUCB(Bandit, RewardAccumulatorMixin):
+    """Player for budgeted bandits (bandits with knapsacks, for one resource), where playing an arm consumes its
+    known cost (one positive number per arm, in `costs`) from a budget: it plays each arm once, then the arm with the
+    highest ratio between an upper confidence bound on its mean reward (as for UCB1) and its cost, i.e.
+    (mean + sqrt(2 log(t) / n)) / cost.
+
+    Also known as fractional KUBE. Unlike for `IndexBandit`, indices depend on the arm through its cost: they are all
+    computed at each round, with vectorised operations.
+
+    See also: Tran-Thanh, Chapman, Rogers, Jennings, Knapsack based optimal policies for budget-limited multi-armed
+    bandits, AAAI 2012.
+    """
+
+    def __init__(self, n_arms: int, costs: List[float]):
+        Bandit.__init__(self, n_arms)
+        RewardAccumulatorMixin.__init__(self, n_arms)
+
+        if len(costs) != n_arms:
+            raise AssertionError("There must be one cost per arm.")
+        self._costs = np.asarray(costs, dtype=float)
+        self._current_round = 0
+
+    @property
+    def costs(self) -> np.ndarray:
+        return self._costs
+
+    def pull(self, **kwargs) -> int:
+        self._current_round += 1
+        t = self._current_round
+
+        # Initialisation phase: explore once each arm.
+        if t <= self.n_arms:
+            return t - 1
+
+        # UCB phase.
+        with np.errstate(divide='ignore'):
+            ucb = self._means + np.sqrt(2 * math.log(t) / self._arm_counts)
+        return int(np.argmax(ucb / self._costs))
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        RewardAccumulatorMixin.reward(self, arm, reward)
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        RewardAccumulatorMixin.reward_batch(self, arms, rewards)
+
+
+class ThompsonSampling(Bandit, RewardAccumulatorMixin):
+    """Player that draws a mean reward for each arm from its posterior distribution, then plays the arm with the
+    highest draw. Subclasses only have to implement the draws, with `_sample`.
+
+    The posterior distributions are computed from the statistics of `RewardAccumulatorMixin`, and all arms are drawn
+    with one call to a NumPy `Generator` (created from `random_state`). Several decisions can be made at once, from
+    one posterior draw per decision: either for a batch of requests (`pull_batch`), or a set of `k` distinct arms to
+    play together (`pull_top_k`).
+    """
+
+    def __init__(self, n_arms: int, random_state: Union[None, int, np.random.Generator] = None):
+        Bandit.__init__(self, n_arms)
+        RewardAccumulatorMixin.__init__(self, n_arms)
+
+        self._rng = np.random.default_rng(random_state)
+
+    @abstractmethod
+    def _sample(self, size: Union[None, int] = None) -> np.ndarray:
+        """Draws the mean reward of each arm from its posterior: an array of shape `(n_arms,)`, or `(size, n_arms)`."""
+        pass
+
+    def pull(self, **kwargs) -> int:
+        return int(np.argmax(self._sample()))
+
+    def pull_batch(self, contexts: Union[None, np.ndarray] = None, n: Union[None, int] = None) -> np.ndarray:
+        if contexts is not None:
+            n = contexts.shape[0]
+        elif n is None:
+            raise AssertionError("One of contexts or n parameters must be set")
+        return np.argmax(self._sample(n), axis=1)
+
+    def pull_top_k(self, k: int) -> List[int]:
+        """Decide the `k` distinct arms with the highest draws, from the best to the worst."""
+        samples = self._sample()
+        top = np.argpartition(-samples, k - 1)[:k]
+        return top[np.argsort(-samples[top], kind='stable')].tolist()
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        RewardAccumulatorMixin.reward(self, arm, reward)
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        RewardAccumulatorMixin.reward_batch(self, arms, rewards)
+
+
+class BernoulliThompsonSampling(ThompsonSampling):
+    """Thompson sampling for rewards in [0, 1], with a Beta(alpha, beta) prior on the mean reward of each arm.
+
+    For Bernoulli rewards, the posterior is Beta(alpha + successes, beta + failures). Other rewards in [0, 1] are
+    counted as fractional successes.
+
+    See also: https://tor-lattimore.com/downloads/book/book.pdf, Chapter 36.
+    """
+
+    def __init__(self, n_arms: int, alpha: float = 1.0, beta: float = 1.0,
+                 random_state: Union[None, int, np.random.Generator] = None):
+        super().__init__(n_arms, random_state)
+        self._prior_alpha = alpha
+        self._prior_beta = beta
+
+    @property
+    def alpha(self) -> np.ndarray:
+        return self._prior_alpha + self._total_rewards
+
+    @property
+    def beta(self) -> np.ndarray:
+        return self._prior_beta + self._arm_counts - self._total_rewards
+
+    def _sample(self, size: Union[None, int] = None) -> np.ndarray:
+        shape = None if size is None else (size, self.n_arms)
+        return self._rng.beta(self.alpha, self.beta, size=shape)
+
+
+class GaussianThompsonSampling(ThompsonSampling):
+    """Thompson sampling for Gaussian rewards of known variance `noise_variance`, with a Gaussian prior of mean
+    `prior_mean` and variance `prior_variance` on the mean reward of each arm.
+
+    See also: https://tor-lattimore.com/downloads/book/book.pdf, Chapter 36.
+    """
+
+    def __init__(self, n_arms: int, prior_mean: float = 0.0, prior_variance: float = 1.0,
+                 noise_variance: float = 1.0, random_state: Union[None, int, np.random.Generator] = None):
+        super().__init__(n_arms, random_state)
+        self._prior_mean = prior_mean
+        self._prior_variance = prior_variance
+        self._noise_variance = noise_variance
+
+    @property
+    def posterior_variances(self) -> np.ndarray:
+        return 1 / (1 / self._prior_variance + self._arm_counts / self._noise_variance)
+
+    @property
+    def posterior_means(self) -> np.ndarray:
+        return self.posterior_variances * (self._prior_mean / self._prior_variance +
+                                           self._total_rewards / self._noise_variance)
+
+    def _sample(self, size: Union[None, int] = None) -> np.ndarray:
+        shape = None if size is None else (size, self.n_arms)
+        return self._rng.normal(self.posterior_means, np.sqrt(self.posterior_variances), size=shape)
+
+
+def _bernoulli_kl(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Kullback-Leibler divergence between Bernoulli distributions of means p and q."""
+    p = np.clip(p, 1e-15, 1 - 1e-15)
+    q = np.clip(q, 1e-15, 1 - 1e-15)
+    return p * np.log(p / q) + (1 - p) * np.log((1 - p) / (1 - q))
+
 
-# TODO: Thompson sampling
 # TODO: epsilon-greedy
 #   Example source: https://towardsdatascience.com/solving-multiarmed-bandits-a-comparison-of-epsilon-greedy-and-thompson-sampling-d97167ca9a50
 # TODO: softmax-greedy
 #   Example source: https://mpatacchiola.github.io/blog/2017/08/14/dissecting-reinforcement-learning-6.html
-# TODO: UCB
-#   Example source: https://tor-lattimore.com/downloads/book/book.pdf, chapter 7
-# TODO: MOSS
-#   Example source: https://tor-lattimore.com/downloads/book/book.pdf, chapter 9
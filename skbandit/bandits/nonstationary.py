@@ -0,0 +1,331 @@
+from typing import Union
+
+import math
+import numpy as np
+
+from skbandit.bandits.base import Bandit
+
+
+class SlidingWindowAccumulatorMixin:
+    """Accumulates statistics about the last `window` rewards (of all arms): the number of times each arm was
+    rewarded within the window, and its total reward.
+
+    The rewards of the window are kept in a ring buffer: when a reward enters the window, the oldest one leaves it,
+    and the statistics of both arms are updated, in constant time. As subtracting rewards accumulates rounding
+    errors, the totals are recomputed from the buffer once every `window` rewards, which is still constant time on
+    average.
+    """
+
+    __slots__ = ('_window', '_window_arms', '_window_rewards', '_n_rewards', '_window_counts', '_window_totals')
+
+    def __init__(self, n_arms: int, window: int):
+        if window < 1:
+            raise AssertionError("The window must contain at least one reward.")
+
+        self._window = window
+        self._window_arms = np.zeros(window, dtype=np.int64)
+        self._window_rewards = np.zeros(window)
+        self._n_rewards = 0  # The reward number n is stored at the position n % window.
+        self._window_counts = np.zeros(n_arms, dtype=np.int64)
+        self._window_totals = np.zeros(n_arms)
+
+    def _refresh_totals(self) -> None:
+        n = min(self._n_rewards, self._window)
+        self._window_totals = np.bincount(self._window_arms[:n], weights=self._window_rewards[:n],
+                                          minlength=self._window_totals.shape[0])
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        position = self._n_rewards % self._window
+        if self._n_rewards >= self._window:  # The oldest reward leaves the window.
+            old_arm = self._window_arms[position]
+            self._window_counts[old_arm] -= 1
+            self._window_totals[old_arm] -= self._window_rewards[position]
+
+        self._window_arms[position] = arm
+        self._window_rewards[position] = reward
+        self._window_counts[arm] += 1
+        self._window_totals[arm] += reward
+        self._n_rewards += 1
+
+        if self._n_rewards % self._window == 0:
+            self._refresh_totals()
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, **kwargs) -> None:
+        arms = np.asarray(arms, dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=float)
+        n = arms.shape[0]
+        if n == 0:
+            return
+
+        # Only the last `window` rewards of the batch may stay in the window; they replace the oldest ones.
+        kept = min(n, self._window)
+        positions = (self._n_rewards + n - kept + np.arange(kept)) % self._window
+        self._window_arms[positions] = arms[n - kept:]
+        self._window_rewards[positions] = rewards[n - kept:]
+        self._n_rewards += n
+
+        # The buffer is only in order up to a rotation, which does not change the statistics.
+        stored = min(self._n_rewards, self._window)
+        self._window_counts = np.bincount(self._window_arms[:stored], minlength=self._window_counts.shape[0])
+        self._refresh_totals()
+
+    @property
+    def window(self) -> int:
+        return self._window
+
+    @property
+    def window_counts(self) -> np.ndarray:
+        """Number of times each arm was rewarded within the window."""
+        return self._window_counts
+
+    @property
+    def window_totals(self) -> np.ndarray:
+        """Total reward of each arm within the window."""
+        return self._window_totals
+
+    @property
+    def window_means(self) -> np.ndarray:
+        """Mean reward of each arm within the window (zero for arms that were not rewarded within the window)."""
+        return np.divide(self._window_totals, self._window_counts, out=np.zeros_like(self._window_totals),
+                         where=self._window_counts > 0)
+
+
+class DiscountedAccumulatorMixin:
+    """Accumulates discounted statistics about the rewards: each time a reward is received, the previous ones are
+    discounted by `gamma`. The discounted count of an arm is the sum of gamma^age over its rewards (the age of the
+    last reward being 0), and its discounted total the sum of gamma^age times the reward.
+
+    Discounting is applied lazily: the statistics are stored multiplied by a common scale, gamma^-n after n rewards,
+    so that a new reward only updates its arm. When the scale becomes too large, the statistics are brought back to
+    a scale of one, which happens once every log(10^100) / -log(gamma) rewards: a reward thus costs constant time on
+    average, instead of discounting all arms.
+    """
+
+    __slots__ = ('_gamma', '_scale', '_scaled_counts', '_scaled_totals', '_scaled_total_count')
+
+    # Largest scale before the statistics are rescaled.
+    _max_scale = 1e100
+
+    def __init__(self, n_arms: int, gamma: float):
+        if not 0 < gamma <= 1:
+            raise AssertionError("The discount factor must be in (0, 1].")
+
+        self._gamma = gamma
+        self._scale = 1.0
+        self._scaled_counts = np.zeros(n_arms)
+        self._scaled_totals = np.zeros(n_arms)
+        self._scaled_total_count = 0.0
+
+    def _rescale(self, factor: float) -> None:
+        """Multiplies the stored statistics by `factor`, the scale becoming one."""
+        self._scaled_counts *= factor
+        self._scaled_totals *= factor
+        self._scaled_total_count *= factor
+        self._scale = 1.0
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        self._scale /= self._gamma
+        if self._scale > self._max_scale:
+            self._rescale(1 / self._scale)
+        self._scaled_counts[arm] += self._scale
+        self._scaled_totals[arm] += self._scale * reward
+        self._scaled_total_count += self._scale
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, **kwargs) -> None:
+        arms = np.asarray(arms, dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=float)
+        n = arms.shape[0]
+        if n == 0:
+            return
+
+        # The i-th reward of the batch (from 1) is discounted by gamma^(n - i) at the end of the batch.
+        discount = self._gamma ** n
+        scale = self._scale / discount if discount > 0 else math.inf
+        if scale > self._max_scale:
+            self._rescale(discount / self._scale)
+            scale = 1.0
+        self._scale = scale
+
+        weights = scale * self._gamma ** np.arange(n - 1, -1, -1, dtype=float)
+        touched, inverse = np.unique(arms, return_inverse=True)
+        self._scaled_counts[touched] += np.bincount(inverse, weights=weights)
+        self._scaled_totals[touched] += np.bincount(inverse, weights=weights * rewards)
+        self._scaled_total_count += float(np.sum(weights))
+
+    @property
+    def gamma(self) -> float:
+        return self._gamma
+
+    @property
+    def discounted_counts(self) -> np.ndarray:
+        return self._scaled_counts / self._scale
+
+    @property
+    def discounted_totals(self) -> np.ndarray:
+        return self._scaled_totals / self._scale
+
+    @property
+    def discounted_total_count(self) -> float:
+        """Sum of the discounted counts of all arms."""
+        return self._scaled_total_count / self._scale
+
+    @property
+    def discounted_means(self) -> np.ndarray:
+        """Discounted mean reward of each arm (zero for arms that were never rewarded)."""
+        return np.divide(self._scaled_totals, self._scaled_counts, out=np.zeros_like(self._scaled_totals),
+                         where=self._scaled_counts > 0)
+
+
+class SlidingWindowUCB(Bandit, SlidingWindowAccumulatorMixin):
+    """SW-UCB player for nonstationary bandits: like UCB1, but only the last `window` rewards are taken into account.
+    Its index is the mean reward of the arm within the window plus `bound` * sqrt(`xi` log(min(t, window)) / n),
+    with n the number of times the arm was rewarded within the window; arms that were not rewarded within the window
+    have an infinite index. Rewards are supposed to be in [0, `bound`].
+
+    For piecewise-stationary rewards with at most Y change points over T rounds, a window of the order of
+    sqrt(T log(T) / Y) gives a regret of the order of sqrt(T Y log(T)).
+
+    See also: Garivier, Moulines, On upper-confidence bound policies for switching bandit problems, ALT 2011.
+    """
+
+    def __init__(self, n_arms: int, window: int, xi: float = 0.6, bound: float = 1.0):
+        Bandit.__init__(self, n_arms)
+        SlidingWindowAccumulatorMixin.__init__(self, n_arms, window)
+
+        self._current_round = 0
+        self._xi = xi
+        self._bound = bound
+
+    def pull(self, **kwargs) -> int:
+        self._current_round += 1
+
+        counts = self._window_counts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bonus = self._bound * np.sqrt(self._xi * math.log(min(self._current_round, self._window)) / counts)
+        return int(np.argmax(np.where(counts == 0, math.inf, self.window_means + bonus)))
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        SlidingWindowAccumulatorMixin.reward(self, arm, reward)
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        SlidingWindowAccumulatorMixin.reward_batch(self, arms, rewards)
+
+
+class DiscountedUCB(Bandit, DiscountedAccumulatorMixin):
+    """D-UCB player for nonstationary bandits: like UCB1, but past rewards are discounted by `gamma` at each round.
+    Its index is the discounted mean reward of the arm plus 2 `bound` * sqrt(`xi` log(n) / n_a), with n_a the
+    discounted count of the arm and n the sum of the discounted counts of all arms; arms that were never rewarded
+    have an infinite index. Rewards are supposed to be in [0, `bound`].
+
+    For piecewise-stationary rewards with at most Y change points over T rounds, a discount of the order of
+    1 - sqrt(Y / T) / 4 gives a regret of the order of sqrt(T Y) log(T).
+
+    See also: Garivier, Moulines, On upper-confidence bound policies for switching bandit problems, ALT 2011.
+    """
+
+    def __init__(self, n_arms: int, gamma: float, xi: float = 0.6, bound: float = 1.0):
+        Bandit.__init__(self, n_arms)
+        DiscountedAccumulatorMixin.__init__(self, n_arms, gamma)
+
+        self._xi = xi
+        self._bound = bound
+
+    def pull(self, **kwargs) -> int:
+        counts = self.discounted_counts
+        level = max(0.0, math.log(self.discounted_total_count)) if self._scaled_total_count > 0 else 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bonus = 2 * self._bound * np.sqrt(self._xi * level / counts)
+        return int(np.argmax(np.where(counts == 0, math.inf, self.discounted_means + bonus)))
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        DiscountedAccumulatorMixin.reward(self, arm, reward)
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        DiscountedAccumulatorMixin.reward_batch(self, arms, rewards)
+
+
+class _NonstationaryThompsonSampling(Bandit):
+    """Thompson sampling for rewards in [0, 1], with a Beta(alpha, beta) prior on the mean reward of each arm, from
+    statistics that forget the past. Subclasses give the (windowed or discounted) counts and totals of the arms.
+    """
+
+    def __init__(self, n_arms: int, alpha: float, beta: float, random_state: Union[None, int, np.random.Generator]):
+        Bandit.__init__(self, n_arms)
+
+        self._prior_alpha = alpha
+        self._prior_beta = beta
+        self._rng = np.random.default_rng(random_state)
+
+    def _statistics(self) -> (np.ndarray, np.ndarray):
+        """Returns the counts and the totals of the rewards of the arms."""
+        raise NotImplementedError
+
+    @property
+    def alpha(self) -> np.ndarray:
+        _, totals = self._statistics()
+        return self._prior_alpha + totals
+
+    @property
+    def beta(self) -> np.ndarray:
+        counts, totals = self._statistics()
+        # Rounding errors on the totals must not give negative parameters.
+        return self._prior_beta + np.maximum(counts - totals, 0.0)
+
+    def _sample(self, size: Union[None, int] = None) -> np.ndarray:
+        shape = None if size is None else (size, self.n_arms)
+        return self._rng.beta(self.alpha, self.beta, size=shape)
+
+    def pull(self, **kwargs) -> int:
+        return int(np.argmax(self._sample()))
+
+    def pull_batch(self, contexts: Union[None, np.ndarray] = None, n: Union[None, int] = None) -> np.ndarray:
+        if contexts is not None:
+            n = contexts.shape[0]
+        elif n is None:
+            raise AssertionError("One of contexts or n parameters must be set")
+        return np.argmax(self._sample(n), axis=1)
+
+
+class SlidingWindowThompsonSampling(_NonstationaryThompsonSampling, SlidingWindowAccumulatorMixin):
+    """Thompson sampling for rewards in [0, 1] that only takes into account the last `window` rewards: the posterior
+    of each arm is Beta(alpha + successes, beta + failures), counted within the window.
+
+    See also: Trovò, Paladino, Restelli, Gatti, Sliding-window Thompson sampling for non-stationary settings, JAIR
+    2020.
+    """
+
+    def __init__(self, n_arms: int, window: int, alpha: float = 1.0, beta: float = 1.0,
+                 random_state: Union[None, int, np.random.Generator] = None):
+        _NonstationaryThompsonSampling.__init__(self, n_arms, alpha, beta, random_state)
+        SlidingWindowAccumulatorMixin.__init__(self, n_arms, window)
+
+    def _statistics(self) -> (np.ndarray, np.ndarray):
+        return self._window_counts, self._window_totals
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        SlidingWindowAccumulatorMixin.reward(self, arm, reward)
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        SlidingWindowAccumulatorMixin.reward_batch(self, arms, rewards)
+
+
+class DiscountedThompsonSampling(_NonstationaryThompsonSampling, DiscountedAccumulatorMixin):
+    """Thompson sampling for rewards in [0, 1] with discounted statistics: the posterior of each arm is Beta(alpha +
+    successes, beta + failures), each success or failure being discounted by `gamma` at each round.
+
+    See also: Raj, Kalyani, Taming non-stationary bandits: a Bayesian approach, 2017.
+    """
+
+    def __init__(self, n_arms: int, gamma: float, alpha: float = 1.0, beta: float = 1.0,
+                 random_state: Union[None, int, np.random.Generator] = None):
+        _NonstationaryThompsonSampling.__init__(self, n_arms, alpha, beta, random_state)
+        DiscountedAccumulatorMixin.__init__(self, n_arms, gamma)
+
+    def _statistics(self) -> (np.ndarray, np.ndarray):
+        return self.discounted_counts, self.discounted_totals
+
+    def reward(self, arm: int, reward: float, **kwargs) -> None:
+        DiscountedAccumulatorMixin.reward(self, arm, reward)
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        DiscountedAccumulatorMixin.reward_batch(self, arms, rewards)
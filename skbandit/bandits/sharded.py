@@ -0,0 +1,222 @@
+import copy
+import threading
+from typing import Union, List
+
+import numpy as np
+
+from skbandit.bandits.base import Bandit
+
+
+class _RewardLog:
+    """Rewards kept as they were received, for bandits that do not accumulate them in separate statistics (i.e.
+    without `new_statistics` and `merge_statistics` methods). They are merged with one call to `reward_batch`.
+    """
+
+    __slots__ = ('arms', 'rewards', 'contexts', 'n_rewards')
+
+    def __init__(self):
+        self.arms = []
+        self.rewards = []
+        self.contexts = []
+        self.n_rewards = 0
+
+    def add(self, arm: int, reward: float, context: Union[None, np.ndarray] = None) -> None:
+        self.arms.append(arm)
+        self.rewards.append(reward)
+        self.contexts.append(context)
+        self.n_rewards += 1
+
+    def add_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        self.arms.extend(arms)
+        self.rewards.extend(rewards)
+        self.contexts.extend([None] * len(arms) if contexts is None else contexts)
+        self.n_rewards += len(arms)
+
+    def clear(self) -> None:
+        self.arms, self.rewards, self.contexts = [], [], []
+        self.n_rewards = 0
+
+    def replay(self, bandit: Bandit) -> None:
+        # Contextual bandits get all contexts at once; the others, none.
+        has_context = [context is not None for context in self.contexts]
+        if all(has_context):
+            contexts = np.stack(self.contexts)
+        elif not any(has_context):
+            contexts = None
+        else:
+            raise AssertionError("Either all rewards or none must have a context.")
+        bandit.reward_batch(np.array(self.arms), np.array(self.rewards, dtype=float), contexts)
+
+
+class _Shard:
+    """Rewards received by one thread that have not been merged yet. They are accumulated in one of two buffers of
+    statistics: the other one is spare, to be swapped in when the rewards are merged.
+    """
+
+    __slots__ = ('lock', 'statistics', 'spare')
+
+    def __init__(self, statistics, spare):
+        self.lock = threading.Lock()  # Only contended by merges.
+        self.statistics = statistics
+        self.spare = spare
+
+    def take(self):
+        with self.lock:
+            statistics, self.statistics = self.statistics, self.spare
+            self.spare = None
+        return statistics
+
+
+class ShardedBandit(Bandit):
+    """Wraps a bandit so that it can be used by many threads at once, without one global lock for the rewards.
+
+    Each thread has its own shard, where its rewards are accumulated in statistics that are separate from the state
+    of the bandit: the sufficient statistics of the bandit when it has a `new_statistics` method (for instance, the
+    counts and sums of the rewards of each arm for players based on `RewardAccumulatorMixin`, the increments of the
+    design matrices for contextual LinUCB), the rewards themselves otherwise. Once a thread has `merge_every` pending
+    rewards, the statistics of all shards are merged into the bandit (with its `merge_statistics` method, or with one
+    call to `reward_batch`); `flush()` merges them immediately. Each shard has two buffers of statistics: the merged
+    one is cleared and reused.
+
+    Decisions never wait for a merge. There are two copies of the bandit: decisions are made by the published one,
+    behind a lock that is only held for decisions, while rewards are merged into the other one. The copies are then
+    swapped (with the decision state of the published one, like the round counter, see `Bandit.decision_state`),
+    and the same statistics are merged into the copy that was published. Both copies share their random generators.
+    Decisions are made with statistics that lag behind by up to `merge_every` rewards per thread: the cadence trades
+    the freshness of the decisions for throughput.
+    """
+
+    def __init__(self, bandit: Bandit, merge_every: int = 1024):
+        if merge_every < 1:
+            raise AssertionError("Rewards must be merged at least once every merge_every rewards.")
+
+        super().__init__(bandit.n_arms)
+        self._bandit = bandit
+        self._standby = self._copy(bandit)
+        self._merge_every = merge_every
+        self._sufficient = hasattr(bandit, 'new_statistics')
+
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._lock = threading.Lock()  # Protects the published bandit, only for decisions and swaps.
+        self._merge_lock = threading.Lock()  # Protects the copy that is not published and the number of merges.
+        self._n_merges = 0
+
+    @staticmethod
+    def _copy(bandit: Bandit) -> Bandit:
+        # Random generators are shared, so that a copy does not draw the same numbers again once published.
+        generators = [value for value in vars(bandit).values()
+                      if isinstance(value, (np.random.Generator, np.random.RandomState))]
+        return copy.deepcopy(bandit, {id(generator): generator for generator in generators})
+
+    @property
+    def bandit(self) -> Bandit:
+        """The bandit used for decisions, with all merged rewards."""
+        return self._bandit
+
+    @property
+    def n_merges(self) -> int:
+        return self._n_merges
+
+    @property
+    def n_pending(self) -> int:
+        """The number of rewards that have not been merged yet, over all shards (approximate while other threads add
+        rewards).
+        """
+        with self._shards_lock:
+            shards = list(self._shards)
+        return sum(shard.statistics.n_rewards for shard in shards)
+
+    def _new_statistics(self):
+        return self._bandit.new_statistics() if self._sufficient else _RewardLog()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = _Shard(self._new_statistics(), self._new_statistics())
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def pull(self, context: Union[None, np.ndarray] = None) -> Union[int, List[int]]:
+        with self._lock:
+            return self._bandit.pull(context=context)
+
+    def pull_batch(self, contexts: Union[None, np.ndarray] = None, n: Union[None, int] = None) -> np.ndarray:
+        with self._lock:
+            return self._bandit.pull_batch(contexts, n)
+
+    def reward(self, arm: int, reward: float, context: Union[None, np.ndarray] = None) -> None:
+        shard = self._shard()
+        with shard.lock:
+            shard.statistics.add(arm, reward, context)
+            n_pending = shard.statistics.n_rewards
+
+        if n_pending >= self._merge_every:
+            self._merge(blocking=False)
+
+    def reward_batch(self, arms: np.ndarray, rewards: np.ndarray, contexts: Union[None, np.ndarray] = None) -> None:
+        shard = self._shard()
+        with shard.lock:
+            shard.statistics.add_batch(arms, rewards, contexts)
+            n_pending = shard.statistics.n_rewards
+
+        if n_pending >= self._merge_every:
+            self._merge(blocking=False)
+
+    def flush(self) -> None:
+        """Merges the pending rewards of all shards into the bandit."""
+        self._merge(blocking=True)
+
+    def save(self, path: str) -> None:
+        """Merges the pending rewards, then writes the state of the wrapped bandit to a file: it is loaded with
+        `Bandit.load`, as a bandit of the wrapped class.
+        """
+        self.flush()
+        with self._lock:
+            self._bandit.save(path)
+
+    def _merge_into(self, bandit: Bandit, statistics: list) -> None:
+        for s in statistics:
+            if self._sufficient:
+                bandit.merge_statistics(s)
+            else:
+                s.replay(bandit)
+
+    def _merge(self, blocking: bool) -> None:
+        # Without blocking, the rewards are left to the merge in progress, if any (or to the next reward).
+        if not self._merge_lock.acquire(blocking):
+            return
+
+        try:
+            with self._shards_lock:
+                shards = list(self._shards)
+
+            taken = [(shard, shard.take()) for shard in shards]
+            try:
+                statistics = [s for _, s in taken if s.n_rewards > 0]
+                if not statistics:
+                    return
+
+                try:
+                    if self._standby is None:  # A previous merge failed: the copies may differ.
+                        with self._lock:
+                            self._standby = self._copy(self._bandit)
+
+                    self._merge_into(self._standby, statistics)
+                    with self._lock:
+                        self._standby.set_decision_state(self._bandit.decision_state())
+                        self._bandit, self._standby = self._standby, self._bandit
+                    self._merge_into(self._standby, statistics)
+                except BaseException:
+                    self._standby = None
+                    raise
+                self._n_merges += 1
+            finally:
+                for shard, s in taken:
+                    s.clear()
+                    shard.spare = s
+        finally:
+            self._merge_lock.release()
@@ -0,0 +1,100 @@
+import numpy as np
+
+
+class SumTree:
+    """Complete binary tree whose leaves are nonnegative weights, each node being the sum of its children.
+
+    It allows to sample an index proportionally to the weights, and to update one weight, both in O(log n) operations
+    (instead of O(n) for renormalising the weights). All weights can also be replaced at once, in O(n) vectorised
+    operations. Several trees, with different weights, can be built and searched at once with `build_many` and
+    `find_many`, with the same results as one tree at a time.
+
+    The nodes are stored in one array: the root is at position 1, the children of the node at position i are at
+    positions 2i and 2i + 1, the leaves start at position `capacity` (the smallest power of two that is at least n).
+    """
+
+    def __init__(self, n: int):
+        self._n = n
+        self._capacity = 1 << max(0, (n - 1).bit_length())
+        self._tree = np.zeros(2 * self._capacity)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def capacity(self) -> int:
+        """The number of leaves of the tree: the smallest power of two that is at least n."""
+        return self._capacity
+
+    @property
+    def total(self) -> float:
+        return self._tree[1]
+
+    @property
+    def weights(self) -> np.ndarray:
+        return self._tree[self._capacity:self._capacity + self._n]
+
+    def weight(self, i: int) -> float:
+        return self._tree[self._capacity + i]
+
+    def set_all(self, weights: np.ndarray) -> None:
+        """Replaces all weights, then recomputes the sums level by level."""
+        tree = self._tree
+        tree[self._capacity:self._capacity + self._n] = weights
+        size = self._capacity
+        while size > 1:
+            half = size // 2
+            tree[half:size] = tree[size:2 * size:2] + tree[size + 1:2 * size:2]
+            size = half
+
+    def update(self, i: int, weight: float) -> None:
+        """Replaces the weight of the i-th leaf, then recomputes the sums on the path to the root."""
+        tree = self._tree
+        node = self._capacity + i
+        tree[node] = weight
+        node //= 2
+        while node >= 1:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node //= 2
+
+    def find(self, u: float) -> int:
+        """Returns the index of the leaf where the cumulative sum of the weights exceeds `u` (between 0 and `total`).
+
+        With `u` drawn uniformly, leaves are drawn proportionally to their weights. Leaves of zero weight are never
+        returned, even when rounding errors put `u` beyond the total weight.
+        """
+        tree = self._tree
+        node = 1
+        while node < self._capacity:
+            left = tree[2 * node]
+            if u < left or tree[2 * node + 1] == 0.0:
+                node = 2 * node
+            else:
+                u -= left
+                node = 2 * node + 1
+        return node - self._capacity
+
+    def build_many(self, weights: np.ndarray) -> np.ndarray:
+        """Builds one tree per row of `weights` (an array of shape `(m, n)`), returned as an array of shape
+        `(m, 2 * capacity)`, without changing this tree.
+        """
+        trees = np.zeros((weights.shape[0], 2 * self._capacity))
+        trees[:, self._capacity:self._capacity + self._n] = weights
+        size = self._capacity
+        while size > 1:
+            half = size // 2
+            trees[:, half:size] = trees[:, size:2 * size:2] + trees[:, size + 1:2 * size:2]
+            size = half
+        return trees
+
+    def find_many(self, trees: np.ndarray, u: np.ndarray) -> np.ndarray:
+        """Like `find`, for each tree built by `build_many` and the corresponding value of `u`."""
+        rows = np.arange(trees.shape[0])
+        node = np.ones(trees.shape[0], dtype=np.int64)
+        # All leaves are at the same depth.
+        for _ in range(self._capacity.bit_length() - 1):
+            left = trees[rows, 2 * node]
+            go_left = (u < left) | (trees[rows, 2 * node + 1] == 0.0)
+            u = np.where(go_left, u, u - left)
+            node = np.where(go_left, 2 * node, 2 * node + 1)
+        return node - self._capacity
@@ -1,4 +1,9 @@
-from .base import *
+from skbandit._lazy import lazy_attributes
 
 __all__ = ["Environment", "EnvironmentNoMoreAcceptingInputsException", "FullInformationEnvironment",
            "SemiBanditFeedbackEnvironment", "BanditFeedbackEnvironment"]
+
+# Module of each exported name: modules are only imported when one of their names is first used.
+_modules = {name: "base" for name in __all__}
+
+__getattr__, __dir__ = lazy_attributes(__name__, globals(), _modules)
@@ -2,6 +2,8 @@ import collections
 from abc import ABC, abstractmethod
 from typing import List, Union
 
+import numpy as np
+
 from skbandit.environments.base import Environment, BanditFeedbackEnvironment, FullInformationEnvironment
 
 
@@ -11,6 +13,10 @@ class Adversary(ABC):
     The adversary decides a reward for each arm, without knowing which arm the bandit is playing: the method
     `decide_rewards` returns a vector of rewards. Then, the adversary learns the arm that was played, in order to
     prepare for future rounds, through the method `register_interaction`.
+
+    The regret is computed from the best reward of the round, `best_reward(rewards)`: by default, the maximum of the
+    decided rewards. An adversary that can only play a limited number of rounds overrides `may_stop_deciding` and
+    `will_decide_rewards`.
     """
 
     def __init__(self, n_arms: int):
@@ -30,6 +36,110 @@ class Adversary(ABC):
         """Returns the decided rewards for all the arms."""
         pass
 
+    # noinspection PyMethodMayBeStatic
+    def best_reward(self, rewards: Union[List[float], np.ndarray]) -> float:
+        """Returns the best reward of the last round, whose rewards were `rewards`."""
+        return max(rewards)
+
+    def decide_rewards_chunk(self, n: int) -> np.ndarray:
+        """Returns the rewards of the next `n` rounds at once (fewer if the adversary stops before), as an array of
+        shape `(n, n_arms)`, and registers these rounds.
+
+        This is only possible for adversaries whose rewards do not depend on the arms that are played.
+        """
+        raise NotImplementedError
+
+    # noinspection PyMethodMayBeStatic
+    def best_rewards_chunk(self, rewards: np.ndarray) -> np.ndarray:
+        """Returns the best reward of each of the last rounds, decided with `decide_rewards_chunk`."""
+        return np.max(rewards, axis=1)
+
+    @property
+    def may_stop_deciding(self) -> bool:
+        """Indicates whether the adversary may stop deciding rewards, like when its sequence of rewards is finite."""
+        return False
+
+    # noinspection PyMethodMayBeStatic
+    def will_decide_rewards(self) -> bool:
+        """Indicates whether the adversary will decide the rewards of the next round."""
+        return True
+
+
+class ObliviousAdversary(Adversary):
+    """An adversary whose rewards do not depend on the arms that are played: they are given in advance, as an array
+    of shape `(n_rounds, n_arms)`, one row per round.
+
+    `decide_rewards` returns the rows as views, without copying them; the array may be memory-mapped (for instance,
+    opened with `ObliviousAdversary.load`), so that the rewards do not have to fit in memory. The best reward of each
+    round is precomputed once, by chunks of `chunk_rows` rows, unless it is given as `best_rewards`. The adversary
+    stops deciding rewards after the last row.
+    """
+
+    def __init__(self, rewards: np.ndarray, best_rewards: Union[None, np.ndarray] = None, chunk_rows: int = 65536):
+        if rewards.ndim != 2:
+            raise AssertionError("The rewards must be given as an array of shape (n_rounds, n_arms).")
+        super().__init__(rewards.shape[1])
+
+        if best_rewards is None:
+            best_rewards = np.empty(rewards.shape[0], dtype=rewards.dtype)
+            for start in range(0, rewards.shape[0], chunk_rows):
+                best_rewards[start:start + chunk_rows] = rewards[start:start + chunk_rows].max(axis=1)
+        elif best_rewards.shape != (rewards.shape[0],):
+            raise AssertionError("There must be one best reward per round.")
+
+        self._rewards = rewards
+        self._best_rewards = best_rewards
+        self._current_round = 0
+
+    @classmethod
+    def load(cls, path: str, best_rewards_path: Union[None, str] = None,
+             chunk_rows: int = 65536) -> 'ObliviousAdversary':
+        """Memory-maps the rewards from a `.npy` file (and the best rewards, if they were saved too)."""
+        rewards = np.load(path, mmap_mode='r')
+        best_rewards = None if best_rewards_path is None else np.load(best_rewards_path, mmap_mode='r')
+        return cls(rewards, best_rewards, chunk_rows)
+
+    @property
+    def rewards(self) -> np.ndarray:
+        return self._rewards
+
+    @property
+    def best_rewards(self) -> np.ndarray:
+        return self._best_rewards
+
+    @property
+    def n_rounds(self) -> int:
+        return self._rewards.shape[0]
+
+    @property
+    def current_round(self) -> int:
+        return self._current_round
+
+    def decide_rewards(self) -> np.ndarray:
+        return self._rewards[self._current_round]
+
+    def register_interaction(self, arm: Union[int, List[int]]) -> None:
+        self._current_round += 1
+
+    def best_reward(self, rewards: Union[List[float], np.ndarray]) -> float:
+        # The interaction of the last round is already registered.
+        return self._best_rewards[self._current_round - 1]
+
+    def decide_rewards_chunk(self, n: int) -> np.ndarray:
+        start = self._current_round
+        self._current_round = min(start + n, self._rewards.shape[0])
+        return self._rewards[start:self._current_round]
+
+    def best_rewards_chunk(self, rewards: np.ndarray) -> np.ndarray:
+        return self._best_rewards[self._current_round - rewards.shape[0]:self._current_round]
+
+    @property
+    def may_stop_deciding(self) -> bool:
+        return True
+
+    def will_decide_rewards(self) -> bool:
+        return self._current_round < self._rewards.shape[0]
+
 
 class AdversarialEnvironment(Environment, ABC):
     def __init__(self, adversary: Adversary):
@@ -46,7 +156,22 @@ class AdversarialEnvironment(Environment, ABC):
                                  "first, the bandit chooses an arm; then, the adversary decides the rewards"
                                  "(without knowing the arm the bandit plays); finally, the environment returns the "
                                  "reward. All of this is done when calling reward(arm). ")
-        return max(self._last_rewards) - reward
+        return self._adversary.best_reward(self._last_rewards) - reward
+
+    @property
+    def may_stop_accepting_inputs(self) -> bool:
+        return self._adversary.may_stop_deciding
+
+    def will_accept_input(self) -> bool:
+        return self._adversary.will_decide_rewards()
+
+    def _reward_of(self, arm: Union[int, List[int]]) -> float:
+        """Returns the reward of the arm (or the total reward of the arms) played at the last round."""
+        if isinstance(arm, collections.abc.Sequence):  # Several arms: only their k rewards are read.
+            rewards = self._last_rewards
+            return float(sum(rewards[a] for a in arm))
+        else:  # Single arm.
+            return self._last_rewards[arm]
 
 
 class AdversarialMultiArmedEnvironment(BanditFeedbackEnvironment, AdversarialEnvironment):
@@ -55,17 +180,32 @@ class AdversarialMultiArmedEnvironment(BanditFeedbackEnvironment, AdversarialEnv
     def reward(self, arm: int) -> float:
         self._last_rewards = self._adversary.decide_rewards()
 
-        if isinstance(arm, collections.abc.Sequence):  # Several arms.
-            reward = sum(self._last_rewards[a] for a in arm)
-        else:  # Single arm.
-            reward = self._last_rewards[arm]
+        reward = self._reward_of(arm)
 
         self._adversary.register_interaction(arm)
         return reward
 
 
 class FullInformationAdversarialMultiArmedEnvironment(FullInformationEnvironment, AdversarialEnvironment):
-    def rewards(self, arm: Union[int, List[int]]) -> List[float]:
+    """An adversarial environment on which a full-information multi-armed bandit acts.
+
+    With an adversary whose rewards do not depend on the played arms (like `ObliviousAdversary`), the rewards of many
+    rounds can be decided at once, with `rewards_chunk`.
+    """
+
+    def rewards(self, arm: Union[int, List[int]]) -> (List[float], float):
         self._last_rewards = self._adversary.decide_rewards()
+
+        reward = self._reward_of(arm)
+
         self._adversary.register_interaction(arm)
-        return self._last_rewards
+        return self._last_rewards, reward
+
+    def rewards_chunk(self, n: int) -> np.ndarray:
+        rewards = self._adversary.decide_rewards_chunk(n)
+        if rewards.shape[0] > 0:
+            self._last_rewards = rewards[-1]
+        return rewards
+
+    def regret_chunk(self, rewards: np.ndarray, obtained: np.ndarray) -> np.ndarray:
+        return self._adversary.best_rewards_chunk(rewards) - obtained
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import List, Union, Dict
 
+import numpy as np
+
 
 class Environment(ABC):
     """An environment on which the bandit acts.
@@ -34,6 +36,14 @@ class Environment(ABC):
         """Record the interaction and return a vector reward."""
         raise NotImplementedError
 
+    def reward_batch(self, arms: np.ndarray) -> np.ndarray:
+        """Record several interactions at once and return the corresponding scalar rewards.
+
+        This is equivalent to calling `reward` for each arm, in order, which is what this default implementation
+        does. Environments are encouraged to override it with a faster implementation.
+        """
+        return np.array([self.reward(arm) for arm in arms], dtype=float)
+
     @abstractmethod
     def regret(self, reward: float) -> float:
         """Compute the exact regret when getting a given reward at the last round.
@@ -59,6 +69,16 @@ class Environment(ABC):
         """Indicates whether the environment will react correctly at the next round."""
         return True
 
+    # noinspection PyMethodMayBeStatic
+    def remaining_inputs(self) -> Union[None, int]:
+        """Returns a number of rounds that the environment is guaranteed to accept, whatever the arms that are played,
+        or `None` if it is unknown (which is the default).
+
+        Experiments use it to perform these rounds without calling `will_accept_input` before each of them. Zero means
+        that no round is guaranteed: `will_accept_input` is then called.
+        """
+        return None
+
 
 class EnvironmentNoMoreAcceptingInputsException(Exception):
     """The environment no more accepts interactions."""
@@ -74,6 +94,20 @@ class FullInformationEnvironment(Environment, ABC):
         """
         pass
 
+    def rewards_chunk(self, n: int) -> np.ndarray:
+        """Record the next `n` rounds at once and return the rewards of all arms, as an array of shape
+        `(n, n_arms)`, with fewer rows if the environment stops accepting inputs before.
+
+        This is only possible when the rewards do not depend on the played arms.
+        """
+        raise NotImplementedError
+
+    def regret_chunk(self, rewards: np.ndarray, obtained: np.ndarray) -> np.ndarray:
+        """Compute the regret of each of the rounds returned by the last call to `rewards_chunk`, when getting the
+        rewards `obtained`.
+        """
+        raise NotImplementedError
+
 
 class SemiBanditFeedbackEnvironment(Environment, ABC):
     @abstractmethod
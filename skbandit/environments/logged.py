@@ -0,0 +1,232 @@
+import collections
+import json
+import os
+from typing import Union, Iterator, List
+
+import numpy as np
+
+from skbandit.environments.base import BanditFeedbackEnvironment, EnvironmentNoMoreAcceptingInputsException
+
+LoggedChunk = collections.namedtuple('LoggedChunk', ['start', 'contexts', 'arms', 'rewards', 'propensities'])
+LoggedChunk.__doc__ = """Consecutive records of a logged dataset, starting at the record `start`. `contexts` is `None`
+for datasets without contexts."""
+
+
+class LoggedDataset:
+    """Interactions logged by a policy: for each record, the context (if any), the arm that was played, the reward
+    that was obtained, and the propensity (the probability that the logging policy played this arm).
+
+    A dataset is a directory with one `.npy` file per column (`arms.npy`, `rewards.npy`, `propensities.npy`, and
+    `contexts.npy` of shape `(n_records, n_features)`), plus `meta.json`. Columns are memory-mapped: they are only
+    read when needed, and `chunks(chunk_size)` iterates over the records in bounded memory, whatever the size of the
+    dataset.
+
+    A new dataset is created either from arrays, with `LoggedDataset.from_arrays`, or empty, with
+    `LoggedDataset.create`, then filled chunk by chunk (through the `arms`, `rewards`, etc. arrays) and flushed.
+    """
+
+    def __init__(self, directory: str, mode: str = 'r'):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+
+        self._directory = directory
+        self._n_arms = meta['n_arms']
+        self._arms = np.load(os.path.join(directory, 'arms.npy'), mmap_mode=mode)
+        self._rewards = np.load(os.path.join(directory, 'rewards.npy'), mmap_mode=mode)
+        self._propensities = np.load(os.path.join(directory, 'propensities.npy'), mmap_mode=mode)
+        self._contexts = None
+        if meta['n_features'] is not None:
+            self._contexts = np.load(os.path.join(directory, 'contexts.npy'), mmap_mode=mode)
+
+    @classmethod
+    def create(cls, directory: str, n_records: int, n_arms: int, n_features: Union[None, int] = None) \
+            -> 'LoggedDataset':
+        """Creates an empty dataset (all values are zero), whose columns can be written to."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'n_arms': n_arms, 'n_features': n_features, 'n_records': n_records}, f)
+
+        columns = [('arms', (n_records,), np.int64), ('rewards', (n_records,), np.float64),
+                   ('propensities', (n_records,), np.float64)]
+        if n_features is not None:
+            columns.append(('contexts', (n_records, n_features), np.float64))
+        for name, shape, dtype in columns:
+            np.lib.format.open_memmap(os.path.join(directory, name + '.npy'), mode='w+', dtype=dtype,
+                                      shape=shape).flush()
+
+        return cls(directory, mode='r+')
+
+    @classmethod
+    def from_arrays(cls, directory: str, arms: np.ndarray, rewards: np.ndarray, propensities: np.ndarray,
+                    contexts: Union[None, np.ndarray] = None, n_arms: Union[None, int] = None) -> 'LoggedDataset':
+        """Writes a dataset from in-memory arrays, then opens it read-only."""
+        arms = np.asarray(arms)
+        n_features = None if contexts is None else contexts.shape[1]
+        if n_arms is None:
+            n_arms = int(arms.max()) + 1
+
+        dataset = cls.create(directory, arms.shape[0], n_arms, n_features)
+        dataset.arms[:] = arms
+        dataset.rewards[:] = rewards
+        dataset.propensities[:] = propensities
+        if contexts is not None:
+            dataset.contexts[:] = contexts
+        dataset.flush()
+        return cls(directory)
+
+    def flush(self) -> None:
+        for column in [self._arms, self._rewards, self._propensities, self._contexts]:
+            if column is not None:
+                column.flush()
+
+    def __len__(self):
+        return self._arms.shape[0]
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @property
+    def n_arms(self) -> int:
+        return self._n_arms
+
+    @property
+    def n_features(self) -> Union[None, int]:
+        return None if self._contexts is None else self._contexts.shape[1]
+
+    @property
+    def arms(self) -> np.ndarray:
+        return self._arms
+
+    @property
+    def rewards(self) -> np.ndarray:
+        return self._rewards
+
+    @property
+    def propensities(self) -> np.ndarray:
+        return self._propensities
+
+    @property
+    def contexts(self) -> Union[None, np.ndarray]:
+        return self._contexts
+
+    def chunks(self, chunk_size: int, start: int = 0) -> Iterator[LoggedChunk]:
+        """Iterates over the records, `chunk_size` at a time, each chunk being read into memory."""
+        for begin in range(start, len(self), chunk_size):
+            end = min(begin + chunk_size, len(self))
+            yield LoggedChunk(start=begin,
+                              contexts=None if self._contexts is None else np.array(self._contexts[begin:end]),
+                              arms=np.array(self._arms[begin:end]), rewards=np.array(self._rewards[begin:end]),
+                              propensities=np.array(self._propensities[begin:end]))
+
+
+class LoggedBanditEnvironment(BanditFeedbackEnvironment):
+    """Replays a logged dataset as an environment, one record at a time, for `LoggedBanditExperiment`
+    (`skbandit.experiments.offline`).
+
+    The bandit decides an arm for the context of the current record (`context`). The reward is only known for the
+    logged arm (`logged_arm`): the record is then played with `reward`. Otherwise, the record is rejected with `skip`,
+    and is not a round of the experiment (rejection sampling, as in Li et al.'s replay). The environment stops
+    accepting inputs at the end of the dataset. Records are read `chunk_size` at a time.
+
+    The regret is computed with respect to the arm with the highest estimated mean reward (`best_arm`), like for
+    stochastic environments. The mean reward of each arm is estimated over the whole dataset by inverse propensity
+    scoring (`estimated_rewards`); for contextual data, this is the best arm that ignores the context.
+    """
+
+    def __init__(self, dataset: LoggedDataset, chunk_size: int = 65536):
+        self._dataset = dataset
+        self._chunk_size = chunk_size
+
+        # Estimated mean reward of each arm, in one pass over the dataset.
+        totals = np.zeros(dataset.n_arms)
+        for chunk in dataset.chunks(chunk_size):
+            totals += np.bincount(chunk.arms, weights=chunk.rewards / chunk.propensities, minlength=dataset.n_arms)
+        self._means = (totals / max(1, len(dataset))).tolist()
+        self._best_reward = max(self._means)
+        self._best_arm = self._means.index(self._best_reward)
+
+        self._chunks = dataset.chunks(chunk_size)
+        self._chunk = None
+        self._position = 0  # Within the current chunk.
+        self._n_records = 0
+        self._n_matched = 0
+        self._next_chunk()
+
+    def _next_chunk(self) -> None:
+        self._chunk = next(self._chunks, None)
+        self._position = 0
+
+    def _next_record(self) -> None:
+        self._n_records += 1
+        self._position += 1
+        if self._position == self._chunk.arms.shape[0]:
+            self._next_chunk()
+
+    @property
+    def dataset(self) -> LoggedDataset:
+        return self._dataset
+
+    @property
+    def n_arms(self) -> int:
+        return self._dataset.n_arms
+
+    @property
+    def estimated_rewards(self) -> List[float]:
+        """The estimated mean reward of each arm."""
+        return self._means
+
+    @property
+    def best_arm(self) -> int:
+        return self._best_arm
+
+    @property
+    def n_records(self) -> int:
+        """The number of records that were played or rejected."""
+        return self._n_records
+
+    @property
+    def n_matched(self) -> int:
+        """The number of records that were played, i.e. where the bandit decided the logged arm."""
+        return self._n_matched
+
+    def _check_record(self) -> None:
+        if self._chunk is None:
+            raise EnvironmentNoMoreAcceptingInputsException
+
+    @property
+    def context(self) -> Union[None, np.ndarray]:
+        """The context of the current record (`None` for datasets without contexts)."""
+        self._check_record()
+        return None if self._chunk.contexts is None else self._chunk.contexts[self._position]
+
+    @property
+    def logged_arm(self) -> int:
+        """The arm that was played in the current record."""
+        self._check_record()
+        return int(self._chunk.arms[self._position])
+
+    def skip(self) -> None:
+        """Rejects the current record: the bandit decided another arm than the logged one."""
+        self._check_record()
+        self._next_record()
+
+    def reward(self, arm: int) -> float:
+        if arm != self.logged_arm:
+            raise AssertionError("The reward is only known for the logged arm {}, not for {}: reject the record with "
+                                 "skip.".format(self.logged_arm, arm))
+
+        reward = float(self._chunk.rewards[self._position])
+        self._n_matched += 1
+        self._next_record()
+        return reward
+
+    def regret(self, reward: float) -> float:
+        return self._best_reward - reward
+
+    @property
+    def may_stop_accepting_inputs(self) -> bool:
+        return True
+
+    def will_accept_input(self) -> bool:
+        return self._chunk is not None
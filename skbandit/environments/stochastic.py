@@ -1,12 +1,16 @@
 import collections
 from abc import ABC
-from typing import Union, List, TypeVar
+from typing import Union, List, Dict, TypeVar, TYPE_CHECKING
 
-from scipy.stats import rv_continuous, rv_discrete, rv_histogram
+import numpy as np
 
-from skbandit.environments.base import Environment, BanditFeedbackEnvironment
+from skbandit.environments.base import Environment, BanditFeedbackEnvironment, SemiBanditFeedbackEnvironment, \
+    EnvironmentNoMoreAcceptingInputsException
 
-random_variable = TypeVar('random_variable', rv_continuous, rv_discrete, rv_histogram)
+if TYPE_CHECKING:  # Importing scipy.stats takes seconds; it is only needed for type checkers.
+    from scipy.stats import rv_continuous, rv_discrete, rv_histogram
+
+random_variable = TypeVar('random_variable', 'rv_continuous', 'rv_discrete', 'rv_histogram')
 
 
 class StochasticEnvironment(Environment, ABC):
@@ -39,27 +43,306 @@ class StochasticMultiArmedEnvironment(BanditFeedbackEnvironment, StochasticEnvir
     The only parameter is a list of probability distributions (SciPy random variables, subclasses of either
     `rv_continuous` or `rv_discrete`). There is one distribution per arm in the experiment. Their random states are
     supposed to be defined before being given to objects of this class (for reproducible experiments).
+
+    Drawing a single number from a SciPy distribution is slow, due to argument checking. Rewards are thus drawn in
+    blocks of `block_size` values per arm, then served one by one (or several at once, with `reward_batch`). Results
+    are still reproducible for given random states.
     """
 
-    def __init__(self, distributions: List[random_variable]):
+    def __init__(self, distributions: List[random_variable], block_size: int = 1024):
+        if block_size < 1:
+            raise AssertionError("The block size must be positive.")
+
         self._distributions = distributions
+        self._block_size = block_size
 
         # Determine the best arm. As this requires computing the best reward and the true means, store them.
         self._means = [d.mean() for d in self._distributions]
         self._best_reward = max(self._means)
         self._best_arm = self._means.index(self._best_reward)
 
+        # Buffers of rewards that are already drawn, with the position of the next reward to serve.
+        self._buffers = [np.empty(0) for _ in self._distributions]
+        self._positions = [0] * len(self._distributions)
+
     @property
     def n_arms(self) -> int:
         return len(self._distributions)
 
+    @property
+    def distributions(self) -> List[random_variable]:
+        return self._distributions
+
+    @property
+    def block_size(self) -> int:
+        return self._block_size
+
     @property
     def true_rewards(self) -> List[float]:
         return self._means
 
+    @property
+    def best_arm(self) -> int:
+        """The arm with the highest mean reward."""
+        return self._best_arm
+
     def regret(self, reward: float) -> float:
         return self._best_reward - reward
 
+    def _block(self, arm: int) -> np.ndarray:
+        return np.atleast_1d(self._distributions[arm].rvs(size=self._block_size))
+
+    def _refill(self, arm: int, blocks: List[np.ndarray]) -> None:
+        """Keeps the rewards of the arm that were not served yet, followed by new blocks."""
+        self._buffers[arm] = np.concatenate([self._buffers[arm][self._positions[arm]:]] + blocks)
+        self._positions[arm] = 0
+
     def reward(self, arm: int) -> float:
-        # Just draw one random number from the corresponding arm.
-        return self._distributions[arm].rvs()
+        position = self._positions[arm]
+        if position == self._buffers[arm].shape[0]:
+            self._refill(arm, [self._block(arm)])
+            position = 0
+        self._positions[arm] = position + 1
+        return self._buffers[arm][position]
+
+    def reward_batch(self, arms: np.ndarray) -> np.ndarray:
+        arms = np.asarray(arms)
+
+        # Group the arms (keeping the order in which each arm is played).
+        order = np.argsort(arms, kind='stable')
+        unique_arms, starts, counts = np.unique(arms[order], return_index=True, return_counts=True)
+
+        # New blocks are drawn in the order in which the buffers run out when the arms are played one by one, so that
+        # the rewards are the same, even when the distributions share a random state.
+        refills = []
+        for arm, start, count in zip(unique_arms.tolist(), starts.tolist(), counts.tolist()):
+            available = self._buffers[arm].shape[0] - self._positions[arm]
+            refills.extend((i, arm) for i in order[start + available:start + count:self._block_size].tolist())
+        blocks = {}
+        for _, arm in sorted(refills):
+            blocks.setdefault(arm, []).append(self._block(arm))
+        for arm, arm_blocks in blocks.items():
+            self._refill(arm, arm_blocks)
+
+        # Then, serve each group from its buffer.
+        rewards = np.empty(arms.shape[0])
+        for arm, start, count in zip(unique_arms.tolist(), starts.tolist(), counts.tolist()):
+            position = self._positions[arm]
+            rewards[order[start:start + count]] = self._buffers[arm][position:position + count]
+            self._positions[arm] = position + count
+        return rewards
+
+
+class StochasticSemiBanditEnvironment(SemiBanditFeedbackEnvironment, StochasticMultiArmedEnvironment):
+    """A stochastic environment on which a combinatorial semi-bandit acts: at each round, up to `k` arms are played,
+    the reward of each of them is observed, and the reward of the round is their sum.
+
+    The distributions are given like for `StochasticMultiArmedEnvironment`. The best super-arm is made of the `k`
+    arms with the highest means.
+    """
+
+    def __init__(self, distributions: List[random_variable], k: int, block_size: int = 1024):
+        super().__init__(distributions, block_size)
+        self._k = k
+
+        # The regret is computed with respect to the best super-arm.
+        self._best_arms = sorted(np.argsort(self._means, kind='stable')[::-1][:k].tolist())
+        self._best_reward = sum(self._means[arm] for arm in self._best_arms)
+
+    @property
+    def k(self) -> int:
+        return self._k
+
+    @property
+    def best_arms(self) -> List[int]:
+        return self._best_arms
+
+    def rewards(self, arm: Union[int, List[int]]) -> (Dict[int, float], float):
+        arms = [arm] if isinstance(arm, (int, np.integer)) else arm
+        if len(arms) > self._k:
+            raise AssertionError("At most {} arms can be played at once, not {}.".format(self._k, len(arms)))
+
+        rewards = {a: self.reward(a) for a in arms}
+        return rewards, sum(rewards.values())
+
+
+class BudgetedStochasticMultiArmedEnvironment(StochasticMultiArmedEnvironment):
+    """A stochastic environment with a budget (bandits with knapsacks, for one resource): playing an arm consumes its
+    cost (one positive number per arm, in `costs`) from the budget. The environment stops accepting inputs when the
+    remaining budget no more covers the highest cost, so that any arm can be played at each accepted round.
+
+    The rewards are drawn like for `StochasticMultiArmedEnvironment`. The best arm is the one with the highest ratio
+    between its mean reward and its cost: the regret of a round is this ratio times the cost of the played arm, minus
+    the reward. Over the whole budget, the total regret is the difference between the reward of always playing the
+    best arm and the obtained reward (up to the last incomplete round).
+
+    The environment tells how many rounds it will still accept (`remaining_inputs`): the remaining budget divided by
+    the highest cost. These rounds are then accepted, even if rounding errors on the budget would make the last one
+    slightly too expensive.
+    """
+
+    def __init__(self, distributions: List[random_variable], costs: List[float], budget: float,
+                 block_size: int = 1024):
+        super().__init__(distributions, block_size)
+        if len(costs) != len(distributions):
+            raise AssertionError("There must be one cost per arm.")
+        if min(costs) <= 0:
+            raise AssertionError("Costs must be positive.")
+
+        self._costs = np.asarray(costs, dtype=float)
+        self._max_cost = float(np.max(self._costs))
+        self._budget = budget
+        self._remaining_budget = float(budget)
+        self._n_guaranteed = int(self._remaining_budget // self._max_cost)  # Rounds promised by remaining_inputs.
+        self._last_costs = np.zeros(1)  # Costs of the arms played at the last call to reward or reward_batch.
+
+        ratios = [mean / cost for mean, cost in zip(self._means, costs)]
+        self._best_ratio = max(ratios)
+        self._best_arm = ratios.index(self._best_ratio)
+
+    @property
+    def costs(self) -> np.ndarray:
+        return self._costs
+
+    @property
+    def budget(self) -> float:
+        return self._budget
+
+    @property
+    def remaining_budget(self) -> float:
+        return self._remaining_budget
+
+    @property
+    def best_arm(self) -> int:
+        """The arm with the highest ratio between its mean reward and its cost."""
+        return self._best_arm
+
+    @property
+    def may_stop_accepting_inputs(self) -> bool:
+        return True
+
+    def will_accept_input(self) -> bool:
+        return self._n_guaranteed > 0
+
+    def remaining_inputs(self) -> int:
+        return self._n_guaranteed
+
+    def regret(self, reward: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+        """The regret of the last round, or, when given the rewards of the last call to `reward_batch`, the regret of
+        each of its rounds (with the cost of each played arm).
+        """
+        if np.ndim(reward) == 0:
+            return self._best_ratio * self._last_costs[-1] - reward
+        return self._best_ratio * self._last_costs - reward
+
+    def _consume(self, cost: float, n_rounds: int = 1) -> None:
+        # Unless all the rounds are guaranteed, the whole cost must be affordable; otherwise, nothing is played.
+        if self._n_guaranteed < n_rounds and cost > self._remaining_budget:
+            raise EnvironmentNoMoreAcceptingInputsException
+        self._remaining_budget = max(0.0, self._remaining_budget - cost)
+        # Rounds that were promised are still accepted, even if rounding errors made the budget too small for them.
+        self._n_guaranteed = max(self._n_guaranteed - n_rounds, int(self._remaining_budget // self._max_cost))
+
+    def reward(self, arm: int) -> float:
+        cost = self._costs[arm]
+        self._consume(cost)
+        self._last_costs = np.array([cost])
+        return super().reward(arm)
+
+    def reward_batch(self, arms: np.ndarray) -> np.ndarray:
+        arms = np.asarray(arms)
+        if arms.shape[0] == 0:
+            return np.empty(0)
+
+        costs = self._costs[arms]
+        self._consume(float(np.sum(costs)), arms.shape[0])
+        self._last_costs = costs
+        return super().reward_batch(arms)
+
+
+class PiecewiseStationaryMultiArmedEnvironment(BanditFeedbackEnvironment, StochasticEnvironment):
+    """A nonstationary stochastic environment, on which a multi-armed bandit acts: the distributions of the rewards
+    are constant over segments of rounds, then change abruptly.
+
+    `segments` gives the distributions of the arms (like for `StochasticMultiArmedEnvironment`) for each segment, and
+    `change_points` the rounds (starting at 0) at which each segment but the first one starts. For instance, with
+    `change_points=[1000]`, the distributions of the first segment are used for rounds 0 to 999, those of the second
+    one afterwards.
+
+    The regret is computed with respect to the best arm of the segment of the last round, which changes over time;
+    `true_rewards` are the means of the segment of the next round. Like for all environments, `reward_batch` plays
+    consecutive rounds, which may span several segments: hence, this environment cannot draw the rewards of the
+    replicates of one round (`BatchedMultiArmedStochasticExperiment` rejects it).
+    """
+
+    def __init__(self, segments: List[List[random_variable]], change_points: List[int], block_size: int = 1024):
+        if len(change_points) != len(segments) - 1:
+            raise AssertionError("There must be one change point between each pair of consecutive segments.")
+        if len(set(len(distributions) for distributions in segments)) != 1:
+            raise AssertionError("All segments must have the same number of arms.")
+        if any(end <= start for start, end in zip([0] + list(change_points), change_points)):
+            raise AssertionError("Change points must be positive and increasing.")
+
+        # Rewards of each segment are drawn by blocks, as for stationary environments.
+        self._environments = [StochasticMultiArmedEnvironment(distributions, block_size) for distributions in segments]
+        self._change_points = list(change_points)
+        self._current_round = 0
+        self._segment = 0  # Segment of the next round.
+        self._last_segment = 0  # Segment of the last round.
+
+    @property
+    def n_arms(self) -> int:
+        return self._environments[0].n_arms
+
+    @property
+    def change_points(self) -> List[int]:
+        return self._change_points
+
+    @property
+    def current_round(self) -> int:
+        return self._current_round
+
+    @property
+    def segment(self) -> int:
+        """The segment of the next round."""
+        return self._segment
+
+    @property
+    def true_rewards(self) -> List[float]:
+        return self._environments[self._segment].true_rewards
+
+    @property
+    def best_arm(self) -> int:
+        """The best arm at the next round."""
+        return self._environments[self._segment].best_arm
+
+    def _segment_end(self) -> Union[int, float]:
+        """First round after the current segment."""
+        return self._change_points[self._segment] if self._segment < len(self._change_points) else np.inf
+
+    def regret(self, reward: float) -> float:
+        return self._environments[self._last_segment].regret(reward)
+
+    def reward(self, arm: int) -> float:
+        reward = self._environments[self._segment].reward(arm)
+        self._last_segment = self._segment
+        self._current_round += 1
+        if self._current_round == self._segment_end():
+            self._segment += 1
+        return reward
+
+    def reward_batch(self, arms: np.ndarray) -> np.ndarray:
+        arms = np.asarray(arms)
+        rewards = np.empty(arms.shape[0])
+
+        # Split the rounds at the change points.
+        start = 0
+        while start < arms.shape[0]:
+            end = int(min(arms.shape[0], start + self._segment_end() - self._current_round))
+            rewards[start:end] = self._environments[self._segment].reward_batch(arms[start:end])
+            self._last_segment = self._segment
+            self._current_round += end - start
+            if self._current_round == self._segment_end():
+                self._segment += 1
+            start = end
+        return rewards
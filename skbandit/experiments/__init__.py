@@ -1,3 +1,10 @@
-from .base import *
+from skbandit._lazy import lazy_attributes
 
-__all__ = ["Experiment", "FullInformationExperiment", "SemiBanditFeedbackExperiment", "BanditFeedbackExperiment"]
+__all__ = ["Experiment", "FullInformationExperiment", "SemiBanditFeedbackExperiment", "BanditFeedbackExperiment",
+           "Trajectory"]
+
+# Module of each exported name: modules are only imported when one of their names is first used.
+_modules = {"Experiment": "base", "FullInformationExperiment": "base", "SemiBanditFeedbackExperiment": "base",
+            "BanditFeedbackExperiment": "base", "Trajectory": "trajectory"}
+
+__getattr__, __dir__ = lazy_attributes(__name__, globals(), _modules)
@@ -1,8 +1,14 @@
+import contextlib
 from abc import ABC, abstractmethod
+from typing import Union
+
+import numpy as np
 
 from skbandit.bandits import Bandit
 from skbandit.environments import Environment, EnvironmentNoMoreAcceptingInputsException, FullInformationEnvironment, \
     SemiBanditFeedbackEnvironment, BanditFeedbackEnvironment
+from skbandit.experiments.instrumentation import PhaseStats, sampled_round
+from skbandit.experiments.trajectory import Trajectory
 
 
 class Experiment(ABC):
@@ -13,7 +19,14 @@ class Experiment(ABC):
     The constructor is supposed to set the `best_arm` field to the best possible action on the environment (i.e.
     the one that generates the highest reward -- or one such combination of arms, depending on the setting).
     This is the main task for subclassing an environment. The `best_arm` is however not necessarily set, if it
-    does not make sense for the specific environment.
+    does not make sense for the specific environment. Subclasses implement one round in `round`, which starts with
+    `_check_input()`: it raises an exception when the environment no more accepts inputs, except for the rounds that
+    were already accepted by `accepted_rounds` (when the environment guarantees several rounds, with
+    `Environment.remaining_inputs`, they are not checked one by one). To record trajectories, `round` must also set
+    `_last_arm` and `_last_reward`, the arm(s) played and the reward obtained at the round.
+
+    To know where the time goes, `instrument(every)` measures the time spent in each phase of the rounds (decision of
+    the bandit, reward from the environment, update of the bandit, regret), one round every `every`.
     """
 
     def __init__(self, environment: Environment, bandit: Bandit):
@@ -21,6 +34,12 @@ class Experiment(ABC):
         self._bandit = bandit
         self._best_arm = None
 
+        # What happened at the last round, for recording trajectories.
+        self._last_arm = None
+        self._last_reward = None
+
+        self._n_accepted = 0  # Rounds known to be accepted by the environment, not performed yet.
+
     @property
     def best_arm(self):
         return self._best_arm
@@ -29,41 +48,146 @@ class Experiment(ABC):
         """Determines the regret when getting a given reward."""
         return self._environment.regret(reward)
 
+    def instrument(self, every: int = 100) -> PhaseStats:
+        """Starts measuring the time spent in each phase of the rounds, one round every `every`; the returned object
+        accumulates the measures until `stop_instrumenting` is called.
+
+        The rounds that are not measured only pay for one decrement, hence the overhead is negligible for `every` of
+        100 or more. When the experiment is not instrumented, nothing is measured, and there is no overhead at all.
+        """
+        if every < 1:
+            raise AssertionError("At least one round out of every must be measured.")
+
+        stats = PhaseStats(every)
+        # The instance attribute takes precedence over the method of the class.
+        self.round = sampled_round(type(self).round.__get__(self), self._swapped, self._bandit, self._environment,
+                                   stats)
+        return stats
+
+    @contextlib.contextmanager
+    def _swapped(self, bandit: Bandit, environment: Environment):
+        """Temporarily uses another bandit and another environment (like proxies that time the calls)."""
+        original_bandit, original_environment = self._bandit, self._environment
+        self._bandit, self._environment = bandit, environment
+        try:
+            yield
+        finally:
+            self._bandit, self._environment = original_bandit, original_environment
+
+    def stop_instrumenting(self) -> None:
+        self.__dict__.pop('round', None)
+
     @abstractmethod
     def round(self) -> float:
-        """Performs one round of experiment, yielding the regret for this round."""
+        """Performs one round of experiment, yielding the regret for this round.
+
+        Raises `EnvironmentNoMoreAcceptingInputsException` if the environment no more accepts inputs.
+        """
         pass
 
-    def rounds(self, n: int) -> float:
-        """Performs several rounds of experiment, yielding the total regret.
+    def _check_input(self) -> None:
+        """Raises `EnvironmentNoMoreAcceptingInputsException` if the environment no more accepts inputs. The rounds
+        that were accepted by `accepted_rounds` are not checked again.
+        """
+        if self._n_accepted > 0:
+            self._n_accepted -= 1
+        elif self._environment.may_stop_accepting_inputs and not self._environment.will_accept_input():
+            raise EnvironmentNoMoreAcceptingInputsException
+
+    def accepted_rounds(self, n: int) -> int:
+        """Returns the number of rounds (at most `n`) that can be performed now, the environment being known to accept
+        them, or zero if it no more accepts inputs. The next calls to `round` do not check these rounds again.
 
-        If the environment stops accepting inputs within the `n` rounds, execution automatically stops.
+        When the environment tells how many rounds it will still accept (`remaining_inputs`), all of them are
+        accepted at once. Otherwise, it is asked for one round at a time.
         """
         if not self._environment.may_stop_accepting_inputs:
-            return sum(self.round() for _ in range(n))
+            return n
+
+        remaining = self._environment.remaining_inputs()
+        if remaining:
+            self._n_accepted = min(n, remaining)
+        elif self._environment.will_accept_input():
+            self._n_accepted = min(n, 1)
         else:
-            total_reward = 0.0
-            for _ in range(n):
-                if not self._environment.will_accept_input():
-                    break
+            self._n_accepted = 0
+        return self._n_accepted
+
+    def rounds(self, n: int, record: Union[None, Trajectory] = None) -> float:
+        """Performs several rounds of experiment, yielding the total regret.
 
-                total_reward += self.round()
-            return total_reward
+        If the environment stops accepting inputs within the `n` rounds, execution automatically stops. Rounds are
+        performed by chunks that the environment is known to accept (see `accepted_rounds`): for environments that
+        tell how many rounds they will still accept, there is no check within a chunk.
+
+        If a trajectory is given as `record`, the details of each round are recorded into it.
+        """
+        total_regret = 0.0
+        done = 0
+        while done < n:
+            m = self.accepted_rounds(n - done)
+            if m == 0:
+                break
+
+            if record is not None:
+                for _ in range(m):
+                    self._last_arm = None
+                    regret = self.round()
+                    if self._last_arm is None:
+                        raise AssertionError("To record trajectories, {}.round must set _last_arm and _last_reward."
+                                             .format(type(self).__name__))
+                    record.append(regret, self._last_arm, self._last_reward)
+                    total_regret += regret
+            else:
+                for _ in range(m):
+                    total_regret += self.round()
+            done += m
+        return total_regret
 
 
 class FullInformationExperiment(Experiment):
-    """Performs an experiment with full information, i.e. one reward is known per arm and per round"""
+    """Performs an experiment with full information, i.e. one reward is known per arm and per round
+
+    When the rewards do not depend on the played arms (for instance, with an oblivious adversary), rounds can be
+    performed by chunks of `chunk_size` rounds, with `rounds(n, chunk_size=...)`: the environment decides all the
+    rewards of a chunk at once (`rewards_chunk`), then the bandit plays them (`play_chunk`). The regret of each round is
+    the same as round by round.
+    """
 
     def __init__(self, environment: FullInformationEnvironment, bandit: Bandit):
         super().__init__(environment, bandit)
 
+    def rounds(self, n: int, record: Union[None, Trajectory] = None, chunk_size: Union[None, int] = None) -> float:
+        if chunk_size is None:
+            return super().rounds(n, record)
+
+        total_regret = 0.0
+        done = 0
+        while done < n:
+            rewards = self._environment.rewards_chunk(min(chunk_size, n - done))
+            m = rewards.shape[0]
+            if m == 0:  # The environment no more accepts inputs.
+                break
+
+            arms = self._bandit.play_chunk(rewards)
+            obtained = rewards[np.arange(m), arms]
+            regrets = self._environment.regret_chunk(rewards, obtained)
+            if record is not None:
+                record.extend(regrets, arms, obtained)
+
+            # Sum in the same order as round by round.
+            total_regret = sum(regrets.tolist(), total_regret)
+            self._last_arm, self._last_reward = int(arms[-1]), obtained[-1]
+            done += m
+        return total_regret
+
     def round(self) -> float:
-        if self._environment.may_stop_accepting_inputs and not self._environment.will_accept_input():
-            raise EnvironmentNoMoreAcceptingInputsException
+        self._check_input()
 
         arm = self._bandit.pull()
         rewards, reward = self._environment.rewards(arm)  # List and float.
         self._bandit.rewards(rewards)
+        self._last_arm, self._last_reward = arm, reward
         return self.regret(reward)
 
 
@@ -74,12 +198,12 @@ class SemiBanditFeedbackExperiment(Experiment):
         super().__init__(environment, bandit)
 
     def round(self) -> float:
-        if self._environment.may_stop_accepting_inputs and not self._environment.will_accept_input():
-            raise EnvironmentNoMoreAcceptingInputsException
+        self._check_input()
 
         arm = self._bandit.pull()
         rewards, reward = self._environment.rewards(arm)  # Dictionary and float.
         self._bandit.rewards(rewards)
+        self._last_arm, self._last_reward = arm, reward
         return self.regret(reward)
 
 
@@ -90,10 +214,10 @@ class BanditFeedbackExperiment(Experiment):
         super().__init__(environment, bandit)
 
     def round(self) -> float:
-        if self._environment.may_stop_accepting_inputs and not self._environment.will_accept_input():
-            raise EnvironmentNoMoreAcceptingInputsException
+        self._check_input()
 
         arm = self._bandit.pull()
         reward = self._environment.reward(arm)
         self._bandit.reward(arm, reward)
+        self._last_arm, self._last_reward = arm, reward
         return self.regret(reward)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from skbandit.bandits.batched import BatchedBandit
+from skbandit.environments.stochastic import StochasticMultiArmedEnvironment
+from skbandit.experiments.stochastic import MultiArmedStochasticExperiment
+
+
+class BatchedMultiArmedStochasticExperiment(MultiArmedStochasticExperiment):
+    """Performs many independent replicates of an experiment with a multi-armed bandit facing a stochastic setting.
+
+    An experiment takes two parameters: a batched `bandit`, which acts on an `environment`. All replicates are
+    performed in lockstep: each call to `round()` plays one round for all of them, and yields the regret of each
+    replicate as an array of shape `(n_replicates,)`. Similarly, `rounds(n)` yields the total regret of each replicate.
+    Trajectories given to `rounds` must be created with `n_replicates`.
+
+    The rewards of all replicates are drawn with one call to the `reward_batch` method of the environment: the
+    environment must be stationary, so that these rewards are those of the same round, and always accept inputs, as
+    the replicates cannot share a budget (or any other resource).
+    """
+
+    def __init__(self, environment: StochasticMultiArmedEnvironment, bandit: BatchedBandit):
+        if not isinstance(environment, StochasticMultiArmedEnvironment):
+            raise AssertionError("Replicates require a stationary environment (StochasticMultiArmedEnvironment).")
+        if environment.may_stop_accepting_inputs:
+            raise AssertionError("Replicates require an environment that always accepts inputs.")
+        super().__init__(environment, bandit)
+
+    @property
+    def n_replicates(self):
+        return self._bandit.n_replicates
+
+    def round(self) -> np.ndarray:
+        self._check_input()
+
+        arms = self._bandit.pull()
+        rewards = self._environment.reward_batch(arms)
+        self._bandit.reward(arms, rewards)
+        self._last_arm, self._last_reward = arms, rewards
+        return self.regret(rewards)
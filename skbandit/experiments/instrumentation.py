@@ -0,0 +1,129 @@
+import time
+from typing import Callable, ContextManager, Dict
+
+# Methods that are timed, for the bandit and for the environment.
+BANDIT_PHASES = ('pull', 'reward', 'rewards')
+ENVIRONMENT_PHASES = ('reward', 'rewards', 'reward_batch', 'regret')
+
+
+class PhaseStats:
+    """Wall time and number of calls of each phase of the rounds of an experiment, in nanoseconds.
+
+    Phases are named after the object and the method, like `bandit.pull`, `environment.reward`, `bandit.reward`,
+    or `environment.regret` (called by `Experiment.regret`). The phase `round` is the whole round: the difference
+    with the other phases is the time spent in the experiment itself.
+
+    Only one round every `every` is measured: the figures are those of the sampled rounds (`n_rounds` of them).
+    """
+
+    def __init__(self, every: int):
+        self._every = every
+        self._n_rounds = 0
+        self._counts = {}
+        self._times = {}
+
+    def record(self, phase: str, nanoseconds: int) -> None:
+        self._counts[phase] = self._counts.get(phase, 0) + 1
+        self._times[phase] = self._times.get(phase, 0) + nanoseconds
+
+    def record_round(self, nanoseconds: int) -> None:
+        """Records one measured round, that lasted `nanoseconds` as a whole."""
+        self.record('round', nanoseconds)
+        self._n_rounds += 1
+
+    @property
+    def every(self) -> int:
+        return self._every
+
+    @property
+    def n_rounds(self) -> int:
+        """The number of rounds that were measured."""
+        return self._n_rounds
+
+    @property
+    def phases(self):
+        return list(self._times.keys())
+
+    def count(self, phase: str) -> int:
+        return self._counts.get(phase, 0)
+
+    def total_ns(self, phase: str) -> int:
+        return self._times.get(phase, 0)
+
+    def mean_ns(self, phase: str) -> float:
+        """Mean time of one call of the phase."""
+        return self._times[phase] / self._counts[phase] if phase in self._counts else 0.0
+
+    def fractions(self) -> Dict[str, float]:
+        """Share of the time of the rounds spent in each phase (except `round`), plus `other` for the rest."""
+        total = self._times.get('round', 0)
+        if total == 0:
+            return {}
+        fractions = {phase: time / total for phase, time in self._times.items() if phase != 'round'}
+        fractions['other'] = max(0.0, 1.0 - sum(fractions.values()))
+        return fractions
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {phase: {'count': self._counts[phase], 'total_ns': self._times[phase],
+                        'mean_ns': self.mean_ns(phase)} for phase in self._times}
+
+    def __repr__(self):
+        lines = ['PhaseStats({} rounds measured, one every {})'.format(self._n_rounds, self._every)]
+        for phase in sorted(self._times, key=self._times.get, reverse=True):
+            lines.append('  {:<22} {:>10} calls {:>14.0f} ns/call'.format(
+                phase, self._counts[phase], self.mean_ns(phase)))
+        return '\n'.join(lines)
+
+
+class _TimedProxy:
+    """Forwards everything to an object, timing the calls to some of its methods."""
+
+    def __init__(self, target, name: str, methods, stats: PhaseStats):
+        self._target = target
+        self._timed = {}
+        for method in methods:
+            if hasattr(target, method):
+                self._timed[method] = self._time(getattr(target, method), name + '.' + method, stats)
+
+    @staticmethod
+    def _time(method, phase: str, stats: PhaseStats):
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.record(phase, time.perf_counter_ns() - start)
+        return timed
+
+    def __getattr__(self, name):
+        timed = self._timed.get(name)
+        return timed if timed is not None else getattr(self._target, name)
+
+
+def sampled_round(plain_round: Callable[[], float], swapped: Callable[[object, object], ContextManager],
+                  bandit, environment, stats: PhaseStats) -> Callable[[], float]:
+    """Returns a function that performs one round of an experiment, measuring one round every `stats.every`.
+
+    Rounds that are not measured call `plain_round` directly. For measured ones, the `bandit` and the `environment` of
+    the experiment are replaced by proxies that time the calls, within the context manager `swapped(bandit,
+    environment)`, which gives the original objects back when the round ends, even if it raises an exception.
+    """
+    timed_bandit = _TimedProxy(bandit, 'bandit', BANDIT_PHASES, stats)
+    timed_environment = _TimedProxy(environment, 'environment', ENVIRONMENT_PHASES, stats)
+    every = stats.every
+    countdown = [1]  # The first round is measured.
+
+    def timed_round():
+        countdown[0] -= 1
+        if countdown[0] > 0:
+            return plain_round()
+        countdown[0] = every
+
+        with swapped(timed_bandit, timed_environment):
+            start = time.perf_counter_ns()
+            try:
+                return plain_round()
+            finally:
+                stats.record_round(time.perf_counter_ns() - start)
+
+    return timed_round
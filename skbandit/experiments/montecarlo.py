@@ -0,0 +1,122 @@
+import collections
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Sequence, Union
+
+import numpy as np
+
+from skbandit.bandits import Bandit
+from skbandit.environments import Environment
+from skbandit.experiments.base import Experiment, BanditFeedbackExperiment
+
+MonteCarloResult = collections.namedtuple('MonteCarloResult',
+                                          ['n_replicates', 'mean_regret', 'checkpoints', 'quantiles',
+                                           'quantile_regret'])
+MonteCarloResult.__doc__ = """Summary of the cumulative regret over many replicates of an experiment.
+
+* `mean_regret`: the mean cumulative regret after each round, an array of shape `(horizon,)`
+* `checkpoints`: the rounds (starting at 0) at which the quantiles are computed
+* `quantile_regret`: the quantiles of the cumulative regret, an array of shape `(len(quantiles), len(checkpoints))`
+"""
+
+
+def _run_chunk(environment_factory, bandit_factory, experiment_factory, seeds, horizon, checkpoints):
+    """Performs the replicates for the given seeds, returning the sum of their cumulative regrets and their
+    cumulative regrets at the checkpoints.
+
+    The sum is performed in the order of the seeds, so that the result does not depend on the process performing it.
+    """
+    total = np.zeros(horizon)
+    at_checkpoints = np.empty((len(seeds), checkpoints.shape[0]))
+    regret = np.zeros(horizon)
+
+    for i, seed in enumerate(seeds):
+        environment_seed, bandit_seed = seed.spawn(2)
+        environment = environment_factory(np.random.default_rng(environment_seed))
+        bandit = bandit_factory(np.random.default_rng(bandit_seed))
+        experiment = experiment_factory(environment, bandit)
+
+        regret[:] = 0.0
+        t = 0
+        while t < horizon:
+            # Perform the rounds that the environment is known to accept without checking it before each of them.
+            m = experiment.accepted_rounds(horizon - t)
+            if m == 0:
+                break
+            for _ in range(m):
+                regret[t] = experiment.round()
+                t += 1
+
+        cumulative_regret = np.cumsum(regret)
+        total += cumulative_regret
+        at_checkpoints[i] = cumulative_regret[checkpoints]
+
+    return total, at_checkpoints
+
+
+class MonteCarloRunner:
+    """Performs many independent replicates of an experiment, possibly in parallel, and summarises their regret.
+
+    The runner takes factories rather than objects, as each replicate needs fresh ones:
+
+    * `environment_factory(rng)` returns a new environment
+    * `bandit_factory(rng)` returns a new bandit
+    * `experiment_factory(environment, bandit)` returns the experiment (by default, `BanditFeedbackExperiment`)
+
+    `rng` is a NumPy `Generator`: all the randomness of the environment and of the bandit must come from it (for
+    instance, by setting the `random_state` of SciPy distributions), so that replicates are independent and
+    reproducible. The generators are spawned from one `SeedSequence` per replicate. When running in several
+    processes, the factories must be picklable (functions defined at the top level of a module, or
+    `functools.partial` objects built on them).
+
+    Replicates are distributed by chunks of `chunk_size` to the workers, which only send back the sum of the cumulative
+    regret curves and the cumulative regret at a few checkpoints (by default, 100, linearly spaced), not whole
+    trajectories. As chunks do not depend on the number of workers and are reduced in a fixed order, the results are
+    bit-identical whatever the number of workers.
+    """
+
+    def __init__(self, environment_factory: Callable[[np.random.Generator], Environment],
+                 bandit_factory: Callable[[np.random.Generator], Bandit],
+                 experiment_factory: Callable[[Environment, Bandit], Experiment] = BanditFeedbackExperiment,
+                 quantiles: Sequence[float] = (0.05, 0.5, 0.95), n_checkpoints: int = 100, chunk_size: int = 16):
+        self._environment_factory = environment_factory
+        self._bandit_factory = bandit_factory
+        self._experiment_factory = experiment_factory
+        self._quantiles = np.asarray(quantiles, dtype=float)
+        self._n_checkpoints = n_checkpoints
+        self._chunk_size = chunk_size
+
+    def checkpoints(self, horizon: int) -> np.ndarray:
+        """Returns the rounds at which the quantiles of the regret are computed, always including the last one."""
+        return np.unique(np.linspace(0, horizon - 1, min(self._n_checkpoints, horizon)).round().astype(np.int64))
+
+    def run(self, n_replicates: int, horizon: int, seed: Union[None, int, np.random.SeedSequence] = None,
+            n_workers: Union[None, int] = None) -> MonteCarloResult:
+        """Performs `n_replicates` replicates of `horizon` rounds each.
+
+        The replicates are performed in the current process if `n_workers` is 1, otherwise in a process pool (with
+        as many workers as processors if `n_workers` is `None`).
+        """
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        seeds = seed.spawn(n_replicates)
+        checkpoints = self.checkpoints(horizon)
+        chunks = [seeds[start:start + self._chunk_size] for start in range(0, n_replicates, self._chunk_size)]
+        arguments = (self._environment_factory, self._bandit_factory, self._experiment_factory)
+
+        if n_workers == 1:
+            results = [_run_chunk(*arguments, chunk, horizon, checkpoints) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count()) as executor:
+                futures = [executor.submit(_run_chunk, *arguments, chunk, horizon, checkpoints) for chunk in chunks]
+                results = [future.result() for future in futures]
+
+        # Reduce in the order of the chunks.
+        total = np.zeros(horizon)
+        for chunk_total, _ in results:
+            total += chunk_total
+        at_checkpoints = np.concatenate([chunk_checkpoints for _, chunk_checkpoints in results])
+
+        return MonteCarloResult(n_replicates=n_replicates, mean_regret=total / n_replicates, checkpoints=checkpoints,
+                                quantiles=self._quantiles,
+                                quantile_regret=np.quantile(at_checkpoints, self._quantiles, axis=0))
@@ -0,0 +1,201 @@
+import collections
+import math
+from typing import Callable, Union
+
+import numpy as np
+
+from skbandit.bandits import Bandit
+from skbandit.bandits.base import RewardStatistics
+from skbandit.environments import EnvironmentNoMoreAcceptingInputsException
+from skbandit.environments.logged import LoggedDataset, LoggedBanditEnvironment
+from skbandit.experiments import BanditFeedbackExperiment
+
+OfflineEstimate = collections.namedtuple('OfflineEstimate', ['value', 'standard_error', 'n_records', 'n_matched'])
+OfflineEstimate.__doc__ = """Estimate of the mean reward per round of a policy, from logged data.
+
+* `standard_error`: the standard error of `value` (its standard deviation, estimated from the data)
+* `n_records`: the number of records that were read
+* `n_matched`: the number of records where the policy played the logged arm
+"""
+
+
+class _Mean:
+    """Mean and standard error of values given by chunks, without keeping them. The values are accumulated like the
+    rewards of one arm, with Chan et al.'s formula for the variance, which is numerically stable.
+    """
+
+    def __init__(self):
+        self._statistics = RewardStatistics(1)
+
+    def add(self, values: np.ndarray) -> None:
+        self._statistics.add_batch(np.zeros(values.shape[0], dtype=np.int64), values)
+
+    @property
+    def n(self) -> int:
+        return int(self._statistics.counts[0])
+
+    @property
+    def mean(self) -> float:
+        return float(self._statistics.means[0]) if self.n > 0 else math.nan
+
+    @property
+    def standard_error(self) -> float:
+        if self.n < 2:
+            return math.nan
+        variance = float(self._statistics.squared_deviations[0]) / (self.n - 1)
+        return math.sqrt(variance / self.n)
+
+
+class OfflineEvaluator:
+    """Estimates the value of a bandit policy from a logged dataset, without deploying it.
+
+    Records are read by chunks of `chunk_size`, so that the memory does not depend on the size of the dataset. For
+    each chunk, the decisions of the bandit are made at once, with `pull_batch` (with the contexts of the records, if
+    any). Three estimators are available:
+
+    * `replay`: rejection sampling. Only the records where the bandit played the logged arm are kept; their mean
+      reward estimates the value of the policy. It is unbiased when the logging policy played uniformly at random.
+      The bandit may learn from the kept records, after each record, as online, or only every `learn_every` records
+    * `ips`: inverse propensity scoring. Each kept record is weighted by the inverse of its propensity (at most
+      `clip`), which corrects for a nonuniform logging policy
+    * `doubly_robust`: like `ips`, but corrects the predictions of a model of the rewards, which reduces the variance
+
+    See also: Li et al., Unbiased offline evaluation of contextual-bandit-based news article recommendation
+    algorithms, WSDM 2011; Dudík et al., Doubly robust policy evaluation and learning, ICML 2011.
+    """
+
+    def __init__(self, dataset: LoggedDataset, chunk_size: int = 65536):
+        self._dataset = dataset
+        self._chunk_size = chunk_size
+
+    @property
+    def dataset(self) -> LoggedDataset:
+        return self._dataset
+
+    def _decisions(self, bandit: Bandit, chunk, rows: Union[slice, np.ndarray] = slice(None)) -> np.ndarray:
+        if chunk.contexts is not None:
+            return np.asarray(bandit.pull_batch(chunk.contexts[rows]))
+        return np.asarray(bandit.pull_batch(n=chunk.arms[rows].shape[0]))
+
+    def replay(self, bandit: Bandit, learn: bool = True, learn_every: int = 1) -> OfflineEstimate:
+        """Replays the dataset with rejection sampling. If `learn`, the bandit learns from the kept records, after
+        each record by default, as it would online. With a larger `learn_every`, it only learns every `learn_every`
+        records (and at the end of each chunk), which is faster: the decisions in between are made at once, with
+        `pull_batch`.
+
+        As in Li et al.'s replay, only the kept records are part of the history of the bandit: the decisions for the
+        other records are undone (see `Bandit.decision_state`), so that, for instance, the round counter of the
+        bandit only counts the kept records. When several records are decided at once, the kept ones are decided
+        again after undoing the decisions.
+        """
+        if learn_every < 1:
+            raise AssertionError("The bandit must learn at least once every learn_every records.")
+
+        kept = _Mean()
+        n_records = 0
+        step = learn_every if learn else self._chunk_size
+        for chunk in self._dataset.chunks(self._chunk_size):
+            n = chunk.arms.shape[0]
+            matched = np.empty(n, dtype=bool)
+            for start in range(0, n, step):
+                rows = slice(start, start + step)
+                state = bandit.decision_state()
+                matched[rows] = self._decisions(bandit, chunk, rows) == chunk.arms[rows]
+
+                kept_rows = np.arange(start, min(start + step, n))[matched[rows]]
+                if not np.all(matched[rows]):
+                    bandit.set_decision_state(state)
+                    if kept_rows.shape[0] > 0:
+                        self._decisions(bandit, chunk, kept_rows)
+
+                if learn and kept_rows.shape[0] > 0:
+                    contexts = None if chunk.contexts is None else chunk.contexts[kept_rows]
+                    bandit.reward_batch(chunk.arms[kept_rows], chunk.rewards[kept_rows], contexts)
+
+            kept.add(chunk.rewards[matched])
+            n_records += n
+
+        return OfflineEstimate(value=kept.mean, standard_error=kept.standard_error, n_records=n_records,
+                               n_matched=kept.n)
+
+    def ips(self, bandit: Bandit, clip: float = math.inf) -> OfflineEstimate:
+        """Inverse propensity scoring, with importance weights clipped at `clip`. The bandit does not learn."""
+        return self._weighted(bandit, clip, None)
+
+    def doubly_robust(self, bandit: Bandit, reward_model: Callable[[Union[None, np.ndarray], np.ndarray], np.ndarray],
+                      clip: float = math.inf) -> OfflineEstimate:
+        """Doubly robust estimator. `reward_model(contexts, arms)` predicts the reward of each arm for the
+        corresponding context (`contexts` being `None` for datasets without contexts). The bandit does not learn.
+        """
+        return self._weighted(bandit, clip, reward_model)
+
+    def _weighted(self, bandit: Bandit, clip: float, reward_model) -> OfflineEstimate:
+        estimate = _Mean()
+        n_matched = 0
+        for chunk in self._dataset.chunks(self._chunk_size):
+            decisions = self._decisions(bandit, chunk)
+            matched = decisions == chunk.arms
+            weights = np.where(matched, np.minimum(1.0 / chunk.propensities, clip), 0.0)
+
+            if reward_model is None:
+                values = weights * chunk.rewards
+            else:
+                predicted_logged = np.asarray(reward_model(chunk.contexts, chunk.arms), dtype=float)
+                predicted_decisions = np.asarray(reward_model(chunk.contexts, decisions), dtype=float)
+                values = predicted_decisions + weights * (chunk.rewards - predicted_logged)
+
+            estimate.add(values)
+            n_matched += int(np.count_nonzero(matched))
+
+        return OfflineEstimate(value=estimate.mean, standard_error=estimate.standard_error, n_records=estimate.n,
+                               n_matched=n_matched)
+
+
+class LoggedBanditExperiment(BanditFeedbackExperiment):
+    """Performs an experiment with a bandit on logged data (`LoggedBanditEnvironment`), one record at a time, as
+    online: the bandit gets the context of each record, and learns after each round.
+
+    A round is a record where the bandit decides the logged arm. The other records are rejected when looking for the
+    next round, in `accepted_rounds` (or in `round`, when called directly): the decision of the bandit is undone (see
+    `Bandit.decision_state`), and the record is skipped, without regret. As in Li et al.'s replay, only the played
+    records are part of the history of the bandit; when the logging policy played uniformly at random, the rounds are
+    distributed as online. The experiment stops at the end of the dataset.
+
+    When only the value of the policy is needed, `OfflineEvaluator.replay` estimates it from the same records, much
+    faster.
+    """
+
+    def __init__(self, environment: LoggedBanditEnvironment, bandit: Bandit):
+        super().__init__(environment, bandit)
+        self._best_arm = environment.best_arm
+        self._decided = False  # Whether the bandit decided the logged arm of the current record.
+
+    def _find_round(self) -> bool:
+        """Rejects the records where the bandit does not decide the logged arm, until one is found (then returns
+        `True`) or the dataset ends.
+        """
+        while not self._decided and self._environment.will_accept_input():
+            state = self._bandit.decision_state()
+            if self._bandit.pull(context=self._environment.context) == self._environment.logged_arm:
+                self._decided = True
+            else:
+                self._bandit.set_decision_state(state)
+                self._environment.skip()
+        return self._decided
+
+    def accepted_rounds(self, n: int) -> int:
+        self._n_accepted = min(n, 1) if self._find_round() else 0
+        return self._n_accepted
+
+    def round(self) -> float:
+        if not self._find_round():
+            raise EnvironmentNoMoreAcceptingInputsException
+        self._check_input()
+
+        context = self._environment.context
+        arm = self._environment.logged_arm
+        reward = self._environment.reward(arm)
+        self._decided = False
+        self._bandit.reward(arm, reward, context=context)
+        self._last_arm, self._last_reward = arm, reward
+        return self.regret(reward)
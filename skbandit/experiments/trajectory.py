@@ -0,0 +1,157 @@
+import collections
+import os
+from typing import Union, Sequence
+
+import numpy as np
+
+
+class Trajectory:
+    """Records what happens at each round of an experiment: the regret, the cumulative regret, the arm that was played
+    and the reward that was obtained.
+
+    A trajectory is given to `Experiment.rounds` (through its `record` parameter). All arrays are allocated once, when
+    the trajectory is created, for at most `horizon` rounds; rounds beyond the horizon are not recorded. If a
+    `directory` is given, the arrays are memory-mapped `.npy` files in that directory (`rounds.npy`, `regrets.npy`,
+    etc.), for horizons whose trajectories do not fit in memory; they can be read again with `np.load`.
+
+    To bound the memory, only some rounds may be recorded: one every `every` rounds (the last round of each block of
+    `every` rounds), or only the given `checkpoints` (round numbers, starting at 0). `Trajectory.log_spaced` builds
+    a trajectory with logarithmically spaced checkpoints. The cumulative regret is computed over all rounds, be they
+    recorded or not.
+
+    For batched experiments, `n_replicates` gives the number of replicates: then, each round records one value per
+    replicate. For combinatorial experiments, the arm is recorded as -1.
+    """
+
+    def __init__(self, horizon: int, every: int = 1, checkpoints: Union[None, Sequence[int]] = None,
+                 directory: Union[None, str] = None, n_replicates: Union[None, int] = None):
+        if checkpoints is not None:
+            self._checkpoints = np.unique(np.asarray(checkpoints, dtype=np.int64))
+            self._checkpoints = self._checkpoints[(self._checkpoints >= 0) & (self._checkpoints < horizon)]
+            capacity = self._checkpoints.shape[0]
+        elif every >= 1:
+            self._checkpoints = None
+            capacity = horizon // every
+        else:
+            raise AssertionError("At least one round out of every must be recorded.")
+
+        self._horizon = horizon
+        self._every = every
+        self._directory = directory
+
+        shape = (capacity,) if n_replicates is None else (capacity, n_replicates)
+        self._rounds = self._allocate('rounds', (capacity,), np.int64)
+        self._regrets = self._allocate('regrets', shape, np.float64)
+        self._cumulative_regrets = self._allocate('cumulative_regrets', shape, np.float64)
+        self._arms = self._allocate('arms', shape, np.int64)
+        self._rewards = self._allocate('rewards', shape, np.float64)
+
+        self._size = 0
+        self._round = 0
+        self._cumulative_regret = 0.0 if n_replicates is None else np.zeros(n_replicates)
+        self._next_round = self._recorded_round(0)
+
+    @classmethod
+    def log_spaced(cls, horizon: int, n_points: int, directory: Union[None, str] = None,
+                   n_replicates: Union[None, int] = None) -> 'Trajectory':
+        """Creates a trajectory that records about `n_points` rounds, logarithmically spaced (including the last)."""
+        checkpoints = np.unique(np.geomspace(1, horizon, n_points).round().astype(np.int64)) - 1
+        return cls(horizon, checkpoints=checkpoints, directory=directory, n_replicates=n_replicates)
+
+    def _allocate(self, name: str, shape: tuple, dtype) -> np.ndarray:
+        if self._directory is None:
+            return np.zeros(shape, dtype=dtype)
+        return np.lib.format.open_memmap(os.path.join(self._directory, name + '.npy'), mode='w+', dtype=dtype,
+                                         shape=shape)
+
+    def _recorded_round(self, i: int) -> int:
+        """Returns the number of the i-th recorded round, -1 if there is none."""
+        if i >= self._rounds.shape[0]:
+            return -1
+        if self._checkpoints is not None:
+            return int(self._checkpoints[i])
+        return (i + 1) * self._every - 1
+
+    def append(self, regret: float, arm: Union[int, Sequence[int], np.ndarray], reward: float) -> None:
+        """Records one round."""
+        self._cumulative_regret += regret
+        current_round = self._round
+        self._round += 1
+        if current_round != self._next_round:
+            return
+
+        i = self._size
+        self._rounds[i] = current_round
+        self._regrets[i] = regret
+        self._cumulative_regrets[i] = self._cumulative_regret
+        self._arms[i] = -1 if isinstance(arm, collections.abc.Sequence) else arm
+        self._rewards[i] = reward
+
+        self._size += 1
+        self._next_round = self._recorded_round(self._size)
+
+    def extend(self, regrets: np.ndarray, arms: np.ndarray, rewards: np.ndarray) -> None:
+        """Records several consecutive rounds at once (one element of each array per round), like `append` would."""
+        start = self._round
+        n = regrets.shape[0]
+        # Accumulate in the same order as append.
+        cumulative_regrets = np.cumsum(np.concatenate([np.asarray(self._cumulative_regret)[np.newaxis], regrets]),
+                                       axis=0)[1:]
+        if n > 0:
+            self._cumulative_regret = cumulative_regrets[-1]
+        self._round += n
+
+        # Recorded rounds within this chunk.
+        capacity = self._rounds.shape[0]
+        if self._next_round < 0 or self._next_round >= start + n:
+            return
+        elif self._checkpoints is not None:
+            end = min(capacity, self._size + int(np.searchsorted(self._checkpoints[self._size:], start + n)))
+            recorded = self._checkpoints[self._size:end]
+        else:
+            recorded = np.arange(self._next_round, start + n, self._every)[:capacity - self._size]
+
+        positions = recorded - start
+        size = self._size + recorded.shape[0]
+        self._rounds[self._size:size] = recorded
+        self._regrets[self._size:size] = regrets[positions]
+        self._cumulative_regrets[self._size:size] = cumulative_regrets[positions]
+        self._arms[self._size:size] = arms[positions]
+        self._rewards[self._size:size] = rewards[positions]
+
+        self._size = size
+        self._next_round = self._recorded_round(self._size)
+
+    def flush(self) -> None:
+        """Writes memory-mapped arrays to disk."""
+        if self._directory is not None:
+            for array in [self._rounds, self._regrets, self._cumulative_regrets, self._arms, self._rewards]:
+                array.flush()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def horizon(self) -> int:
+        return self._horizon
+
+    @property
+    def rounds(self) -> np.ndarray:
+        """The numbers of the recorded rounds (starting at 0)."""
+        return self._rounds[:self._size]
+
+    @property
+    def regrets(self) -> np.ndarray:
+        return self._regrets[:self._size]
+
+    @property
+    def cumulative_regrets(self) -> np.ndarray:
+        return self._cumulative_regrets[:self._size]
+
+    @property
+    def arms(self) -> np.ndarray:
+        return self._arms[:self._size]
+
+    @property
+    def rewards(self) -> np.ndarray:
+        return self._rewards[:self._size]
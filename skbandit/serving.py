@@ -0,0 +1,221 @@
+import asyncio
+import collections
+import itertools
+import time
+from typing import Callable, Union
+
+import numpy as np
+
+from skbandit.bandits import Bandit
+
+Decision = collections.namedtuple('Decision', ['ticket', 'arm'])
+Decision.__doc__ = """A decision of a `DecisionService`: the `arm` to play, and the `ticket` to give back with the
+reward."""
+
+LatencyReport = collections.namedtuple('LatencyReport', ['n_requests', 'duration', 'p50', 'p99', 'max'])
+LatencyReport.__doc__ = """Latencies of the decisions made during a load test, in seconds.
+
+* `duration`: the total duration of the load test (requests per second: `n_requests / duration`)
+* `p50`, `p99`, `max`: the median, the 99th percentile and the maximum of the decision latency
+"""
+
+
+class DecisionService:
+    """Serves the decisions of a bandit to concurrent requests, whose rewards arrive later and in any order.
+
+    Each call to `decide(context)` returns a `Decision`: the arm to play and a ticket. When the reward of that
+    decision is known, possibly much later, `report(ticket, reward)` gives it back. Rewards are not learnt immediately:
+    they are kept pending, then learnt all at once, with one call to the `reward_batch` method of the bandit, every
+    `flush_interval` seconds or as soon as `max_pending` rewards are pending. Hence, the event loop is never blocked
+    by one model update per request, and the bandit may make decisions with slightly outdated statistics.
+
+    The service runs within an asyncio event loop: it must be started (`await service.start()`) and stopped
+    (`await service.stop()`, which learns the rewards that are still pending), or used as an asynchronous context
+    manager (`async with DecisionService(bandit) as service`). If the bandit fails to learn the pending rewards
+    periodically, they are kept pending for the next flush, and the exception is given to `on_error` (by default, to
+    the exception handler of the event loop, which logs it).
+
+    Either all decisions or none have a context. Bandits are not thread-safe: the service must only be used from the
+    thread of its event loop.
+    """
+
+    def __init__(self, bandit: Bandit, flush_interval: float = 0.01, max_pending: int = 1024,
+                 on_error: Union[None, Callable[[Exception], None]] = None):
+        if flush_interval <= 0.0:
+            raise AssertionError("The flush interval must be positive.")
+        if max_pending < 1:
+            raise AssertionError("At least one reward must be allowed to be pending.")
+
+        self._bandit = bandit
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._on_error = on_error
+
+        self._tickets = itertools.count()
+        self._outstanding = {}  # Ticket -> (arm, context), for decisions whose reward is not yet known.
+        self._pending_arms = []
+        self._pending_rewards = []
+        self._pending_contexts = []
+        self._contextual = None  # Whether decisions have contexts, known after the first one.
+        self._flusher = None
+        self._n_flushes = 0
+
+    @property
+    def bandit(self) -> Bandit:
+        return self._bandit
+
+    @property
+    def n_outstanding(self) -> int:
+        """The number of decisions whose reward has not been reported yet."""
+        return len(self._outstanding)
+
+    @property
+    def n_pending(self) -> int:
+        """The number of rewards that have been reported, but not yet learnt."""
+        return len(self._pending_arms)
+
+    @property
+    def n_flushes(self) -> int:
+        """The number of batched updates of the bandit so far."""
+        return self._n_flushes
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None
+
+    async def start(self) -> None:
+        """Starts learning the pending rewards periodically."""
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stops learning periodically, after learning all pending rewards. Outstanding decisions are kept: their
+        rewards can still be reported, and will be learnt when the service is started again or flushed.
+        """
+        if self._flusher is not None:
+            flusher, self._flusher = self._flusher, None
+            flusher.cancel()
+            try:
+                await flusher
+            except asyncio.CancelledError:
+                pass
+        self.flush()
+
+    async def __aenter__(self) -> 'DecisionService':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.stop()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                self.flush()
+            except Exception as e:  # The rewards are kept pending: the next flush tries again.
+                if self._on_error is not None:
+                    self._on_error(e)
+                else:
+                    asyncio.get_running_loop().call_exception_handler({
+                        'message': "The bandit failed to learn the pending rewards.", 'exception': e})
+
+    def decide(self, context: Union[None, np.ndarray] = None) -> Decision:
+        """Decides the arm to play for one request."""
+        if self._contextual is None:
+            self._contextual = context is not None
+        elif self._contextual != (context is not None):
+            raise AssertionError("Either all decisions or none must have a context.")
+
+        arm = self._bandit.pull(context=context)
+        ticket = next(self._tickets)
+        self._outstanding[ticket] = (arm, context)
+        return Decision(ticket, arm)
+
+    def report(self, ticket: int, reward: float) -> None:
+        """Gives the reward of the decision with the given ticket. Each ticket can be reported only once."""
+        try:
+            arm, context = self._outstanding.pop(ticket)
+        except KeyError:
+            raise KeyError("Unknown ticket {}: it was never issued, or its reward was already reported."
+                           .format(ticket)) from None
+
+        self._pending_arms.append(arm)
+        self._pending_rewards.append(reward)
+        self._pending_contexts.append(context)
+        if len(self._pending_arms) >= self._max_pending:
+            self.flush()
+
+    def forget(self, ticket: int) -> None:
+        """Drops a decision whose reward will never be known (for instance, after a timeout)."""
+        self._outstanding.pop(ticket, None)
+
+    def flush(self) -> None:
+        """Learns all pending rewards at once. If the bandit fails to learn them, they are kept pending."""
+        if not self._pending_arms:
+            return
+
+        arms = np.array(self._pending_arms)
+        rewards = np.array(self._pending_rewards, dtype=float)
+        # Contextual bandits get all contexts at once; the others, none.
+        contexts = None if self._pending_contexts[0] is None else np.stack(self._pending_contexts)
+        self._bandit.reward_batch(arms, rewards, contexts)
+
+        self._pending_arms = []
+        self._pending_rewards = []
+        self._pending_contexts = []
+        self._n_flushes += 1
+
+
+async def measure_latency(service: DecisionService, n_requests: int, concurrency: int = 64,
+                          context: Union[None, Callable[[np.random.Generator], np.ndarray]] = None,
+                          reward: Union[None, Callable[[np.random.Generator, int], float]] = None,
+                          max_delay: float = 0.01, random_state: Union[None, int, np.random.Generator] = None) \
+        -> LatencyReport:
+    """Generates load on a running service, within the current process, and measures the latency of its decisions.
+
+    `concurrency` clients send `n_requests` requests in total, as fast as possible. Each request has a context drawn
+    with `context(rng)` (if given). Its reward, `reward(rng, arm)` (by default, uniform between 0 and 1), is reported
+    after a random delay of at most `max_delay` seconds, so that rewards arrive out of order. The function returns
+    when all rewards have been reported.
+    """
+    rng = np.random.default_rng(random_state)
+    loop = asyncio.get_running_loop()
+    latencies = np.empty(n_requests)
+    requests = iter(range(n_requests))
+    reports = []
+
+    def report_later(ticket: int, value: float) -> None:
+        future = loop.create_future()
+
+        def report():
+            # The future must be resolved whatever happens, so that waiting for all reports does not hang.
+            try:
+                service.report(ticket, value)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(None)
+
+        loop.call_later(rng.uniform(0.0, max_delay), report)
+        reports.append(future)
+
+    async def client():
+        for i in requests:
+            request_context = None if context is None else context(rng)
+            start = time.perf_counter()
+            ticket, arm = service.decide(request_context)
+            latencies[i] = time.perf_counter() - start
+
+            report_later(ticket, rng.uniform() if reward is None else reward(rng, arm))
+            # Let the other clients and the periodic updates run.
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    await asyncio.gather(*reports)
+    duration = time.perf_counter() - start
+
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return LatencyReport(n_requests=n_requests, duration=duration, p50=float(p50), p99=float(p99),
+                         max=float(latencies.max()))
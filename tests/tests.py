@@ -1,13 +1,77 @@
+import asyncio
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
 from typing import List, Union
 
-from scipy.stats import rv_histogram
+import numpy as np
+import scipy.sparse
+from scipy.stats import bernoulli, rv_histogram, uniform
 
-from skbandit.bandits.mab import ExploreThenCommitBandit
-from skbandit.environments.stochastic import StochasticMultiArmedEnvironment
-from skbandit.environments.adversarial import AdversarialMultiArmedEnvironment, Adversary
+from skbandit.bandits import Bandit, RewardAccumulatorMixin, checkpoint
+from skbandit.bandits.adversarial import WeightedMajority, ExponentiallyWeightedForecaster, EXP3
+from skbandit.bandits.batched import BatchedExploreThenCommitBandit, BatchedUCB, BatchedBernoulliThompsonSampling, \
+    BatchedGaussianThompsonSampling
+from skbandit.bandits.combinatorial import TopKOracle, PartitionMatroidOracle, CombinatorialUCB, \
+    CombinatorialThompsonSampling
+from skbandit.bandits.contextual import LinUCB as ContextualLinUCB, HybridLinUCB, SparseLinUCB
+from skbandit.bandits.linear import LinUCB
+from skbandit.bandits.nonstationary import SlidingWindowAccumulatorMixin, DiscountedAccumulatorMixin, \
+    SlidingWindowUCB, DiscountedUCB, SlidingWindowThompsonSampling, DiscountedThompsonSampling
+from skbandit.bandits.sharded import ShardedBandit
+from skbandit.bandits.sumtree import SumTree
+from skbandit.bandits.mab import ExploreThenCommitBandit, UCB1, MOSS, KLUCB, BudgetedUCB, BernoulliThompsonSampling, \
+    GaussianThompsonSampling
+from skbandit.environments.logged import LoggedDataset, LoggedBanditEnvironment
+from skbandit.environments import EnvironmentNoMoreAcceptingInputsException
+from skbandit.environments.stochastic import StochasticMultiArmedEnvironment, StochasticSemiBanditEnvironment, \
+    PiecewiseStationaryMultiArmedEnvironment, BudgetedStochasticMultiArmedEnvironment
+from skbandit.environments.adversarial import AdversarialMultiArmedEnvironment, Adversary, \
+    FullInformationAdversarialMultiArmedEnvironment, ObliviousAdversary
 from skbandit.experiments.stochastic import MultiArmedStochasticExperiment
 from skbandit.experiments.adversarial import MultiArmedAdversarialExperiment
+from skbandit.experiments import FullInformationExperiment, SemiBanditFeedbackExperiment, Trajectory
+from skbandit.experiments.batched import BatchedMultiArmedStochasticExperiment
+from skbandit.experiments.montecarlo import MonteCarloRunner
+from skbandit.experiments.offline import OfflineEvaluator, LoggedBanditExperiment
+from skbandit.serving import DecisionService, measure_latency
+
+
+class TestImports(unittest.TestCase):
+    # Time to import a module of scikit-bandit, NumPy being already imported (in seconds). Importing SciPy's
+    # distributions takes longer.
+    IMPORT_TIME_BUDGET = 0.25
+
+    def run_python(self, code: str) -> str:
+        return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+
+    def test_import_time(self):
+        # The modules that a serving process needs, each in a fresh interpreter.
+        for module in ['skbandit.bandits', 'skbandit.bandits.contextual', 'skbandit.environments.stochastic']:
+            elapsed = float(self.run_python('import time, numpy\n'
+                                            'start = time.perf_counter()\n'
+                                            'import {}\n'
+                                            'print(time.perf_counter() - start)'.format(module)))
+            self.assertLess(elapsed, self.IMPORT_TIME_BUDGET, module)
+
+    def test_lazy(self):
+        # SciPy is not imported by players nor by environments, only by the code that uses its distributions.
+        modules = self.run_python('import sys, skbandit.bandits.contextual, skbandit.environments.stochastic\n'
+                                  'import skbandit.experiments\n'
+                                  'print(" ".join(sorted(sys.modules)))').split()
+        self.assertNotIn('scipy', modules)
+        self.assertNotIn('skbandit.experiments.base', modules)
+
+        import skbandit
+        self.assertIs(skbandit.bandits.Bandit, Bandit)
+        self.assertIs(skbandit.experiments.Trajectory, Trajectory)
+        with self.assertRaises(AttributeError):
+            skbandit.bandits.Unknown
 
 
 class TestExploreThenCommitBandit(unittest.TestCase):
@@ -82,8 +146,8 @@ class TestExploreThenCommitBandit(unittest.TestCase):
         self.assertEqual(b.pull(), 0)
 
         # RewardAccumulatorMixin.
-        self.assertEqual(b.total_rewards, [10.0, 0.0, 5.0])
-        self.assertEqual(b.arm_counts, [1, 1, 1])
+        self.assertEqual(b.total_rewards.tolist(), [10.0, 0.0, 5.0])
+        self.assertEqual(b.arm_counts.tolist(), [1, 1, 1])
 
         # Even if giving more rewards for another arm, no change in exploitation phase.
         # This use is outside the expected use of the bandit.
@@ -103,8 +167,328 @@ class TestExploreThenCommitBandit(unittest.TestCase):
         self.assertEqual(b.pull(), 0)
 
         # RewardAccumulatorMixin did not see any change.
-        self.assertEqual(b.total_rewards, [10.0, 0.0, 5.0])
-        self.assertEqual(b.arm_counts, [1, 1, 1])
+        self.assertEqual(b.total_rewards.tolist(), [10.0, 0.0, 5.0])
+        self.assertEqual(b.arm_counts.tolist(), [1, 1, 1])
+
+    def test_batch(self):
+        b = ExploreThenCommitBandit(n_arms=3)
+
+        # By default, batches are processed one request at a time.
+        np.testing.assert_array_equal(b.pull_batch(n=3), [0, 1, 2])
+        b.reward_batch(np.array([0, 1, 2]), np.array([0.0, 5.0, 1.0]))
+        np.testing.assert_array_equal(b.pull_batch(n=2), [1, 1])
+
+        with self.assertRaises(AssertionError):
+            b.pull_batch()
+
+
+class TestIndexBandits(unittest.TestCase):
+    def test_same_as_exhaustive_search(self):
+        for bandit in [UCB1(n_arms=20), MOSS(n_arms=20, horizon=500), KLUCB(n_arms=20)]:
+            rng = np.random.RandomState(42)
+            means = rng.uniform(size=20)
+
+            for t in range(1, 501):
+                arm = bandit.pull()
+                if t <= 20:  # Initialisation.
+                    self.assertEqual(arm, t - 1)
+                else:
+                    index = bandit._indices(bandit.means, bandit.arm_counts, t)
+                    self.assertEqual(index[arm], np.max(index))
+                bandit.reward(arm, float(rng.uniform() < means[arm]))
+
+    def test_kl_ucb_index(self):
+        b = KLUCB(n_arms=2)
+        for arm, reward in [(0, 1.0), (1, 0.0), (0, 0.0), (1, 0.0)]:
+            b.reward(arm, reward)
+
+        # The index is the largest q such that n d(mean, q) <= log(f(t)).
+        index = b._indices(b.means, b.arm_counts, 10)[0]
+        level = math.log(1 + 10 * math.log(10) ** 2)
+        self.assertAlmostEqual(2 * (0.5 * math.log(0.5 / index) + 0.5 * math.log(0.5 / (1 - index))), level, places=6)
+
+
+class TestThompsonSampling(unittest.TestCase):
+    def test_bernoulli(self):
+        b = BernoulliThompsonSampling(n_arms=3, random_state=42)
+        for arm, reward in [(0, 1.0), (0, 0.0), (1, 1.0), (2, 0.0)]:
+            b.reward(arm, reward)
+        np.testing.assert_array_equal(b.alpha, [2.0, 2.0, 1.0])
+        np.testing.assert_array_equal(b.beta, [2.0, 1.0, 2.0])
+
+        # After many successes of the second arm, it is almost always played.
+        for _ in range(100):
+            b.reward(1, 1.0)
+        self.assertEqual(b.pull(), 1)
+        np.testing.assert_array_equal(b.pull_batch(n=5), [1] * 5)
+        self.assertEqual(b.pull_batch(np.zeros((7, 2))).shape, (7,))
+        self.assertEqual(b.pull_top_k(1), [1])
+        self.assertEqual(sorted(b.pull_top_k(3)), [0, 1, 2])
+
+    def test_gaussian(self):
+        b = GaussianThompsonSampling(n_arms=2, prior_mean=0.0, prior_variance=1.0, noise_variance=1.0,
+                                     random_state=42)
+        b.reward(0, 3.0)
+        np.testing.assert_allclose(b.posterior_variances, [0.5, 1.0])
+        np.testing.assert_allclose(b.posterior_means, [1.5, 0.0])
+
+        # Same random state, same decisions.
+        other = GaussianThompsonSampling(n_arms=2, random_state=42)
+        other.reward(0, 3.0)
+        np.testing.assert_array_equal(b.pull_batch(n=20), other.pull_batch(n=20))
+
+    def test_batched(self):
+        rv0 = rv_histogram(([1], [0, 0.000000001]))
+        rv1 = rv_histogram(([1], [1, 1.000000001]))
+        for b in [BatchedBernoulliThompsonSampling(n_arms=2, n_replicates=4, random_state=42),
+                  BatchedGaussianThompsonSampling(n_arms=2, n_replicates=4, random_state=42)]:
+            exp = BatchedMultiArmedStochasticExperiment(StochasticMultiArmedEnvironment([rv0, rv1]), b)
+            exp.rounds(100)
+
+            # All replicates end up playing the best arm.
+            self.assertTrue(np.all(b.arm_counts[:, 1] > 50))
+
+
+class TestCombinatorial(unittest.TestCase):
+    def test_oracles(self):
+        scores = np.array([0.3, 0.9, 0.1, 0.7, 0.5, 0.8])
+        self.assertEqual(TopKOracle(3)(scores), [1, 5, 3])
+        self.assertEqual(TopKOracle(10)(scores), [1, 5, 3, 4, 0, 2])
+
+        oracle = PartitionMatroidOracle(groups=[0, 0, 1, 1, 1, 2], capacities=[1, 2, 0])
+        self.assertEqual(oracle(scores), [1, 3, 4])
+
+    def test_semi_bandit(self):
+        rng = np.random.RandomState(42)
+        means = [0.1, 0.8, 0.2, 0.7, 0.3, 0.9]
+        for make in [lambda: CombinatorialUCB(n_arms=6, oracle=TopKOracle(2)),
+                     lambda: CombinatorialThompsonSampling(n_arms=6, oracle=TopKOracle(2), random_state=42)]:
+            rvs = [bernoulli(p) for p in means]
+            for rv in rvs:
+                rv.random_state = rng
+            env = StochasticSemiBanditEnvironment(rvs, k=2)
+            self.assertEqual(env.best_arms, [1, 5])
+            with self.assertRaises(AssertionError):
+                env.rewards([0, 1, 2])
+
+            b = make()
+            exp = SemiBanditFeedbackExperiment(env, b)
+            record = Trajectory(horizon=500)
+            exp.rounds(500, record=record)
+            self.assertEqual(int(b.arm_counts.sum()), 1000)
+            np.testing.assert_array_equal(record.arms, -1)
+            # The best super-arm is played most of the time.
+            self.assertEqual(sorted(b.pull()), [1, 5])
+            self.assertGreater(b.arm_counts[5], 300)
+
+    def test_rewards(self):
+        b = CombinatorialUCB(n_arms=4, oracle=TopKOracle(2))
+        # Arms that were never played come first.
+        self.assertEqual(sorted(b.pull()), [0, 1])
+        b.rewards({2: 1.0, 0: 0.5})
+        b.rewards([0.0, 1.0, 0.0, 0.5])
+        self.assertEqual(b.arm_counts.tolist(), [2, 1, 2, 1])
+        self.assertEqual(b.total_rewards.tolist(), [0.5, 1.0, 1.0, 0.5])
+
+    def test_adversarial_sum(self):
+        env = AdversarialMultiArmedEnvironment(DeterministicAdversary())
+        self.assertEqual(env.reward([0, 1]), 1.0)
+
+
+class TestNonstationary(unittest.TestCase):
+    def test_accumulators(self):
+        rng = np.random.RandomState(42)
+        arms = rng.randint(4, size=1000)
+        rewards = rng.uniform(size=1000)
+
+        # Statistics are the same, be the rewards given one by one or by batches (longer or shorter than the window).
+        class Discounted(DiscountedAccumulatorMixin):
+            _max_scale = 1e10  # Force several rescalings.
+
+        window, gamma = SlidingWindowAccumulatorMixin(4, 37), Discounted(4, 0.9)
+        window_batch, gamma_batch = SlidingWindowAccumulatorMixin(4, 37), Discounted(4, 0.9)
+        for arm, reward in zip(arms, rewards):
+            window.reward(arm, reward)
+            gamma.reward(arm, reward)
+        for start, end in [(0, 10), (10, 500), (500, 510), (510, 1000)]:
+            window_batch.reward_batch(arms[start:end], rewards[start:end])
+            gamma_batch.reward_batch(arms[start:end], rewards[start:end])
+
+        discounts = 0.9 ** np.arange(999, -1, -1)
+        for w in [window, window_batch]:
+            np.testing.assert_array_equal(w.window_counts, np.bincount(arms[-37:], minlength=4))
+            np.testing.assert_allclose(w.window_totals, np.bincount(arms[-37:], weights=rewards[-37:], minlength=4))
+        for g in [gamma, gamma_batch]:
+            np.testing.assert_allclose(g.discounted_counts, np.bincount(arms, weights=discounts, minlength=4))
+            np.testing.assert_allclose(g.discounted_totals, np.bincount(arms, weights=discounts * rewards, minlength=4))
+            self.assertAlmostEqual(g.discounted_total_count, np.sum(discounts))
+
+    def test_environment(self):
+        segments = [[rv_histogram(([1], [mean, mean + 0.000000001])) for mean in means]
+                    for means in [[0, 1], [1, 0], [0.5, 0]]]
+        env = PiecewiseStationaryMultiArmedEnvironment(segments, [3, 5])
+        self.assertEqual(env.n_arms, 2)
+
+        # Rounds 0 to 2 in the first segment, 3 and 4 in the second one, then the third one.
+        rewards = np.concatenate(([env.reward(0)], env.reward_batch([0, 0, 0]), env.reward_batch([0, 0, 0])))
+        np.testing.assert_allclose(rewards, [0, 0, 0, 1, 1, 0.5, 0.5], atol=1e-6)
+        self.assertEqual(env.segment, 2)
+        self.assertEqual(env.best_arm, 0)
+        self.assertAlmostEqual(env.regret(0.0), 0.5)
+
+        env = PiecewiseStationaryMultiArmedEnvironment(segments, [3, 5])
+        for _ in range(3):
+            env.reward(1)
+        self.assertAlmostEqual(env.regret(1.0), 0.0)
+        self.assertAlmostEqual(env.true_reward(0), 1.0)
+        env.reward(1)
+        self.assertAlmostEqual(env.regret(0.0), 1.0)
+
+        # Batched replicates would be drawn from different segments.
+        with self.assertRaises(AssertionError):
+            BatchedMultiArmedStochasticExperiment(env, BatchedUCB(n_arms=2, n_replicates=4))
+
+        with self.assertRaises(AssertionError):
+            PiecewiseStationaryMultiArmedEnvironment(segments, [3])
+        with self.assertRaises(AssertionError):
+            PiecewiseStationaryMultiArmedEnvironment(segments, [5, 3])
+
+    def test_players(self):
+        def environment():
+            rng = np.random.RandomState(42)
+            segments = []
+            for means in [[0.9, 0.5, 0.2], [0.1, 0.5, 0.8]]:
+                rvs = [bernoulli(mean) for mean in means]
+                for rv in rvs:
+                    rv.random_state = rng
+                segments.append(rvs)
+            return PiecewiseStationaryMultiArmedEnvironment(segments, [2000])
+
+        # After the change point, the players forget the first segment, and play the new best arm.
+        for b in [SlidingWindowUCB(3, window=300), DiscountedUCB(3, gamma=0.99),
+                  SlidingWindowThompsonSampling(3, window=300, random_state=42),
+                  DiscountedThompsonSampling(3, gamma=0.99, random_state=42)]:
+            record = Trajectory(horizon=4000)
+            MultiArmedStochasticExperiment(environment(), b).rounds(4000, record=record)
+            self.assertGreater(np.mean(record.arms[1000:2000] == 0), 0.6)
+            self.assertGreater(np.mean(record.arms[3000:] == 2), 0.6)
+
+
+class TestSumTree(unittest.TestCase):
+    def test_one(self):
+        t = SumTree(5)
+        self.assertEqual(len(t), 5)
+        self.assertEqual(t.capacity, 8)
+        t.set_all(np.array([1.0, 0.0, 2.0, 3.0, 4.0]))
+        self.assertAlmostEqual(t.total, 10.0)
+        self.assertEqual([t.find(u) for u in [0.0, 0.5, 1.0, 2.9, 3.0, 5.9, 6.0, 9.9, 10.5]],
+                         [0, 0, 2, 2, 3, 3, 4, 4, 4])
+
+        t.update(1, 5.0)
+        t.update(4, 0.0)
+        self.assertAlmostEqual(t.total, 11.0)
+        np.testing.assert_array_equal(t.weights, [1.0, 5.0, 2.0, 3.0, 0.0])
+        self.assertEqual([t.find(u) for u in [0.5, 1.0, 5.9, 6.0, 8.0, 11.5]], [0, 1, 1, 2, 3, 3])
+
+
+class TestWeightedMajority(unittest.TestCase):
+    def test_one(self):
+        b = WeightedMajority(n_arms=3, eta=1.0, random_state=42)
+        np.testing.assert_allclose(b.probabilities, [1 / 3] * 3)
+
+        b.rewards([1.0, 0.0, 0.0])
+        b.rewards([1.0, 1.0, 0.0])
+        weights = np.exp([2.0, 1.0, 0.0])
+        np.testing.assert_allclose(b.probabilities, weights / np.sum(weights))
+
+        # Large rewards do not overflow.
+        b.rewards([1000.0, 0.0, 0.0])
+        np.testing.assert_allclose(b.probabilities, [1.0, 0.0, 0.0])
+        self.assertEqual(b.pull(), 0)
+
+        with self.assertRaises(AssertionError):
+            WeightedMajority(n_arms=3, eta=None)
+
+    def test_experiment(self):
+        for b in [WeightedMajority(n_arms=2, eta=None, horizon=100, random_state=42),
+                  ExponentiallyWeightedForecaster(n_arms=2, random_state=42)]:
+            exp = FullInformationExperiment(FullInformationAdversarialMultiArmedEnvironment(DeterministicAdversary()),
+                                            b)
+            exp.rounds(100)
+
+            # The second arm is always the best one: it is played most of the time.
+            self.assertGreater(b.probabilities[1], 0.9)
+
+
+class TestChunkedFullInformation(unittest.TestCase):
+    def test_same_as_rounds(self):
+        rewards = np.random.RandomState(42).uniform(size=(1000, 5))
+        for make in [lambda: WeightedMajority(n_arms=5, eta=0.5, random_state=42),
+                     lambda: ExponentiallyWeightedForecaster(n_arms=5, random_state=42)]:
+            results = []
+            for chunk_size in [None, 64, 1000]:
+                b = make()
+                exp = FullInformationExperiment(FullInformationAdversarialMultiArmedEnvironment(
+                    ObliviousAdversary(rewards)), b)
+                record = Trajectory(horizon=1000, every=7)
+                total = exp.rounds(600, record=record, chunk_size=chunk_size)
+                total += exp.rounds(600, chunk_size=chunk_size)  # Stops after 1000 rounds.
+                results.append((total, record, b, b.pull()))
+
+            # Same decisions, same regret, same state, whatever the chunks.
+            total, record, b, arm = results[0]
+            for other_total, other_record, other, other_arm in results[1:]:
+                self.assertEqual(other_total, total)
+                np.testing.assert_array_equal(other_record.rounds, record.rounds)
+                np.testing.assert_array_equal(other_record.arms, record.arms)
+                np.testing.assert_array_equal(other_record.cumulative_regrets, record.cumulative_regrets)
+                np.testing.assert_array_equal(other._total_rewards, b._total_rewards)
+                self.assertEqual(other_arm, arm)
+
+    def test_default_play_chunk(self):
+        rewards = np.random.RandomState(42).uniform(size=(50, 3))
+        b = WeightedMajority(n_arms=3, eta=0.5, random_state=42)
+        other = WeightedMajority(n_arms=3, eta=0.5, random_state=42)
+        np.testing.assert_array_equal(Bandit.play_chunk(b, rewards), other.play_chunk(rewards))
+
+    def test_trajectory_extend(self):
+        regrets = np.random.RandomState(42).uniform(size=100)
+        arms = np.arange(100) % 3
+        for kwargs in [{'every': 1}, {'every': 9}, {'checkpoints': [0, 5, 6, 50, 99, 150]}]:
+            one, many = Trajectory(horizon=100, **kwargs), Trajectory(horizon=100, **kwargs)
+            for regret, arm in zip(regrets, arms):
+                one.append(regret, arm, 1 - regret)
+            for start in range(0, 100, 30):
+                many.extend(regrets[start:start + 30], arms[start:start + 30], 1 - regrets[start:start + 30])
+
+            self.assertEqual(len(many), len(one))
+            for name in ['rounds', 'regrets', 'cumulative_regrets', 'arms', 'rewards']:
+                np.testing.assert_array_equal(getattr(many, name), getattr(one, name))
+
+
+class TestEXP3(unittest.TestCase):
+    def test_one(self):
+        b = EXP3(n_arms=2, eta=0.1, random_state=42)
+        np.testing.assert_allclose(b.probabilities, [0.5, 0.5])
+
+        # Only the played arm is updated, by its importance-weighted loss.
+        b.reward(0, 0.0)
+        weights = np.exp([-0.1 / 0.5, 0.0])
+        np.testing.assert_allclose(b.probabilities, weights / np.sum(weights))
+
+        # Weights remain accurate, even when they are all tiny.
+        for _ in range(5000):
+            b.reward(b.pull(), 0.0)
+        self.assertLess(np.max(b._log_weights), -230.0)
+        self.assertAlmostEqual(np.sum(b.probabilities), 1.0)
+
+    def test_experiment(self):
+        b = EXP3(n_arms=2, horizon=1000, random_state=42)
+        exp = MultiArmedAdversarialExperiment(AdversarialMultiArmedEnvironment(DeterministicAdversary()), b)
+        exp.rounds(1000)
+
+        # The second arm is always the best one: it is played most of the time.
+        self.assertGreater(b.probabilities[1], 0.9)
 
 
 class TestStochasticMultiArmedEnvironment(unittest.TestCase):
@@ -129,6 +513,41 @@ class TestStochasticMultiArmedEnvironment(unittest.TestCase):
         self.assertAlmostEqual(env.reward(1), 1.0)
         self.assertTrue(env.will_accept_input())
 
+    def test_blocks(self):
+        rvs = [uniform(loc=arm, scale=0.5) for arm in range(3)]
+        for arm, rv in enumerate(rvs):
+            rv.random_state = np.random.RandomState(arm)
+        env = StochasticMultiArmedEnvironment(rvs, block_size=4)
+        self.assertEqual(env.block_size, 4)
+
+        # Rewards come from the right arm, even when several blocks are needed.
+        rewards = [env.reward(arm) for arm in [0, 1, 2, 0, 0, 0, 0, 0, 2]]
+        for arm, reward in zip([0, 1, 2, 0, 0, 0, 0, 0, 2], rewards):
+            self.assertTrue(arm <= reward <= arm + 0.5)
+
+        # The same random states give the same rewards, be they served one by one or by batches.
+        rvs = [uniform(loc=arm, scale=0.5) for arm in range(3)]
+        for arm, rv in enumerate(rvs):
+            rv.random_state = np.random.RandomState(arm)
+        env = StochasticMultiArmedEnvironment(rvs, block_size=4)
+        batch = np.concatenate((env.reward_batch(np.array([0, 1, 2, 0])), env.reward_batch(np.array([0, 0, 0, 0, 2]))))
+        np.testing.assert_array_equal(batch, rewards)
+
+        # Also when the distributions share a random state: the blocks are drawn in the same order.
+        def shared_environment():
+            state = np.random.RandomState(0)
+            rvs = [uniform(loc=arm, scale=0.5) for arm in range(2)]
+            for rv in rvs:
+                rv.random_state = state
+            return StochasticMultiArmedEnvironment(rvs, block_size=2)
+
+        arms = [1, 0, 0, 0, 1, 1, 1, 0, 1, 1, 0]
+        env = shared_environment()
+        rewards = [env.reward(arm) for arm in arms]
+        env = shared_environment()
+        batch = np.concatenate((env.reward_batch(np.array(arms[:3])), env.reward_batch(np.array(arms[3:]))))
+        np.testing.assert_array_equal(batch, rewards)
+
 
 class DeterministicAdversary(Adversary):
     def __init__(self):
@@ -167,6 +586,185 @@ class TestAdversarialMultiArmedEnvironment(unittest.TestCase):
         self.assertAlmostEqual(env.regret(1.0), 0.0)
 
 
+class TestObliviousAdversary(unittest.TestCase):
+    def test_rewards(self):
+        rewards = np.arange(12, dtype=float).reshape(4, 3) % 5
+        adversary = ObliviousAdversary(rewards, chunk_rows=3)
+        self.assertEqual(adversary.n_arms, 3)
+        self.assertEqual(adversary.n_rounds, 4)
+        np.testing.assert_array_equal(adversary.best_rewards, [2.0, 4.0, 3.0, 4.0])
+
+        # The environment stops after the last round; the regret uses the precomputed best rewards.
+        env = AdversarialMultiArmedEnvironment(adversary)
+        self.assertTrue(env.may_stop_accepting_inputs)
+        regrets = []
+        while env.will_accept_input():
+            regrets.append(env.regret(env.reward(0)))
+        self.assertEqual(regrets, [2.0, 1.0, 2.0, 0.0])
+
+        with self.assertRaises(AssertionError):
+            ObliviousAdversary(rewards[0])
+
+    def test_memory_mapped(self):
+        rng = np.random.RandomState(42)
+        rewards = rng.uniform(size=(100, 2))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rewards.npy')
+            np.save(path, rewards)
+            adversary = ObliviousAdversary.load(path)
+            self.assertIsInstance(adversary.rewards, np.memmap)
+            np.testing.assert_array_equal(adversary.best_rewards, rewards.max(axis=1))
+
+            # Rows are views on the file.
+            self.assertTrue(np.shares_memory(adversary.decide_rewards(), adversary.rewards))
+
+            # The experiment stops after the last round.
+            b = ExploreThenCommitBandit(n_arms=2)
+            exp = MultiArmedAdversarialExperiment(AdversarialMultiArmedEnvironment(adversary), b)
+            regret = exp.rounds(1000)
+            obtained = rewards[0, 0] + rewards[1, 1] + np.sum(rewards[2:, b.best_arm])
+            self.assertAlmostEqual(regret, np.sum(rewards.max(axis=1)) - obtained)
+            del adversary, exp
+
+
+class ConstantBandit(Bandit):
+    def __init__(self, n_arms: int, arm: int):
+        super().__init__(n_arms)
+        self._arm = arm
+
+    def pull(self, context=None) -> int:
+        return self._arm
+
+
+class TestLoggedData(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.RandomState(42)
+        self.arms = rng.randint(3, size=100)
+        self.rewards = (self.arms == 1) + rng.uniform(size=100)
+        self.propensities = np.where(self.arms == 1, 0.5, 0.25)
+        self.contexts = rng.normal(size=(100, 2))
+        self.dataset = LoggedDataset.from_arrays(self.directory.name, self.arms, self.rewards, self.propensities,
+                                                 self.contexts)
+
+    def tearDown(self):
+        del self.dataset
+        self.directory.cleanup()
+
+    def test_dataset(self):
+        self.assertEqual(len(self.dataset), 100)
+        self.assertEqual(self.dataset.n_arms, 3)
+        self.assertEqual(self.dataset.n_features, 2)
+        self.assertIsInstance(self.dataset.rewards, np.memmap)
+
+        chunks = list(self.dataset.chunks(30))
+        self.assertEqual([chunk.start for chunk in chunks], [0, 30, 60, 90])
+        np.testing.assert_array_equal(np.concatenate([chunk.arms for chunk in chunks]), self.arms)
+        np.testing.assert_array_equal(chunks[-1].contexts, self.contexts[90:])
+
+    def test_estimators(self):
+        evaluator = OfflineEvaluator(self.dataset, chunk_size=16)
+        matched = self.arms == 1
+
+        estimate = evaluator.replay(ConstantBandit(3, 1), learn=False)
+        self.assertEqual(estimate.n_records, 100)
+        self.assertEqual(estimate.n_matched, int(matched.sum()))
+        self.assertAlmostEqual(estimate.value, np.mean(self.rewards[matched]))
+
+        estimate = evaluator.ips(ConstantBandit(3, 1))
+        self.assertAlmostEqual(estimate.value, np.sum(self.rewards[matched] / 0.5) / 100)
+        estimate = evaluator.ips(ConstantBandit(3, 1), clip=1.5)
+        self.assertAlmostEqual(estimate.value, np.sum(self.rewards[matched] * 1.5) / 100)
+
+        # The model predicts the mean reward, corrected on the matched records; a null model gives the IPS estimate.
+        model = evaluator.doubly_robust(ConstantBandit(3, 1), lambda contexts, arms: np.where(arms == 1, 1.5, 0.5))
+        self.assertAlmostEqual(model.value, np.mean(1.5 + np.where(matched, 2 * (self.rewards - 1.5), 0.0)))
+        self.assertLess(model.standard_error, evaluator.ips(ConstantBandit(3, 1)).standard_error)
+        null = evaluator.doubly_robust(ConstantBandit(3, 1), lambda contexts, arms: np.zeros(arms.shape[0]))
+        self.assertAlmostEqual(null.value, evaluator.ips(ConstantBandit(3, 1)).value)
+
+    def test_learning_replay(self):
+        b = ContextualLinUCB(n_arms=3, n_features=2)
+        estimate = OfflineEvaluator(self.dataset, chunk_size=16).replay(b)
+
+        # By default, the bandit learns after each record, as it would online.
+        online = ContextualLinUCB(n_arms=3, n_features=2)
+        rewards = []
+        for context, logged_arm, reward in zip(self.contexts, self.arms, self.rewards):
+            state = online.decision_state()
+            arm = online.pull(context)
+            if arm == logged_arm:
+                online.reward(arm, reward, context)
+                rewards.append(reward)
+            else:  # Rejected records are not part of the history of the bandit.
+                online.set_decision_state(state)
+        self.assertEqual(estimate.n_matched, len(rewards))
+        self.assertAlmostEqual(estimate.value, np.mean(rewards))
+        np.testing.assert_allclose(b._estimate_A_inv, online._estimate_A_inv)
+        self.assertEqual(b._current_round, len(rewards))
+
+        # Learning only every 100 records: all decisions are made before learning anything.
+        b = ContextualLinUCB(n_arms=3, n_features=2)
+        estimate = OfflineEvaluator(self.dataset).replay(b, learn_every=100)
+        fixed = OfflineEvaluator(self.dataset).replay(ContextualLinUCB(n_arms=3, n_features=2), learn=False)
+        self.assertEqual(estimate.n_matched, fixed.n_matched)
+        self.assertAlmostEqual(estimate.value, fixed.value)
+
+    def test_rejected_decisions(self):
+        # Rejected records do not use the exploration phase up: the bandit commits to an arm it observed.
+        rng = np.random.RandomState(0)
+        arms = rng.randint(2, size=2000)
+        rewards = (arms == 1).astype(float)
+        with tempfile.TemporaryDirectory() as directory:
+            dataset = LoggedDataset.from_arrays(directory, arms, rewards, np.full(2000, 0.5))
+            b = ExploreThenCommitBandit(n_arms=2, n_epochs=1)
+            estimate = OfflineEvaluator(dataset, chunk_size=64).replay(b)
+            del dataset
+        self.assertEqual(b._current_round, estimate.n_matched)
+        self.assertEqual(b.arm_counts.tolist(), [1, 1])
+        self.assertEqual(b.pull(), 1)
+        self.assertGreater(estimate.value, 0.99)
+
+    def test_experiment(self):
+        env = LoggedBanditEnvironment(self.dataset, chunk_size=7)
+        self.assertEqual(env.best_arm, 1)
+        np.testing.assert_allclose(env.estimated_rewards,
+                                   [np.sum(np.where(self.arms == arm, self.rewards / self.propensities, 0.0)) / 100
+                                    for arm in range(3)])
+
+        # The bandit gets the contexts, and only the records where it decides the logged arm are rounds.
+        b = ContextualLinUCB(n_arms=3, n_features=2)
+        exp = LoggedBanditExperiment(env, b)
+        record = Trajectory(horizon=100)
+        exp.rounds(100, record=record)
+        self.assertFalse(env.will_accept_input())
+        self.assertEqual(env.n_records, 100)
+        self.assertEqual(len(record), env.n_matched)
+        self.assertEqual(b._current_round, env.n_matched)
+        np.testing.assert_allclose(record.regrets, env.estimated_rewards[1] - np.asarray(record.rewards))
+
+        # Same records as the replay of the evaluator.
+        estimate = OfflineEvaluator(self.dataset).replay(ContextualLinUCB(n_arms=3, n_features=2))
+        self.assertEqual(estimate.n_matched, env.n_matched)
+        self.assertAlmostEqual(estimate.value, float(np.mean(record.rewards)))
+
+        self.assertEqual(exp.rounds(10), 0.0)
+        with self.assertRaises(EnvironmentNoMoreAcceptingInputsException):
+            exp.round()
+        with self.assertRaises(AssertionError):
+            LoggedBanditEnvironment(self.dataset).reward((self.arms[0] + 1) % 3)
+
+    def test_standard_error(self):
+        # Large offsets do not cancel the variance out.
+        rewards = 1e9 + np.arange(100) % 2
+        with tempfile.TemporaryDirectory() as directory:
+            dataset = LoggedDataset.from_arrays(directory, np.ones(100, dtype=np.int64), rewards, np.ones(100))
+            estimate = OfflineEvaluator(dataset, chunk_size=7).ips(ConstantBandit(2, 1))
+            del dataset
+        self.assertAlmostEqual(estimate.standard_error, np.std(rewards, ddof=1) / 10)
+
+
 class TestMultiArmedStochasticExperiment(unittest.TestCase):
     def test_mismatch_env_bandit(self):
         rv0 = rv_histogram(([1], [0, 0.000000001]))
@@ -211,6 +809,196 @@ class TestMultiArmedStochasticExperiment(unittest.TestCase):
         # Perform a few rounds only with rounds. The bandit will play the first arm, then the second, then the best.
         self.assertAlmostEqual(exp.rounds(10), 1.0)
 
+    def test_record(self):
+        rv0 = rv_histogram(([1], [0, 0.000000001]))
+        rv1 = rv_histogram(([1], [1, 1.000000001]))
+
+        # Record every round.
+        exp = MultiArmedStochasticExperiment(StochasticMultiArmedEnvironment([rv0, rv1]),
+                                             ExploreThenCommitBandit(n_arms=2))
+        t = Trajectory(horizon=10)
+        self.assertAlmostEqual(exp.rounds(5, record=t), 1.0)
+        self.assertAlmostEqual(exp.rounds(10, record=t), 0.0)  # Only five more rounds are recorded.
+        self.assertEqual(len(t), 10)
+        np.testing.assert_array_equal(t.rounds, np.arange(10))
+        np.testing.assert_array_equal(t.arms, [0, 1, 1, 1, 1, 1, 1, 1, 1, 1])
+        np.testing.assert_allclose(t.regrets, [1.0] + [0.0] * 9, atol=1e-6)
+        np.testing.assert_allclose(t.cumulative_regrets, [1.0] * 10, atol=1e-6)
+        np.testing.assert_allclose(t.rewards, [0.0] + [1.0] * 9, atol=1e-6)
+
+        # Record every third round, into memory-mapped files.
+        exp = MultiArmedStochasticExperiment(StochasticMultiArmedEnvironment([rv0, rv1]),
+                                             ExploreThenCommitBandit(n_arms=2))
+        with tempfile.TemporaryDirectory() as directory:
+            t = Trajectory(horizon=10, every=3, directory=directory)
+            exp.rounds(10, record=t)
+            t.flush()
+            np.testing.assert_array_equal(t.rounds, [2, 5, 8])
+            np.testing.assert_array_equal(np.load(os.path.join(directory, 'arms.npy')), [1, 1, 1])
+            del t
+
+        # Record logarithmically spaced rounds.
+        exp = MultiArmedStochasticExperiment(StochasticMultiArmedEnvironment([rv0, rv1]),
+                                             ExploreThenCommitBandit(n_arms=2))
+        t = Trajectory.log_spaced(horizon=1000, n_points=4)
+        exp.rounds(1000, record=t)
+        np.testing.assert_array_equal(t.rounds, [0, 9, 99, 999])
+
+    def test_record_batched(self):
+        rv0 = rv_histogram(([1], [0, 0.000000001]))
+        rv1 = rv_histogram(([1], [1, 1.000000001]))
+        exp = BatchedMultiArmedStochasticExperiment(StochasticMultiArmedEnvironment([rv0, rv1]),
+                                                    BatchedExploreThenCommitBandit(n_arms=2, n_replicates=3))
+
+        t = Trajectory(horizon=4, n_replicates=3)
+        exp.rounds(4, record=t)
+        np.testing.assert_array_equal(t.arms, [[0, 0, 0], [1, 1, 1], [1, 1, 1], [1, 1, 1]])
+        np.testing.assert_allclose(t.cumulative_regrets[-1], [1.0, 1.0, 1.0], atol=1e-6)
+
+
+class TestBudgeted(unittest.TestCase):
+    class CountingEnvironment(BudgetedStochasticMultiArmedEnvironment):
+        n_checks = 0
+
+        def will_accept_input(self) -> bool:
+            self.n_checks += 1
+            return super().will_accept_input()
+
+    def environment(self, budget: float):
+        rvs = [rv_histogram(([1], [mean, mean + 0.000000001])) for mean in [0.9, 0.5, 0.2]]
+        return self.CountingEnvironment(rvs, costs=[1.0, 0.25, 0.5], budget=budget)
+
+    def test_environment(self):
+        env = self.environment(2.0)
+        self.assertTrue(env.may_stop_accepting_inputs)
+        self.assertEqual(env.best_arm, 1)  # The best ratio between the mean reward and the cost.
+        self.assertEqual(env.remaining_inputs(), 2)
+        self.assertEqual(env.remaining_inputs(), 2)  # Asking changes nothing.
+
+        self.assertAlmostEqual(env.reward(0), 0.9, places=6)
+        self.assertAlmostEqual(env.regret(0.9), 2.0 * 1.0 - 0.9, places=6)
+        self.assertAlmostEqual(env.remaining_budget, 1.0)
+        np.testing.assert_allclose(env.reward_batch([1, 1]), [0.5, 0.5], atol=1e-6)
+        self.assertAlmostEqual(env.remaining_budget, 0.5)
+        self.assertFalse(env.will_accept_input())
+        self.assertEqual(env.remaining_inputs(), 0)
+
+        # An unaffordable batch is not played at all.
+        with self.assertRaises(EnvironmentNoMoreAcceptingInputsException):
+            env.reward_batch([2, 1])
+        self.assertAlmostEqual(env.reward(2), 0.2, places=6)
+        with self.assertRaises(EnvironmentNoMoreAcceptingInputsException):
+            env.reward(1)
+
+    def test_regret_batch(self):
+        # The regret of each round of a batch uses the cost of the arm played at that round.
+        env = self.environment(10.0)
+        rewards = env.reward_batch([1, 0, 2])
+        np.testing.assert_allclose(env.regret(rewards), 2.0 * np.array([0.25, 1.0, 0.5]) - rewards)
+        self.assertAlmostEqual(env.regret(rewards[-1]), 2.0 * 0.5 - rewards[-1])
+
+        # Replicates cannot share a budget.
+        with self.assertRaises(AssertionError):
+            BatchedMultiArmedStochasticExperiment(env, BatchedUCB(n_arms=3, n_replicates=2))
+
+    def test_experiment(self):
+        # Rounds are played until the budget no more covers the highest cost, without checking before each round.
+        env = self.environment(1000.0)
+        b = BudgetedUCB(n_arms=3, costs=env.costs)
+        exp = MultiArmedStochasticExperiment(env, b)
+        record = Trajectory(horizon=10000)
+        exp.rounds(10000, record=record)
+        self.assertLess(env.remaining_budget, 1.0)
+        self.assertEqual(len(record), int(b.arm_counts.sum()))
+        self.assertLess(env.n_checks, 20)
+        self.assertGreater(b.arm_counts[1], 0.9 * b.arm_counts.sum())
+
+        with self.assertRaises(EnvironmentNoMoreAcceptingInputsException):
+            exp.round()
+        self.assertEqual(exp.rounds(10), 0.0)
+
+        # The same rounds are played, be they instrumented or not.
+        env = self.environment(1000.0)
+        exp = MultiArmedStochasticExperiment(env, BudgetedUCB(n_arms=3, costs=env.costs))
+        stats = exp.instrument(every=10)
+        self.assertAlmostEqual(exp.rounds(10000), float(np.sum(record.regrets)), places=6)
+        self.assertEqual(stats.count('bandit.pull'), (len(record) + 9) // 10)
+
+    def test_custom_round(self):
+        # Experiments that implement round themselves, with their own check, are run by chunks too.
+        class CustomExperiment(MultiArmedStochasticExperiment):
+            def round(self) -> float:
+                if not self._environment.will_accept_input():
+                    raise EnvironmentNoMoreAcceptingInputsException
+                arm = self._bandit.pull()
+                reward = self._environment.reward(arm)
+                self._bandit.reward(arm, reward)
+                self._last_arm, self._last_reward = arm, reward
+                return self.regret(reward)
+
+        env = self.environment(100.0)
+        b = BudgetedUCB(n_arms=3, costs=env.costs)
+        record = Trajectory(horizon=1000)
+        CustomExperiment(env, b).rounds(1000, record=record)
+        self.assertLess(env.remaining_budget, 1.0)
+        self.assertEqual(len(record), int(b.arm_counts.sum()))
+
+        # Rounds that do not tell what was played cannot be recorded.
+        class SilentExperiment(MultiArmedStochasticExperiment):
+            def round(self) -> float:
+                self._check_input()
+                arm = self._bandit.pull()
+                reward = self._environment.reward(arm)
+                self._bandit.reward(arm, reward)
+                return self.regret(reward)
+
+        env = self.environment(100.0)
+        exp = SilentExperiment(env, BudgetedUCB(n_arms=3, costs=env.costs))
+        self.assertGreater(exp.rounds(10), 0.0)
+        with self.assertRaises(AssertionError):
+            exp.rounds(10, record=Trajectory(horizon=10))
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_phases(self):
+        rv0 = rv_histogram(([1], [0, 0.000000001]))
+        rv1 = rv_histogram(([1], [1, 1.000000001]))
+        exp = MultiArmedStochasticExperiment(StochasticMultiArmedEnvironment([rv0, rv1]), UCB1(n_arms=2))
+        bandit, environment = exp._bandit, exp._environment
+        plain = MultiArmedStochasticExperiment(StochasticMultiArmedEnvironment([rv0, rv1]), UCB1(n_arms=2))
+
+        # Instrumentation does not change the experiment.
+        stats = exp.instrument(every=10)
+        self.assertAlmostEqual(exp.rounds(95), plain.rounds(95), places=6)
+        self.assertEqual(stats.n_rounds, 10)
+        for phase in ['round', 'bandit.pull', 'environment.reward', 'bandit.reward', 'environment.regret']:
+            self.assertEqual(stats.count(phase), 10)
+            self.assertGreater(stats.total_ns(phase), 0)
+        self.assertAlmostEqual(sum(stats.fractions().values()), 1.0)
+        self.assertIn('bandit.pull', repr(stats))
+
+        # The objects are given back after each measured round, and measures stop when asked.
+        self.assertIs(exp._bandit, bandit)
+        self.assertIs(exp._environment, environment)
+        exp.stop_instrumenting()
+        exp.rounds(20)
+        self.assertEqual(stats.n_rounds, 10)
+        self.assertEqual(int(bandit.arm_counts.sum()), 115)
+
+        # Even when a measured round fails.
+        class FailingEnvironment(StochasticMultiArmedEnvironment):
+            def reward(self, arm: int) -> float:
+                raise RuntimeError("No reward.")
+
+        exp = MultiArmedStochasticExperiment(FailingEnvironment([rv0, rv1]), UCB1(n_arms=2))
+        bandit, environment = exp._bandit, exp._environment
+        stats = exp.instrument(every=1)
+        with self.assertRaises(RuntimeError):
+            exp.round()
+        self.assertIs(exp._bandit, bandit)
+        self.assertIs(exp._environment, environment)
+        self.assertEqual(stats.n_rounds, 1)
+
 
 class TestMultiArmedAdversarialExperiment(unittest.TestCase):
     def test_one(self):
@@ -240,3 +1028,683 @@ class TestMultiArmedAdversarialExperiment(unittest.TestCase):
         # Perform a few rounds only with rounds. The bandit will play the first arm, then the second, then the best
         # (even though it does not consider the environment is adversary).
         self.assertAlmostEqual(exp.rounds(10), 1.0)
+
+
+class TestRewardAccumulatorMixin(unittest.TestCase):
+    def test_statistics(self):
+        rng = np.random.RandomState(42)
+        arms = rng.randint(5, size=200)
+        rewards = rng.normal(loc=arms / 10, size=200)
+
+        acc = RewardAccumulatorMixin(n_arms=5)
+        for arm, reward in zip(arms, rewards):
+            acc.reward(arm, reward)
+            # The cached best arm is always the one with the highest mean.
+            self.assertEqual(acc.best_arm, int(np.argmax(acc.means)))
+
+        for arm in range(5):
+            self.assertEqual(acc.arm_counts[arm], np.sum(arms == arm))
+            self.assertAlmostEqual(acc.total_rewards[arm], np.sum(rewards[arms == arm]))
+            self.assertAlmostEqual(acc.means[arm], np.mean(rewards[arms == arm]))
+            self.assertAlmostEqual(acc.variances[arm], np.var(rewards[arms == arm], ddof=1))
+
+    def test_no_dict(self):
+        acc = RewardAccumulatorMixin(n_arms=2)
+        with self.assertRaises(AttributeError):
+            acc.other = 0
+
+    def test_batch(self):
+        rng = np.random.RandomState(42)
+        arms = rng.randint(6, size=300)
+        rewards = rng.normal(loc=arms / 10, size=300)
+
+        for make in [lambda: RewardAccumulatorMixin(n_arms=6), lambda: UCB1(n_arms=6), lambda: LinUCB(n_arms=6),
+                     lambda: BernoulliThompsonSampling(n_arms=6, random_state=42),
+                     lambda: ExploreThenCommitBandit(n_arms=6)]:
+            batch, sequential = make(), make()
+            batch.reward_batch(arms[:4], rewards[:4])  # Some arms are not in the first batch.
+            batch.reward_batch(arms[4:], rewards[4:])
+            for arm, reward in zip(arms, rewards):
+                sequential.reward(arm, reward)
+
+            np.testing.assert_array_equal(batch.arm_counts, sequential.arm_counts)
+            np.testing.assert_allclose(batch.total_rewards, sequential.total_rewards)
+            np.testing.assert_allclose(batch.means, sequential.means)
+            np.testing.assert_allclose(batch.variances, sequential.variances)
+            self.assertEqual(batch.best_arm, sequential.best_arm)
+
+        # Index bandits rebuild their groups after a batch, and make the same decisions.
+        batch, sequential = UCB1(n_arms=6), UCB1(n_arms=6)
+        for _ in range(6):
+            batch.pull()
+            sequential.pull()
+        batch.reward_batch(arms, rewards)
+        for arm, reward in zip(arms, rewards):
+            sequential.reward(arm, reward)
+        for _ in range(20):
+            arm = batch.pull()
+            self.assertEqual(sequential.pull(), arm)
+            batch.reward(arm, 0.5)
+            sequential.reward(arm, 0.5)
+
+
+class TestLinearUCB(unittest.TestCase):
+    def test_one(self):
+        b = LinUCB(n_arms=3)
+
+        # Initialisation: each arm is played once.
+        for arm in range(3):
+            self.assertEqual(b.pull(), arm)
+            b.reward(arm, [0.0, 1.0, 0.5][arm])
+
+        # Then, the arm with the highest index.
+        self.assertEqual(b.pull(), 1)
+
+
+class TestContextualLinUCB(unittest.TestCase):
+    def test_context(self):
+        b = ContextualLinUCB(n_arms=3, n_features=2)
+
+        with self.assertRaises(AssertionError):
+            b.pull()
+        with self.assertRaises(AssertionError):
+            b.pull(np.zeros(3))
+
+    def test_incremental_inverse(self):
+        rng = np.random.RandomState(42)
+        b = ContextualLinUCB(n_arms=3, n_features=4)
+        A = [np.identity(4) for _ in range(3)]
+        bs = [np.zeros(4) for _ in range(3)]
+
+        for _ in range(50):
+            context = rng.normal(size=4)
+            arm = b.pull(context)
+
+            # Compare the decision with the one made by solving linear systems.
+            if b._current_round >= 3:
+                index = [np.linalg.solve(A[a], bs[a]) @ context + np.sqrt(np.linalg.solve(A[a], context) @ context)
+                         for a in range(3)]
+                self.assertEqual(arm, int(np.argmax(index)))
+
+            reward = rng.uniform()
+            b.reward(arm, reward, context)
+            A[arm] += np.outer(context, context)
+            bs[arm] += reward * context
+
+        for arm in range(3):
+            np.testing.assert_allclose(b._estimate_A_inv[arm], np.linalg.inv(A[arm]), atol=1e-10)
+            np.testing.assert_allclose(b._estimate_b[arm], bs[arm])
+
+    def test_batch(self):
+        rng = np.random.RandomState(42)
+        contexts = rng.normal(size=(40, 3))
+        arms = rng.randint(4, size=40)
+        rewards = rng.uniform(size=40)
+
+        # Updates by batch (with fewer or more requests per arm than features) or one by one are equivalent.
+        b = ContextualLinUCB(n_arms=4, n_features=3)
+        s = ContextualLinUCB(n_arms=4, n_features=3)
+        b.reward_batch(arms[:6], rewards[:6], contexts[:6])
+        b.reward_batch(arms[6:], rewards[6:], contexts[6:])
+        for arm, reward, context in zip(arms, rewards, contexts):
+            s.reward(arm, reward, context)
+        np.testing.assert_allclose(b._estimate_A_inv, s._estimate_A_inv, atol=1e-10)
+        np.testing.assert_allclose(b._estimate_b, s._estimate_b)
+
+        # Decisions by batch are the same as one by one, when nothing is learnt in between.
+        b._batch_elements = 50  # Force several chunks.
+        np.testing.assert_array_equal(b.pull_batch(contexts), [s.pull(context) for context in contexts])
+
+        with self.assertRaises(AssertionError):
+            b.pull_batch(contexts[0])
+
+
+class TestHybridLinUCB(unittest.TestCase):
+    def test_context(self):
+        b = HybridLinUCB(n_arms=3, n_features=2, n_shared_features=3)
+
+        with self.assertRaises(AssertionError):
+            b.pull()
+        with self.assertRaises(AssertionError):
+            b.pull(np.zeros(4))
+        self.assertIn(b.pull(np.ones(5)), range(3))
+        self.assertIn(b.pull(np.ones((3, 5))), range(3))
+
+    def test_incremental_factors(self):
+        rng = np.random.RandomState(42)
+        n_arms, d, k, alpha = 4, 3, 2, 0.5
+        b = HybridLinUCB(n_arms=n_arms, n_features=d, n_shared_features=k, alpha=alpha)
+        A0, b0 = np.identity(k), np.zeros(k)
+        A = [np.identity(d) for _ in range(n_arms)]
+        B = [np.zeros((d, k)) for _ in range(n_arms)]
+        bs = [np.zeros(d) for _ in range(n_arms)]
+
+        for t in range(60):
+            # Alternate contexts shared by all arms and contexts with one row per arm.
+            context = rng.normal(size=(n_arms, k + d)) if t % 2 else rng.normal(size=k + d)
+            rows = np.broadcast_to(context, (n_arms, k + d))
+            arm = b.pull(context)
+
+            # Compare the decision with the one made by inverting the matrices (algorithm 2 of Li et al.).
+            beta = np.linalg.solve(A0, b0)
+            A0_inv = np.linalg.inv(A0)
+            index = []
+            for a in range(n_arms):
+                z, x = rows[a, :k], rows[a, k:]
+                A_inv = np.linalg.inv(A[a])
+                s = z @ A0_inv @ z - 2 * z @ A0_inv @ B[a].T @ A_inv @ x + x @ A_inv @ x \
+                    + x @ A_inv @ B[a] @ A0_inv @ B[a].T @ A_inv @ x
+                index.append(z @ beta + x @ A_inv @ (bs[a] - B[a] @ beta) + alpha * np.sqrt(s))
+            self.assertEqual(arm, int(np.argmax(index)))
+
+            reward = rng.uniform()
+            b.reward(arm, reward, context)
+            z, x = rows[arm, :k], rows[arm, k:]
+            A0 += B[arm].T @ np.linalg.solve(A[arm], B[arm])
+            b0 += B[arm].T @ np.linalg.solve(A[arm], bs[arm])
+            A[arm] += np.outer(x, x)
+            B[arm] += np.outer(x, z)
+            bs[arm] += reward * x
+            A0 += np.outer(z, z) - B[arm].T @ np.linalg.solve(A[arm], B[arm])
+            b0 += reward * z - B[arm].T @ np.linalg.solve(A[arm], bs[arm])
+
+        np.testing.assert_allclose(b._shared_L @ b._shared_L.T, A0, atol=1e-10)
+        np.testing.assert_allclose(b._shared_b, b0, atol=1e-10)
+        for arm in range(n_arms):
+            np.testing.assert_allclose(b._arm_L[arm] @ b._arm_L[arm].T, A[arm], atol=1e-10)
+
+
+class TestSparseLinUCB(unittest.TestCase):
+    def test_context(self):
+        b = SparseLinUCB(n_arms=3, n_features=2 ** 20)
+        # Only the features that were seen are stored.
+        b.reward(0, 1.0, scipy.sparse.csr_matrix(([1.0, 2.0], ([0, 0], [5, 2 ** 20 - 1])), shape=(1, 2 ** 20)))
+        self.assertEqual(b.n_seen_features, 2)
+        self.assertLess(b._diagonal.nbytes, 2 ** 12)
+
+        with self.assertRaises(AssertionError):
+            b.pull()
+        with self.assertRaises(AssertionError):
+            b.pull(np.zeros(3))
+        with self.assertRaises(AssertionError):
+            b.pull_batch(np.zeros(2 ** 20))
+
+    def test_diagonal(self):
+        rng = np.random.RandomState(42)
+        n_arms, d = 4, 30
+        contexts = scipy.sparse.random(200, d, density=0.1, format='csr', random_state=rng)
+        arms = rng.randint(n_arms, size=200)
+        rewards = rng.uniform(size=200)
+
+        # Sparse or dense contexts, updates by batch or one by one are equivalent.
+        b = SparseLinUCB(n_arms=n_arms, n_features=d)
+        s = SparseLinUCB(n_arms=n_arms, n_features=d)
+        b.reward_batch(arms[:30], rewards[:30], contexts[:30])
+        b.reward_batch(arms[30:100], rewards[30:100], contexts[30:100].tocoo())
+        for arm, reward, context in zip(arms[:100], rewards[:100], contexts[:100].toarray()):
+            s.reward(arm, reward, context)
+
+        D, B = np.ones((n_arms, d)), np.zeros((n_arms, d))
+        for arm, reward, context in zip(arms[:100], rewards[:100], contexts[:100].toarray()):
+            D[arm] += context ** 2
+            B[arm] += reward * context
+        for bandit in [b, s]:
+            rows = bandit._lookup(np.arange(d), insert=False)
+            seen = rows >= 0
+            np.testing.assert_allclose(bandit._diagonal[rows[seen]], D.T[seen])
+            np.testing.assert_allclose(bandit._b[rows[seen]], B.T[seen])
+            np.testing.assert_array_equal(D[:, ~seen], 1)
+
+        # Decisions by batch are the same as one by one, and as with dense diagonal matrices.
+        b._current_round = s._current_round = n_arms  # Skip the initialisation phase.
+        b._batch_elements = 50  # Force several chunks.
+        decisions = b.pull_batch(contexts[100:])
+        for arm, context in zip(decisions, contexts[100:].toarray()):
+            self.assertEqual(arm, s.pull(context))
+            self.assertEqual(arm, int(np.argmax((B / D) @ context + np.sqrt((context ** 2 / D).sum(axis=1)))))
+
+    def test_checkpoint(self):
+        b = SparseLinUCB(n_arms=3, n_features=100)
+        b.reward(1, 1.0, scipy.sparse.csr_matrix(([1.0], ([0], [42])), shape=(1, 100)))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bandit.skb')
+            b.save(path)
+            other = SparseLinUCB.load(path, mmap='c')
+            self.assertEqual(other._row_map(), {42: 0})
+            other.reward(2, 1.0, scipy.sparse.csr_matrix(([1.0], ([0], [7])), shape=(1, 100)))
+            self.assertEqual(other.n_seen_features, 2)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_explore_then_commit(self):
+        b = ExploreThenCommitBandit(n_arms=3, n_epochs=2)
+        for arm, reward in [(0, 1.0), (1, 2.0), (2, 0.5)]:
+            b.reward(arm, reward)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'etc.skb')
+            b.save(path)
+            other = ExploreThenCommitBandit.load(path, mmap=False)
+            self.assertEqual(other.arm_counts.tolist(), b.arm_counts.tolist())
+            self.assertEqual(other.total_rewards.tolist(), b.total_rewards.tolist())
+            self.assertEqual(other.pull(), b.pull())
+
+            # The file must contain a bandit of the right type.
+            with self.assertRaises(TypeError):
+                UCB1.load(path)
+
+            with open(path, 'wb') as f:
+                f.write(b'not a checkpoint')
+            with self.assertRaises(ValueError):
+                ExploreThenCommitBandit.load(path)
+
+    def test_memory_mapped(self):
+        rng = np.random.RandomState(42)
+        b = ContextualLinUCB(n_arms=4, n_features=3)
+        for _ in range(20):
+            context = rng.normal(size=3)
+            b.reward(b.pull(context), rng.uniform(), context)
+        contexts = rng.normal(size=(10, 3))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'linucb.skb')
+            b.save(path)
+
+            # By default, arrays are mapped read-only: decisions are the same, but the bandit cannot learn.
+            other = ContextualLinUCB.load(path)
+            self.assertIsInstance(other._estimate_A_inv, np.memmap)
+            np.testing.assert_array_equal(other.pull_batch(contexts), b.pull_batch(contexts))
+            with self.assertRaises(ValueError):
+                other.reward(0, 1.0, contexts[0])
+
+            # Copy-on-write mappings can learn, without changing the file.
+            other = ContextualLinUCB.load(path, mmap='c')
+            other.reward(0, 1.0, contexts[0])
+            np.testing.assert_array_equal(ContextualLinUCB.load(path)._estimate_b, b._estimate_b)
+            del other
+
+    def test_index_and_random_state(self):
+        for b in [UCB1(n_arms=5), BernoulliThompsonSampling(n_arms=5, random_state=42)]:
+            for arm in range(5):
+                b.reward(arm, float(arm % 2))
+
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bandit.skb')
+                b.save(path)
+                other = type(b).load(path, mmap=False)
+
+            # The loaded bandit continues exactly as the original one.
+            for _ in range(20):
+                arm = b.pull()
+                self.assertEqual(other.pull(), arm)
+                b.reward(arm, 0.5)
+                other.reward(arm, 0.5)
+
+    def test_allowed_classes(self):
+        class CustomBandit(UCB1):
+            pass
+
+        class Shared(Bandit):
+            def pull(self, context=None) -> int:
+                return 0
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bandit.skb')
+            CustomBandit(n_arms=3).save(path)
+            with self.assertRaises(ValueError):
+                UCB1.load(path)
+            checkpoint.register(CustomBandit)
+            self.assertIsInstance(UCB1.load(path), CustomBandit)
+
+            # Arrays that share their memory are stored once, and still shared once loaded.
+            b = checkpoint.register(Shared)(n_arms=2)
+            b.values = np.arange(1000.0)
+            b.same_values = b.values
+            b.save(path)
+            self.assertLess(os.path.getsize(path), 2 * 8000)
+            other = Shared.load(path, mmap=False)
+            self.assertIs(other.values, other.same_values)
+
+
+class TestShardedBandit(unittest.TestCase):
+    def test_merge(self):
+        b = ShardedBandit(UCB1(n_arms=3), merge_every=4)
+        for arm in range(3):
+            b.reward(arm, 1.0)
+        # Rewards are pending until there are enough of them.
+        self.assertEqual(b.n_pending, 3)
+        self.assertEqual(int(b.bandit.arm_counts.sum()), 0)
+
+        b.reward(0, 0.0)
+        self.assertEqual(b.n_pending, 0)
+        self.assertEqual(b.n_merges, 1)
+        self.assertEqual(b.bandit.arm_counts.tolist(), [2, 1, 1])
+
+        # Decisions are made with the merged statistics.
+        for _ in range(3):
+            b.pull()
+        self.assertEqual(b.pull(), 1)
+
+        b.reward_batch(np.array([2]), np.array([1.0]))
+        b.flush()
+        self.assertEqual(b.bandit.arm_counts.tolist(), [2, 1, 2])
+
+    def test_threads(self):
+        b = ShardedBandit(ContextualLinUCB(n_arms=3, n_features=2), merge_every=16)
+
+        def worker(seed):
+            rng = np.random.RandomState(seed)
+            for _ in range(200):
+                context = rng.normal(size=2)
+                b.reward(b.pull(context), rng.uniform(), context)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        b.flush()
+
+        # No reward is lost: the trace of the design matrices grows by the squared norm of each context.
+        expected = 3 * 2
+        for seed in range(8):
+            rng = np.random.RandomState(seed)
+            for _ in range(200):
+                expected += np.sum(rng.normal(size=2) ** 2)
+                rng.uniform()
+        self.assertEqual(b.n_pending, 0)
+        A = np.linalg.inv(b.bandit._estimate_A_inv)
+        self.assertAlmostEqual(float(np.trace(A, axis1=1, axis2=2).sum()), expected, places=6)
+
+        # Pulls are not lost either.
+        self.assertEqual(b.bandit._current_round, 8 * 200)
+
+    def test_statistics(self):
+        rng = np.random.RandomState(0)
+        arms = rng.randint(0, 5, size=40)
+        rewards = rng.uniform(size=40)
+        contexts = rng.normal(size=(40, 3))
+
+        def merge(bandit):
+            statistics = bandit.new_statistics()
+            statistics.add_batch(arms[:10], rewards[:10], contexts[:10])
+            for i in range(10, 40):
+                statistics.add(arms[i], rewards[i], contexts[i])
+            bandit.merge_statistics(statistics)
+            return bandit
+
+        expected, merged = UCB1(n_arms=5), merge(UCB1(n_arms=5))
+        expected.reward_batch(arms, rewards)
+        self.assertEqual(merged.arm_counts.tolist(), expected.arm_counts.tolist())
+        np.testing.assert_allclose(merged.means, expected.means)
+        np.testing.assert_allclose(merged.variances, expected.variances)
+
+        expected, merged = ContextualLinUCB(n_arms=5, n_features=3), merge(ContextualLinUCB(n_arms=5, n_features=3))
+        expected.reward_batch(arms, rewards, contexts)
+        np.testing.assert_allclose(merged._estimate_A_inv, expected._estimate_A_inv)
+        np.testing.assert_allclose(merged._estimate_b, expected._estimate_b)
+
+    def test_index_groups(self):
+        # Merges move the rewarded arms in the groups of index bandits, instead of rebuilding them.
+        b = ShardedBandit(UCB1(n_arms=100), merge_every=8)
+        for _ in range(101):
+            b.reward(b.pull(), 1.0)
+        b.flush()
+        b.pull()
+        groups = {id(b.bandit._groups), id(b._standby._groups)}  # Both copies of the bandit have their groups.
+        for arm in range(8):
+            b.reward(arm, 0.0)
+        self.assertEqual(b.n_pending, 0)
+        self.assertEqual({id(b.bandit._groups), id(b._standby._groups)}, groups)
+
+        # The decision is the same as with all indices.
+        counts, means = b.bandit.arm_counts, b.bandit.means
+        index = means + np.sqrt(2 * math.log(b.bandit._current_round + 1) / counts)
+        self.assertEqual(b.pull(), int(np.argmax(index)))
+
+    def test_reward_log(self):
+        # Bandits without sufficient statistics get the rewards with reward_batch.
+        b = ShardedBandit(SlidingWindowUCB(n_arms=2, window=10), merge_every=3)
+        b.reward_batch(np.array([0, 1]), np.array([1.0, 0.0]))
+        b.reward(0, 1.0)
+        self.assertEqual(b.n_pending, 0)
+        self.assertEqual(b.bandit.window_counts.tolist(), [2, 1])
+
+    def test_decisions_during_merge(self):
+        # Decisions are made while a merge is in progress, with the statistics of the previous merge.
+        class SlowUCB(UCB1):
+            merging = threading.Event()
+            release = threading.Event()
+
+            def merge_statistics(self, statistics):
+                self.merging.set()
+                self.release.wait()
+                super().merge_statistics(statistics)
+
+        b = ShardedBandit(SlowUCB(n_arms=2), merge_every=1000)
+        b.reward(0, 1.0)
+        flusher = threading.Thread(target=b.flush)
+        flusher.start()
+        SlowUCB.merging.wait()
+        self.assertEqual([b.pull(), b.pull()], [0, 1])
+        self.assertEqual(b.bandit.arm_counts.tolist(), [0, 0])
+        SlowUCB.release.set()
+        flusher.join()
+
+        # Both copies of the bandit get the rewards; the published one has the rounds of all decisions.
+        self.assertEqual(b.bandit.arm_counts.tolist(), [1, 0])
+        self.assertEqual(b._standby.arm_counts.tolist(), [1, 0])
+        self.assertEqual(b.bandit._current_round, 2)
+
+    def test_save(self):
+        # The wrapped bandit is saved, with the pending rewards.
+        b = ShardedBandit(UCB1(n_arms=3), merge_every=10)
+        b.reward(1, 1.0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sharded.skb')
+            b.save(path)
+            other = Bandit.load(path, mmap=False)
+        self.assertIsInstance(other, UCB1)
+        self.assertEqual(other.arm_counts.tolist(), [0, 1, 0])
+
+
+class TestDecisionService(unittest.TestCase):
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_out_of_order(self):
+        async def scenario():
+            service = DecisionService(UCB1(n_arms=3), flush_interval=60.0, max_pending=3)
+            async with service:
+                decisions = [service.decide() for _ in range(4)]
+                self.assertEqual([d.ticket for d in decisions], [0, 1, 2, 3])
+                self.assertEqual(service.n_outstanding, 4)
+
+                # Rewards are pending until enough of them are reported.
+                service.report(decisions[2].ticket, 1.0)
+                service.report(decisions[0].ticket, 0.0)
+                self.assertEqual(service.n_pending, 2)
+                self.assertEqual(int(service.bandit.arm_counts.sum()), 0)
+                service.report(decisions[1].ticket, 0.5)
+                self.assertEqual(service.n_pending, 0)
+                self.assertEqual(service.bandit.arm_counts.tolist(), [1, 1, 1])
+
+                with self.assertRaises(KeyError):
+                    service.report(decisions[1].ticket, 0.5)
+                service.report(decisions[3].ticket, 1.0)
+            # Stopping learns the remaining rewards.
+            self.assertEqual(int(service.bandit.arm_counts.sum()), 4)
+            self.assertEqual(service.n_flushes, 2)
+            self.assertFalse(service.running)
+
+        self.run_async(scenario())
+
+    def test_contextual_load(self):
+        async def scenario():
+            async with DecisionService(ContextualLinUCB(n_arms=4, n_features=3), flush_interval=0.001) as service:
+                report = await measure_latency(service, n_requests=500, concurrency=8,
+                                               context=lambda rng: rng.normal(size=3), max_delay=0.002,
+                                               random_state=42)
+            return service, report
+
+        service, report = self.run_async(scenario())
+        self.assertEqual(report.n_requests, 500)
+        self.assertTrue(0 < report.p50 <= report.p99 <= report.max)
+        self.assertEqual(service.n_outstanding, 0)
+        self.assertEqual(service.n_pending, 0)
+        # All rewards were learnt.
+        A = np.linalg.inv(service.bandit._estimate_A_inv)
+        self.assertAlmostEqual(float(np.trace(A, axis1=1, axis2=2).sum()), 4 * 3 + 500 * 3, delta=200)
+
+    def test_failures(self):
+        class FailingBandit(UCB1):
+            fail = True
+
+            def reward_batch(self, arms, rewards, contexts=None):
+                if self.fail:
+                    raise RuntimeError("Cannot learn.")
+                super().reward_batch(arms, rewards, contexts)
+
+        # Rewards that cannot be learnt are kept pending.
+        service = DecisionService(FailingBandit(n_arms=2), max_pending=10)
+        service.report(service.decide().ticket, 1.0)
+        with self.assertRaises(RuntimeError):
+            service.flush()
+        self.assertEqual(service.n_pending, 1)
+        service.bandit.fail = False
+        service.flush()
+        self.assertEqual(int(service.bandit.arm_counts.sum()), 1)
+
+        # Decisions with and without contexts cannot be mixed.
+        with self.assertRaises(AssertionError):
+            service.decide(np.zeros(2))
+
+        # Reports that fail are not waited for forever.
+        async def scenario():
+            service = DecisionService(FailingBandit(n_arms=2), flush_interval=60.0, max_pending=1)
+            async with service:
+                await measure_latency(service, n_requests=5, concurrency=1, max_delay=0.001)
+
+        with self.assertRaises(RuntimeError):
+            self.run_async(scenario())
+
+    def test_periodic_failures(self):
+        class FailingBandit(UCB1):
+            fail = True
+
+            def reward_batch(self, arms, rewards, contexts=None):
+                if self.fail:
+                    raise RuntimeError("Cannot learn.")
+                super().reward_batch(arms, rewards, contexts)
+
+        # The periodic flushes go on after a failure, and the rewards are kept pending until they are learnt.
+        async def scenario():
+            errors = []
+            service = DecisionService(FailingBandit(n_arms=2), flush_interval=0.001, on_error=errors.append)
+            await service.start()
+            service.report(service.decide().ticket, 1.0)
+            await asyncio.sleep(0.02)
+            self.assertTrue(service.running)
+            self.assertEqual(service.n_pending, 1)
+            self.assertGreater(len(errors), 1)
+            self.assertIsInstance(errors[0], RuntimeError)
+
+            service.bandit.fail = False
+            await asyncio.sleep(0.02)
+            self.assertEqual(service.n_pending, 0)
+            self.assertEqual(int(service.bandit.arm_counts.sum()), 1)
+
+            # Stopping always stops, even when the last flush fails.
+            service.bandit.fail = True
+            service.report(service.decide().ticket, 1.0)
+            with self.assertRaises(RuntimeError):
+                await service.stop()
+            self.assertFalse(service.running)
+
+        self.run_async(scenario())
+
+
+class TestBatchedExploreThenCommitBandit(unittest.TestCase):
+    def test_matches_sequential(self):
+        rewards = np.array([[10.0, 0.0, 5.0], [0.0, 3.0, 1.0]])
+        b = BatchedExploreThenCommitBandit(n_arms=3, n_replicates=2)
+
+        # Exploration: all replicates play the same arm.
+        for arm in range(3):
+            np.testing.assert_array_equal(b.pull(), [arm, arm])
+            b.reward(np.array([arm, arm]), rewards[:, arm])
+
+        # Exploitation: each replicate commits to its own best arm, like the sequential bandit.
+        for replicate in range(2):
+            s = ExploreThenCommitBandit(n_arms=3)
+            for arm in range(3):
+                s.pull()
+                s.reward(arm, rewards[replicate, arm])
+            self.assertEqual(b.pull()[replicate], s.pull())
+
+
+class TestBatchedUCB(unittest.TestCase):
+    def test_matches_sequential(self):
+        rewards = np.array([[0.0, 1.0, 0.5], [0.5, 0.0, 1.0]])
+        b = BatchedUCB(n_arms=3, n_replicates=2)
+        s = [LinUCB(n_arms=3), LinUCB(n_arms=3)]
+
+        for _ in range(20):
+            arms = b.pull()
+            for replicate in range(2):
+                self.assertEqual(arms[replicate], s[replicate].pull())
+                s[replicate].reward(arms[replicate], rewards[replicate, arms[replicate]])
+            b.reward(arms, rewards[[0, 1], arms])
+
+        np.testing.assert_array_equal(b.arm_counts, [s[0].arm_counts, s[1].arm_counts])
+
+
+class TestBatchedMultiArmedStochasticExperiment(unittest.TestCase):
+    def test_one(self):
+        rv0 = rv_histogram(([1], [0, 0.000000001]))
+        rv1 = rv_histogram(([1], [1, 1.000000001]))
+        env = StochasticMultiArmedEnvironment([rv0, rv1])
+
+        b = BatchedExploreThenCommitBandit(n_arms=2, n_replicates=5)
+        exp = BatchedMultiArmedStochasticExperiment(env, b)
+
+        self.assertEqual(exp.n_replicates, 5)
+        self.assertEqual(exp.best_arm, 1)
+
+        # Each replicate plays the first arm, then the second, then the best.
+        np.testing.assert_allclose(exp.round(), np.ones(5))
+        np.testing.assert_allclose(exp.rounds(10), np.zeros(5), atol=1e-6)
+
+
+def bernoulli_environment(rng):
+    rvs = [bernoulli(0.2), bernoulli(0.5), bernoulli(0.6)]
+    for rv in rvs:
+        rv.random_state = rng
+    return StochasticMultiArmedEnvironment(rvs, block_size=16)
+
+
+def explore_then_commit_bandit(rng):
+    return ExploreThenCommitBandit(n_arms=3, n_epochs=2)
+
+
+class TestMonteCarloRunner(unittest.TestCase):
+    def test_one(self):
+        runner = MonteCarloRunner(bernoulli_environment, explore_then_commit_bandit, quantiles=(0.5, 1.0),
+                                  n_checkpoints=5, chunk_size=3)
+        result = runner.run(n_replicates=10, horizon=50, seed=42, n_workers=1)
+
+        self.assertEqual(result.n_replicates, 10)
+        self.assertEqual(result.mean_regret.shape, (50,))
+        np.testing.assert_array_equal(result.checkpoints, [0, 12, 24, 37, 49])
+        self.assertEqual(result.quantile_regret.shape, (2, 5))
+        self.assertTrue(np.all(result.quantile_regret[0] <= result.quantile_regret[1]))
+
+        # Same seed, same results, whatever the number of workers.
+        for n_workers in [1, 2]:
+            other = runner.run(n_replicates=10, horizon=50, seed=42, n_workers=n_workers)
+            np.testing.assert_array_equal(other.mean_regret, result.mean_regret)
+            np.testing.assert_array_equal(other.quantile_regret, result.quantile_regret)